@@ -0,0 +1,231 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import tarfile
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict
+import cv2
+import numpy as np
+from manifest import ARCHIVE_EXTS, IMAGE_EXTS
+import video_source
+
+# tar/zip 안의 이미지는 "압축 파일 경로#항목 이름" 형식의 가상 경로로 목록에 들어감
+# 라벨은 압축 파일 옆의 "{압축 파일 이름}_labels/" 폴더에 항목 이름과 같은 구조로 저장 (압축 파일은 수정하지 않음)
+_MEMBER_RE = re.compile(r'^(.*?\.(?:' + '|'.join(ext[1:] for ext in ARCHIVE_EXTS) + r'))#(.+)$', re.IGNORECASE)
+
+INDEX_VERSION = 1
+# 압축 파일 옆에 쓸 수 없으면 여기에 색인 저장
+INDEX_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yolo_labeler", "archive_index")
+
+ZIP_STORED, ZIP_DEFLATED = 0, 8
+
+
+def member_path(archive_path, name):
+    return f"{archive_path}#{name}"
+
+
+def split_member_path(path):
+    # 압축 파일 항목이면 (압축 파일 경로, 항목 이름), 아니면 (None, None)
+    m = _MEMBER_RE.match(path)
+    return (m.group(1), m.group(2)) if m else (None, None)
+
+
+def is_archive_member(path):
+    return split_member_path(path)[0] is not None
+
+
+def source_file(path):
+    # stat/수정 시각 확인에 쓸 실제 파일 경로 (영상 프레임 포함)
+    archive_path, _ = split_member_path(path)
+    return archive_path or video_source.source_file(path)
+
+
+def sidecar_dir(archive_path):
+    return archive_path.rsplit('.', 1)[0] + '_labels'
+
+
+def member_label_path(archive_path, name):
+    return os.path.join(sidecar_dir(archive_path), *name.rsplit('.', 1)[0].split('/')) + '.txt'
+
+
+def index_tar(archive_path):
+    # 헤더만 따라가며 (이름, 데이터 오프셋, 크기, 압축 방식, 원래 크기) 목록을 만듦 (데이터는 읽지 않음)
+    members = []
+    with tarfile.open(archive_path, 'r:') as tar:
+        while True:
+            info = tar.next()
+            if info is None:
+                break
+            if info.isfile() and info.name.lower().endswith(IMAGE_EXTS):
+                members.append((info.name, info.offset_data, info.size, ZIP_STORED, info.size))
+            tar.members = []  # 수백만 항목도 TarInfo 목록을 메모리에 쌓지 않음
+    return members
+
+
+def index_zip(archive_path):
+    members = []
+    with zipfile.ZipFile(archive_path) as zf, open(archive_path, 'rb') as f:
+        for info in zf.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTS):
+                continue
+            if info.flag_bits & 0x1 or info.compress_type not in (ZIP_STORED, ZIP_DEFLATED):
+                continue  # 암호화/지원하지 않는 압축 방식
+            # 로컬 헤더의 이름/추가 필드 길이는 중앙 디렉터리와 다를 수 있으므로 직접 읽음
+            f.seek(info.header_offset)
+            header = f.read(30)
+            name_len, extra_len = struct.unpack('<HH', header[26:30])
+            offset = info.header_offset + 30 + name_len + extra_len
+            members.append((info.filename, offset, info.compress_size, info.compress_type, info.file_size))
+    return members
+
+
+def index_paths(archive_path):
+    # 압축 파일 옆의 숨김 파일 (스캐너는 .으로 시작하는 파일을 건너뜀), 쓸 수 없으면 캐시 폴더
+    folder, name = os.path.split(archive_path)
+    key = hashlib.sha1(os.path.abspath(archive_path).encode('utf-8')).hexdigest()
+    return [os.path.join(folder, f".{name}.index.json"), os.path.join(INDEX_CACHE_DIR, key[:2], key + '.json')]
+
+
+def load_index(archive_path):
+    # 항목 목록 (이름순), 압축 파일의 크기/수정 시각이 그대로면 저장된 색인을 사용
+    st = os.stat(archive_path)
+    for path in index_paths(archive_path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if (cached.get('version'), cached.get('mtime_ns'), cached.get('size')) == (INDEX_VERSION, st.st_mtime_ns, st.st_size):
+                return [tuple(m) for m in cached['members']]
+        except (OSError, ValueError):
+            continue
+    try:
+        members = index_zip(archive_path) if archive_path.lower().endswith('.zip') else index_tar(archive_path)
+    except (tarfile.TarError, zipfile.BadZipFile, struct.error) as e:
+        raise OSError(f"압축 파일을 읽을 수 없습니다: {archive_path} ({e})") from e
+    members.sort()
+    data = {'version': INDEX_VERSION, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'members': members}
+    for path in index_paths(archive_path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+            break
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return members
+
+
+class ArchiveReader:
+    # 압축 파일 전체를 읽기 전용 mmap으로 열고 항목은 오프셋으로 바로 읽음 (여러 스레드에서 동시에 읽어도 됨)
+    def __init__(self, archive_path):
+        self.path = archive_path
+        self.members = {name: (offset, size, method, raw_size) for name, offset, size, method, raw_size in load_index(archive_path)}
+        self.file = open(archive_path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.map = None  # 빈 파일
+
+    def names(self):
+        return sorted(self.members)
+
+    def read_bytes(self, name):
+        entry = self.members.get(name)
+        if entry is None or self.map is None:
+            raise OSError(f"압축 파일에 항목이 없습니다: {self.path}#{name}")
+        offset, size, method, raw_size = entry
+        data = memoryview(self.map)[offset:offset + size]
+        if method == ZIP_DEFLATED:
+            return zlib.decompress(data, -15, raw_size)
+        return data
+
+    def close(self):
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass  # 아직 디코딩 중인 뷰가 있으면 참조가 사라질 때 닫힘
+            self.map = None
+        self.file.close()
+
+
+_readers = OrderedDict()  # 압축 파일 경로 -> ArchiveReader (최근에 쓴 몇 개만 열어 둠)
+_readers_lock = threading.Lock()
+
+
+def get_reader(archive_path, max_open=8):
+    with _readers_lock:
+        reader = _readers.get(archive_path)
+        if reader is not None:
+            _readers.move_to_end(archive_path)
+            return reader
+    reader = ArchiveReader(archive_path)
+    with _readers_lock:
+        existing = _readers.get(archive_path)
+        if existing is not None:
+            reader.close()
+            return existing
+        _readers[archive_path] = reader
+        while len(_readers) > max_open:
+            # 다른 스레드가 아직 읽는 중일 수 있으므로 mmap은 참조가 사라질 때 닫히도록 둠
+            _readers.popitem(last=False)
+    return reader
+
+
+def member_paths(archive_path):
+    return [member_path(archive_path, name) for name in get_reader(archive_path).names()]
+
+
+def read_member(path):
+    # 항목의 인코딩된 바이트 (mmap 뷰 또는 압축 해제한 bytes)
+    archive_path, name = split_member_path(path)
+    return get_reader(archive_path).read_bytes(name)
+
+
+def sidecar_label_mtimes(archive_path):
+    # 라벨 폴더를 한 번 훑어서 {확장자를 뺀 항목 이름: 라벨 mtime_ns}
+    root = sidecar_dir(archive_path)
+    mtimes = {}
+    for folder, _, files in os.walk(root):
+        rel = os.path.relpath(folder, root)
+        prefix = '' if rel == '.' else rel.replace(os.sep, '/') + '/'
+        for name in files:
+            if name.endswith('.txt'):
+                try:
+                    mtimes[prefix + name[:-4]] = os.stat(os.path.join(folder, name)).st_mtime_ns
+                except OSError:
+                    pass
+    return mtimes
+
+
+def decode_member(path, flags=cv2.IMREAD_COLOR, data=None):
+    # 항목 -> BGR 배열 (실패 시 None), 압축 파일에서 꺼낸 바이트를 그대로 디코딩 (이미 읽은 data가 있으면 재사용)
+    if data is None:
+        try:
+            data = read_member(path)
+        except OSError:
+            return None
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+
+
+def read_image(path, flags=cv2.IMREAD_COLOR, data=None):
+    # 항목 -> RGB 배열 (실패 시 None)
+    img = decode_member(path, flags, data)
+    if img is None:
+        return None
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def close_readers():
+    with _readers_lock:
+        readers = list(_readers.values())
+        _readers.clear()
+    for reader in readers:
+        reader.close()
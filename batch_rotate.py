@@ -0,0 +1,148 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+from PIL import Image
+from label_writer import label_path_for, format_labels, parse_labels, write_atomic
+from manifest import IMAGE_EXTS
+from rotation_utils import rotate_yolo_boxes
+
+# 사용 예: python batch_rotate.py --angle 90 ./images other/img_001.jpg
+
+JPEGTRAN_ROTATE = {90: '90', 180: '180', 270: '270'}
+CV2_ROTATE = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+EXIF_ORIENTATION = 0x0112
+FLIP_ORIENTATIONS = (2, 4, 5, 7)  # 좌우/상하 반전이 섞인 방향은 회전과 순서를 바꿀 수 없음
+
+
+def collect_images(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(os.path.join(item, f) for f in sorted(os.listdir(item)) if f.lower().endswith(IMAGE_EXTS))
+        elif item.lower().endswith(IMAGE_EXTS):
+            paths.append(item)
+    return paths
+
+
+def exif_orientation(img_path):
+    try:
+        with Image.open(img_path) as im:
+            return im.getexif().get(EXIF_ORIENTATION, 1)
+    except OSError:
+        return 1
+
+
+def apply_orientation(img, orientation):
+    # EXIF 방향을 픽셀에 적용 (라벨은 방향을 적용한 화면 기준이므로 같은 기준에서 회전해야 함)
+    if orientation == 2:
+        return cv2.flip(img, 1)
+    if orientation == 3:
+        return cv2.rotate(img, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(img, 0)
+    if orientation == 5:
+        return cv2.transpose(img)
+    if orientation == 6:
+        return cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.flip(cv2.transpose(img), -1)
+    if orientation == 8:
+        return cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return img
+
+
+def rotate_jpeg_lossless(jpegtran, img_path, tmp_path, angle):
+    # -perfect: MCU 경계가 맞지 않아 무손실이 불가능하면 실패시키고 재인코딩으로 대체
+    result = subprocess.run([jpegtran, '-rotate', JPEGTRAN_ROTATE[angle], '-perfect', '-copy', 'all', '-outfile', tmp_path, img_path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
+
+
+def rotate_one(img_path, angle, jpegtran):
+    # 워커 프로세스에서 실행: 이미지 회전 + 같은 이름의 라벨 파일 좌표 변환
+    tmp_path = os.path.join(os.path.dirname(img_path), f".{os.path.basename(img_path)}.{os.getpid()}.tmp")
+    ext = os.path.splitext(img_path)[1]
+    nbytes = os.path.getsize(img_path)
+    lossless = False
+    orientation = exif_orientation(img_path)
+    try:
+        # jpegtran은 EXIF 방향 태그를 그대로 복사하므로 회전만 있는 방향에서만 결과가 같음
+        if jpegtran and img_path.lower().endswith(('.jpg', '.jpeg')) and orientation not in FLIP_ORIENTATIONS:
+            lossless = rotate_jpeg_lossless(jpegtran, img_path, tmp_path, angle)
+        if not lossless:
+            # 알파/16비트를 유지하려고 IMREAD_UNCHANGED로 읽고 (방향은 적용되지 않음) EXIF 방향을 직접 적용
+            # 재인코딩하면 EXIF가 빠지므로 결과는 방향 태그 없이 화면 기준 픽셀로 저장됨
+            img = cv2.imread(img_path, cv2.IMREAD_UNCHANGED)
+            if img is None:
+                raise OSError("이미지를 읽을 수 없습니다")
+            img = apply_orientation(img, orientation)
+            params = [cv2.IMWRITE_JPEG_QUALITY, 95] if ext.lower() in ('.jpg', '.jpeg') else []
+            ok, buf = cv2.imencode(ext, cv2.rotate(img, CV2_ROTATE[angle]), params)
+            if not ok:
+                raise OSError("이미지 인코딩에 실패했습니다")
+            with open(tmp_path, 'wb') as f:
+                f.write(buf.tobytes())
+        os.replace(tmp_path, img_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    boxes = 0
+    label_path = label_path_for(img_path)
+    if os.path.exists(label_path):
+        with open(label_path, 'r') as f:
+            bboxes = parse_labels(f.read())
+        if bboxes:
+            write_atomic(label_path, format_labels(rotate_yolo_boxes(bboxes, angle).tolist()))
+            boxes = len(bboxes)
+    return nbytes, lossless, boxes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="이미지와 YOLO 라벨을 함께 90도 단위로 일괄 회전합니다.")
+    parser.add_argument('inputs', nargs='+', help="이미지 파일 또는 폴더")
+    parser.add_argument('--angle', type=int, choices=(90, 180, 270), required=True, help="시계방향 회전 각도")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="워커 프로세스 수")
+    parser.add_argument('--no-lossless', action='store_true', help="jpegtran 무손실 회전을 사용하지 않음")
+    args = parser.parse_args(argv)
+
+    paths = collect_images(args.inputs)
+    if not paths:
+        print("회전할 이미지가 없습니다.", file=sys.stderr)
+        return 1
+    jpegtran = None if args.no_lossless else shutil.which('jpegtran')
+    if not args.no_lossless and jpegtran is None:
+        print("jpegtran을 찾을 수 없어 JPEG도 재인코딩합니다.", file=sys.stderr)
+
+    start = time.perf_counter()
+    done = failed = lossless_count = box_count = total_bytes = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(rotate_one, path, args.angle, jpegtran): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                nbytes, lossless, boxes = future.result()
+                total_bytes += nbytes
+                lossless_count += lossless
+                box_count += boxes
+            except Exception as e:
+                failed += 1
+                print(f"\n실패: {futures[future]}: {e}", file=sys.stderr)
+            done += 1
+            if done % 50 == 0 or done == len(paths):
+                print(f"\r[{done}/{len(paths)}]", end='', flush=True)
+    elapsed = max(time.perf_counter() - start, 1e-6)  # 아주 빨리 끝나면 0초로 측정될 수 있음
+
+    print()
+    print(f"이미지 {done - failed}개 회전 (무손실 {lossless_count}개, 재인코딩 {done - failed - lossless_count}개, 실패 {failed}개)")
+    print(f"라벨 박스 {box_count}개 변환")
+    print(f"{elapsed:.2f}초, {done / elapsed:.1f} 이미지/초, {total_bytes / elapsed / 1024 / 1024:.1f} MB/초")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
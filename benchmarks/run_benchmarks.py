@@ -0,0 +1,324 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_cache import ImageCache, decode_image, reduced_flags
+from image_pyramid import ImagePyramid
+from rotation_utils import rotate_bound
+from label_writer import LabelWriter, format_labels, parse_labels, write_atomic, label_path_for
+from dataset_scanner import DatasetScanner
+from labeling_utils import LabelingUtils
+from frame_buffer import FrameBuffer
+
+# 사용 예: python benchmarks/run_benchmarks.py --save result.json   (기본으로 benchmarks/baseline.json 과 비교)
+# 기준 결과 갱신: python benchmarks/run_benchmarks.py --save benchmarks/baseline.json --baseline ''
+# 화면이 없는 서버에서 Tk 구간(PhotoImage, 박스 그리기)까지 측정하려면 xvfb-run 으로 실행
+
+CANVAS_SIZE = (1200, 800)
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")  # 기본 옵션(합성 데이터셋)으로 측정한 기준
+
+
+def synthetic_image(w, h, rng):
+    # 부드러운 그라디언트 + 도형 + 약한 노이즈 (JPEG 압축률이 실제 사진과 비슷하도록)
+    x = np.linspace(0, 255, w, dtype=np.float32)
+    y = np.linspace(0, 255, h, dtype=np.float32)[:, None]
+    img = np.empty((h, w, 3), dtype=np.uint8)
+    img[..., 0] = (x * 0.7 + y * 0.3).astype(np.uint8)
+    img[..., 1] = (255 - x * 0.5 - y * 0.2).astype(np.uint8)
+    img[..., 2] = (y * 0.8).astype(np.uint8)
+    for _ in range(20):
+        cx, cy = int(rng.integers(0, w)), int(rng.integers(0, h))
+        r = int(rng.integers(max(2, min(w, h) // 40), max(3, min(w, h) // 8)))
+        cv2.circle(img, (cx, cy), r, tuple(int(v) for v in rng.integers(0, 256, 3)), -1)
+    noise = rng.integers(-8, 9, size=(h, w, 1), dtype=np.int16)
+    return np.clip(img.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def random_boxes(n, rng, num_classes=5):
+    wh = rng.uniform(0.01, 0.3, size=(n, 2))
+    centers = rng.uniform(wh / 2, 1 - wh / 2)
+    cids = rng.integers(0, num_classes, size=n)
+    return [(int(c), float(xc), float(yc), float(w), float(h)) for c, (xc, yc), (w, h) in zip(cids, centers, wh)]
+
+
+def make_image_folder(root, count, size, boxes_per_image, rng):
+    # 같은 이미지를 여러 이름으로 저장 (디코딩 비용은 같고 생성 시간은 줄임)
+    os.makedirs(root, exist_ok=True)
+    w, h = size
+    path = os.path.join(root, "img_000000.jpg")
+    cv2.imwrite(path, synthetic_image(w, h, rng), [cv2.IMWRITE_JPEG_QUALITY, 90])
+    paths = [path]
+    for i in range(1, count):
+        paths.append(os.path.join(root, f"img_{i:06d}.jpg"))
+        shutil.copyfile(path, paths[-1])
+    for path in paths:
+        with open(label_path_for(path), 'w') as f:
+            f.write(format_labels(random_boxes(boxes_per_image, rng)))
+    return paths
+
+
+def make_scan_folder(root, count, per_dir=1000):
+    # 폴더 스캔은 stat만 하므로 빈 파일로 충분 (절반은 라벨 파일 포함)
+    for i in range(count):
+        sub = os.path.join(root, f"d{i // per_dir:04d}")
+        if i % per_dir == 0:
+            os.makedirs(sub, exist_ok=True)
+        open(os.path.join(sub, f"{i:07d}.jpg"), 'wb').close()
+        if i % 2 == 0:
+            open(os.path.join(sub, f"{i:07d}.txt"), 'wb').close()
+
+
+def measure(fn, repeat, warmup=1):
+    # 호출 1회당 소요 시간(ns) 배열
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(repeat, dtype=np.int64)
+    for i in range(repeat):
+        start = time.perf_counter_ns()
+        fn()
+        samples[i] = time.perf_counter_ns() - start
+    return samples
+
+
+class Results:
+    def __init__(self):
+        self.results = {}
+
+    def add(self, name, samples_ns, items=1, unit='call'):
+        # items: 호출 1회에 처리한 개수 (처리량 계산용)
+        ms = np.asarray(samples_ns, dtype=np.float64) / 1e6
+        p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+        total = ms.sum() / 1000
+        self.results[name] = {
+            'p50_ms': round(float(p50), 4), 'p95_ms': round(float(p95), 4), 'p99_ms': round(float(p99), 4),
+            'mean_ms': round(float(ms.mean()), 4), 'n': len(ms),
+            'throughput': round(items * len(ms) / total, 2) if total > 0 else None, 'unit': f"{unit}/s",
+        }
+        r = self.results[name]
+        print(f"{name:<32} p50 {r['p50_ms']:>9.3f}  p95 {r['p95_ms']:>9.3f}  p99 {r['p99_ms']:>9.3f} ms"
+              f"  {r['throughput'] or 0:>10.1f} {r['unit']}", flush=True)
+
+
+def parse_sizes(text):
+    return [tuple(int(v) for v in item.lower().split('x')) for item in text.split(',') if item]
+
+
+def parse_ints(text):
+    return [int(v) for v in text.split(',') if v]
+
+
+def open_tk():
+    # 디스플레이가 없으면 Tk 구간은 건너뜀
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        return None
+    root.withdraw()
+    return root
+
+
+def bench_images(results, work, sizes, repeat, nav_count, dwell, tk_root, rng):
+    for size in sizes:
+        tag = f"{size[0]}x{size[1]}"
+        folder = os.path.join(work, f"images_{tag}")
+        paths = make_image_folder(folder, nav_count, size, 20, rng)
+        results.add(f"decode/{tag}", measure(lambda: decode_image(paths[0]), repeat), size[0] * size[1] / 1e6, 'MP')
+        # 창 크기에 맞춘 축소 디코딩 (라벨링 모드의 첫 화면, 크기는 매니페스트/캐시에 있다고 가정)
+        results.add(f"decode/reduced/{tag}", measure(lambda: decode_image(paths[0], reduced_flags(paths[0], CANVAS_SIZE, size)[0]), repeat),
+                    size[0] * size[1] / 1e6, 'MP')
+        # 크기를 모를 때 한 번 읽는 헤더 (EXIF 방향 포함)
+        results.add(f"decode/probe/{tag}", measure(lambda: reduced_flags(paths[0], CANVAS_SIZE), repeat))
+        img = decode_image(paths[0])
+        results.add(f"pyramid/{tag}", measure(lambda: ImagePyramid(img), repeat))
+
+        # 다음 이미지로 넘기는 과정 (선행 디코딩 포함): 사용자가 한 장에 dwell 초 머문다고 가정
+        cache = ImageCache()
+        cache.display_size = CANVAS_SIZE
+        samples = []
+        for i, path in enumerate(paths):
+            start = time.perf_counter_ns()
+            cache.get(path)
+            samples.append(time.perf_counter_ns() - start)
+            cache.prefetch(paths, i)
+            time.sleep(dwell)
+        cache.shutdown()
+        results.add(f"load/{tag}", samples[1:], 1, 'img')
+
+        pyramid = ImagePyramid(img)
+        cw, ch = CANVAS_SIZE
+        w, h = pyramid.width, pyramid.height
+        fit = min(cw / w, ch / h)
+        out_w, out_h = max(1, int(w * fit)), max(1, int(h * fit))
+        results.add(f"render/fit/{tag}", measure(lambda: pyramid.render(0, 0, w, h, out_w, out_h), repeat))
+        zw, zh = w / (fit * 4), h / (fit * 4)  # 4배 확대: 보이는 영역은 캔버스 크기
+        x0, y0 = (w - zw) / 2, (h - zh) / 2
+        results.add(f"render/zoom4/{tag}", measure(lambda: pyramid.render(x0, y0, x0 + zw, y0 + zh, cw, ch), repeat))
+
+        results.add(f"rotate/full/{tag}", measure(lambda: rotate_bound(img, 17.5), max(3, repeat // 4)))
+        proxy = pyramid.level_for(min(1.0, fit))
+        results.add(f"rotate/preview/{tag}", measure(lambda: rotate_bound(proxy, 17.5), repeat))
+
+        if tk_root is not None:
+            from PIL import Image, ImageTk
+            region = pyramid.render(0, 0, w, h, out_w, out_h)
+            results.add(f"photo/{tag}", measure(lambda: ImageTk.PhotoImage(Image.fromarray(region), master=tk_root), repeat))
+            # 실제 화면 갱신 경로: 재사용하는 프레임 버퍼에 렌더링 후 기존 PhotoImage에 복사
+            frame = FrameBuffer()
+            frame.ensure(cw, ch)
+            dx0, dy0 = (cw - out_w) // 2, (ch - out_h) // 2
+
+            def present():
+                pyramid.render(0, 0, w, h, out_w, out_h, frame.target(dx0, dy0, dx0 + out_w, dy0 + out_h))
+                frame.present()
+            results.add(f"frame/{tag}", measure(present, repeat))
+
+
+def bench_boxes(results, densities, repeat, tk_root, rng):
+    for n in densities:
+        boxes = random_boxes(n, rng)
+        text = format_labels(boxes)
+        results.add(f"labels/parse/{n}", measure(lambda: parse_labels(text), repeat * 5), n, 'box')
+        results.add(f"labels/format/{n}", measure(lambda: format_labels(boxes), repeat * 5), n, 'box')
+        if tk_root is not None:
+            import tkinter as tk
+            canvas = tk.Canvas(tk_root, width=CANVAS_SIZE[0], height=CANVAS_SIZE[1])
+            labeler = SimpleNamespace(canvas=canvas, bboxes=boxes, image_geometry=(0, 0) + CANVAS_SIZE,
+                                      classes=["person", "car", "bike", "dog", "cat"])
+            utils = LabelingUtils(labeler)
+
+            def draw():
+                utils.draw_all_bboxes()
+                canvas.update_idletasks()
+            results.add(f"boxes/draw/{n}", measure(draw, repeat), n, 'box')
+            canvas.destroy()
+
+
+def bench_label_io(results, work, densities, files, repeat, rng):
+    folder = os.path.join(work, "labels")
+    os.makedirs(folder, exist_ok=True)
+    for n in densities:
+        text = format_labels(random_boxes(n, rng))
+        path = os.path.join(folder, f"single_{n}.txt")
+        results.add(f"labels/write/{n}", measure(lambda: write_atomic(path, text), repeat), 1, 'file')
+    text = format_labels(random_boxes(densities[0], rng))
+    for count in files:
+        writer = LabelWriter()
+        paths = [os.path.join(folder, f"w{count}_{i:06d}.txt") for i in range(count)]
+
+        def write_all():
+            for path in paths:
+                writer.enqueue(path, text)
+            writer.flush()
+        results.add(f"labels/writer/{count}", measure(write_all, 3), count, 'file')
+        writer.stop()
+
+
+def bench_scan(results, work, files):
+    for count in files:
+        folder = os.path.join(work, f"scan_{count}")
+        make_scan_folder(folder, count)
+
+        def walk():
+            for _ in DatasetScanner(folder).walk(folder):
+                pass
+        results.add(f"scan/{count}", measure(walk, 3), count, 'file')
+
+
+def compare(results, baseline, tolerance, min_delta_ms=0.05):
+    # p50 기준으로 비교, tolerance 이상 느려진 항목은 회귀로 표시 (min_delta_ms 미만 차이는 측정 잡음으로 봄)
+    regressions = []
+    print(f"\n{'benchmark':<32} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, current in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        ratio = current['p50_ms'] / old['p50_ms'] if old['p50_ms'] > 0 else 1.0
+        flag = ''
+        if ratio > 1 + tolerance and current['p50_ms'] - old['p50_ms'] >= min_delta_ms:
+            flag = '  <-- 느려짐'
+            regressions.append(name)
+        elif ratio < 1 - tolerance:
+            flag = '  빨라짐'
+        print(f"{name:<32} {old['p50_ms']:>10.3f} {current['p50_ms']:>10.3f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="이미지 로드/렌더링/회전/라벨 입출력 경로의 성능을 측정합니다.")
+    parser.add_argument('--sizes', default='1280x720,4000x3000', help="이미지 크기 목록 (WxH,...)")
+    parser.add_argument('--boxes', default='10,100,1000', help="이미지당 박스 수 목록")
+    parser.add_argument('--files', default='1000,10000', help="폴더 크기(파일 수) 목록")
+    parser.add_argument('--nav', type=int, default=20, help="이미지 탐색 측정에 쓸 이미지 수")
+    parser.add_argument('--dwell', type=float, default=0.05, help="탐색 측정에서 한 장에 머무는 시간(초)")
+    parser.add_argument('--repeat', type=int, default=20, help="항목별 반복 횟수")
+    parser.add_argument('--quick', action='store_true', help="작은 크기로 빠르게 실행")
+    parser.add_argument('--only', help="이름에 이 문자열이 들어간 그룹만 실행 (images, boxes, labels, scan)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help="결과를 저장할 JSON 파일")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="비교할 기준 결과 JSON 파일 (빈 문자열이면 비교하지 않음)")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="회귀로 판단할 p50 증가 비율")
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help="회귀로 판단할 최소 p50 증가량 (ms)")
+    parser.add_argument('--workdir', help="합성 데이터셋을 만들 폴더 (기본: 임시 폴더, 끝나면 삭제)")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.sizes, args.boxes, args.files, args.nav, args.repeat = '640x480', '10,100', '1000', 8, 5
+    sizes, densities, files = parse_sizes(args.sizes), parse_ints(args.boxes), parse_ints(args.files)
+    rng = np.random.default_rng(args.seed)
+    work = args.workdir or tempfile.mkdtemp(prefix="yolo_labeler_bench_")
+    tk_root = open_tk()
+    if tk_root is None:
+        print("디스플레이가 없어 Tk 구간(PhotoImage, 박스 그리기)은 건너뜁니다.")
+    results = Results()
+    groups = {
+        'images': lambda: bench_images(results, work, sizes, args.repeat, args.nav, args.dwell, tk_root, rng),
+        'boxes': lambda: bench_boxes(results, densities, args.repeat, tk_root, rng),
+        'labels': lambda: bench_label_io(results, work, densities, files, args.repeat, rng),
+        'scan': lambda: bench_scan(results, work, files),
+    }
+    try:
+        for name, run in groups.items():
+            if args.only and args.only not in name:
+                continue
+            run()
+    finally:
+        if tk_root is not None:
+            tk_root.destroy()
+        if not args.workdir:
+            shutil.rmtree(work, ignore_errors=True)
+
+    report = {
+        'meta': {'python': platform.python_version(), 'opencv': cv2.__version__, 'numpy': np.__version__,
+                 'platform': platform.platform(), 'cpus': os.cpu_count(), 'tk': tk_root is not None,
+                 'args': vars(args)},
+        'results': results.results,
+    }
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        # 다른 기기에서 만든 기준이면 절대 시간 비교는 참고용
+        meta = baseline.get('meta', {})
+        print(f"\n기준: {args.baseline} ({meta.get('platform')}, CPU {meta.get('cpus')}개, Python {meta.get('python')}, OpenCV {meta.get('opencv')})")
+        regressions = compare(results.results, baseline['results'], args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n회귀 {len(regressions)}개: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
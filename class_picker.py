@@ -0,0 +1,205 @@
+import bisect
+import re
+import tkinter as tk
+
+# 클래스가 수천 개여도 위젯은 입력창 하나, 목록(Listbox는 보이는 줄만 그림) 하나, 최근 사용 버튼 몇 개만 유지
+_WORD_RE = re.compile(r'[0-9a-z가-힣]+')
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ClassIndex:
+    # 이름 전체/단어 접두어는 정렬 목록에서 이분 탐색, 중간 부분 문자열은 trigram 후보를 교집합한 뒤 확인
+    def __init__(self, classes):
+        self.names = [name.lower() for name in classes]
+        self.by_name = sorted((name, i) for i, name in enumerate(self.names))
+        self.by_word = sorted((word, i) for i, name in enumerate(self.names) for word in set(_WORD_RE.findall(name)))
+        self.trigram_ids = {}  # trigram -> 클래스 번호 set
+        for i, name in enumerate(self.names):
+            for tri in trigrams(name):
+                self.trigram_ids.setdefault(tri, set()).add(i)
+
+    @staticmethod
+    def prefix_ids(entries, prefix):
+        start = bisect.bisect_left(entries, (prefix,))
+        ids = []
+        for key, i in entries[start:]:
+            if not key.startswith(prefix):
+                break
+            ids.append(i)
+        return ids
+
+    def substring_ids(self, query):
+        if len(query) < 3:
+            return [i for i, name in enumerate(self.names) if query in name]
+        candidates = None
+        for tri in trigrams(query):
+            ids = self.trigram_ids.get(tri)
+            if not ids:
+                return []
+            candidates = set(ids) if candidates is None else candidates & ids
+        return sorted(i for i in candidates if query in self.names[i])
+
+    def search(self, query):
+        # 클래스 번호 목록: 번호 일치 -> 이름 접두어 -> 단어 접두어 -> 부분 문자열 순서 (중복 제거)
+        query = query.strip().lower()
+        if not query:
+            return list(range(len(self.names)))
+        groups = []
+        if query.isdigit() and int(query) < len(self.names):
+            groups.append([int(query)])
+        groups.append(self.prefix_ids(self.by_name, query))
+        groups.append(sorted(self.prefix_ids(self.by_word, query)))
+        groups.append(self.substring_ids(query))
+        seen, result = set(), []
+        for ids in groups:
+            for i in ids:
+                if i not in seen:
+                    seen.add(i)
+                    result.append(i)
+        return result
+
+
+class ClassPicker:
+    # 입력하는 대로 걸러지는 클래스 목록 + 최근 사용 클래스 버튼 (Ctrl+F로 입력창 이동, Enter로 첫 결과 선택)
+    def __init__(self, labeler, parent, height=10, mru_size=4):
+        self.labeler = labeler
+        self.classes = []
+        self.index = ClassIndex([])
+        self.results = []  # 목록 줄 -> 클래스 번호
+        self.rows = {}  # 클래스 번호 -> 목록 줄 (현재 필터 결과 안에서)
+        self.cursor = None  # 입력창에서 방향키로 옮긴 목록 줄 (Enter로 선택)
+        self.selected = 0
+        self.mru = []  # 최근 선택한 클래스 번호 (앞이 최신)
+
+        self.filter_var = tk.StringVar()
+        self.entry = tk.Entry(parent, textvariable=self.filter_var)
+        self.entry.pack(fill=tk.X, padx=5, pady=(5, 2))
+        # 입력창에서는 창 전체 단축키(w/r/n/0/방향키 등)가 실행되지 않도록 최상위 창 태그만 뺌 ('all'은 Tab 이동용으로 유지)
+        self.entry.bindtags((str(self.entry), 'Entry', 'all'))
+        self.entry.bind('<Return>', self.select_first)
+        self.entry.bind('<Down>', lambda event: self.move(1))
+        self.entry.bind('<Up>', lambda event: self.move(-1))
+        self.entry.bind('<Escape>', self.clear_filter)
+        self.filter_var.trace_add('write', lambda *args: self.refresh())
+
+        self.mru_frame = tk.Frame(parent)
+        self.mru_frame.pack(fill=tk.X, padx=5)
+        self.mru_buttons = []
+        for slot in range(mru_size):
+            btn = tk.Button(self.mru_frame, text="", width=1, command=lambda s=slot: self.select_mru(s))
+            btn.grid(row=0, column=slot, sticky="ew")
+            self.mru_frame.columnconfigure(slot, weight=1, uniform="mru")
+            self.mru_buttons.append(btn)
+
+        list_frame = tk.Frame(parent)
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=(2, 5))
+        self.listbox = tk.Listbox(list_frame, height=height, exportselection=False, activestyle='none', takefocus=0)
+        scrollbar = tk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.listbox.yview)
+        self.listbox.config(yscrollcommand=scrollbar.set)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.bind('<<ListboxSelect>>', self.on_list_select)
+
+    def set_classes(self, classes):
+        # 클래스 목록이 바뀌면 색인만 다시 만들고 위젯은 그대로 사용
+        self.classes = list(classes)
+        self.index = ClassIndex(self.classes)
+        self.mru = [cid for cid in self.mru if cid < len(self.classes)]
+        if self.selected >= len(self.classes):
+            self.selected = 0
+        self.update_mru_buttons()
+        if self.filter_var.get():
+            self.filter_var.set("")  # trace에서 refresh
+        else:
+            self.refresh()
+
+    def refresh(self):
+        self.results = self.index.search(self.filter_var.get())
+        self.rows = {cid: row for row, cid in enumerate(self.results)}
+        self.cursor = None
+        state = self.listbox.cget('state')
+        self.listbox.config(state=tk.NORMAL)  # 비활성 상태에서는 목록을 바꿀 수 없음 (회전 모드 중 클래스 수정)
+        self.listbox.delete(0, tk.END)
+        if self.results:
+            self.listbox.insert(tk.END, *(f"{cid}: {self.classes[cid]}" for cid in self.results))
+        self.listbox.config(state=state)
+        self.show_selected()
+
+    def show_selected(self):
+        self.show_row(self.rows.get(self.selected))
+
+    def show_row(self, row):
+        state = self.listbox.cget('state')
+        self.listbox.config(state=tk.NORMAL)
+        self.listbox.selection_clear(0, tk.END)
+        if row is not None:
+            self.listbox.selection_set(row)
+            self.listbox.see(row)
+        self.listbox.config(state=state)
+
+    def set_enabled(self, enabled):
+        # 모드 전환: 위젯 수가 클래스 수와 관계없이 고정이므로 상태 변경도 일정 시간
+        state = tk.NORMAL if enabled else tk.DISABLED
+        self.entry.config(state=state)
+        self.listbox.config(state=state)
+        for btn in self.mru_buttons:
+            btn.config(state=state if btn.cget('text') else tk.DISABLED)
+
+    def select(self, cid):
+        if not 0 <= cid < len(self.classes):
+            return
+        self.selected = cid
+        if cid in self.mru:
+            self.mru.remove(cid)
+        self.mru.insert(0, cid)
+        del self.mru[len(self.mru_buttons):]
+        self.update_mru_buttons()
+        self.show_selected()
+        self.labeler.on_class_selected(cid)
+
+    def update_mru_buttons(self):
+        enabled = str(self.entry.cget('state')) != tk.DISABLED
+        for slot, btn in enumerate(self.mru_buttons):
+            if slot < len(self.mru):
+                cid = self.mru[slot]
+                btn.config(text=self.classes[cid], state=tk.NORMAL if enabled else tk.DISABLED)
+            else:
+                btn.config(text="", state=tk.DISABLED)
+
+    def on_list_select(self, event=None):
+        selection = self.listbox.curselection()
+        if selection:
+            self.select(self.results[selection[0]])
+
+    def select_mru(self, slot):
+        if slot < len(self.mru):
+            self.select(self.mru[slot])
+
+    def select_first(self, event=None):
+        # Enter: 방향키로 고른 줄 또는 첫 번째 결과를 선택하고 캔버스로 돌아감
+        if self.results:
+            self.select(self.results[self.cursor if self.cursor is not None else 0])
+        self.labeler.canvas.focus_set()
+        return "break"
+
+    def move(self, step):
+        if not self.results:
+            return "break"
+        row = 0 if self.cursor is None else self.cursor + step
+        self.cursor = max(0, min(len(self.results) - 1, row))
+        self.show_row(self.cursor)
+        return "break"
+
+    def clear_filter(self, event=None):
+        self.filter_var.set("")
+        self.labeler.canvas.focus_set()
+        return "break"
+
+    def focus(self, event=None):
+        if str(self.entry.cget('state')) != tk.DISABLED:
+            self.entry.focus_set()
+            self.entry.select_range(0, tk.END)
+        return "break"
@@ -0,0 +1,185 @@
+import os
+import queue
+import threading
+import time
+from archive_source import member_paths, sidecar_label_mtimes
+from manifest import ARCHIVE_EXTS, IMAGE_EXTS, VIDEO_EXTS
+from video_source import frame_count, frame_path
+
+
+def scan_dir(path):
+    # 디렉터리 하나를 scandir: 이미지/영상/압축 파일 {이름: (mtime_ns, size)}, 라벨 {확장자 제외 이름: mtime_ns}, 하위 폴더 이름들
+    images, labels, subdirs = {}, {}, []
+    with os.scandir(path) as it:
+        for entry in it:
+            name = entry.name
+            if name.startswith('.'):
+                continue  # 숨김 폴더/파일 (.git, 매니페스트 등) 제외
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(name)
+                    continue
+                lower = name.lower()
+                if lower.endswith(IMAGE_EXTS + VIDEO_EXTS + ARCHIVE_EXTS):
+                    st = entry.stat()
+                    images[name] = (st.st_mtime_ns, st.st_size)
+                elif lower.endswith('.txt'):
+                    labels[name.rsplit('.', 1)[0]] = entry.stat().st_mtime_ns
+            except OSError:
+                continue  # 스캔 중에 삭제된 파일
+    return images, labels, subdirs
+
+
+def image_record(folder, name, images, labels):
+    # (절대 경로, mtime_ns, size, 라벨 mtime_ns 또는 None)
+    mtime_ns, size = images[name]
+    return os.path.join(folder, name), mtime_ns, size, labels.get(name.rsplit('.', 1)[0])
+
+
+def video_records(folder, name, images, labels):
+    # 영상은 프레임마다 레코드 하나 (프레임 라벨은 "영상 이름_프레임 번호.txt")
+    video_path = os.path.join(folder, name)
+    mtime_ns, size = images[name]
+    stem = name.rsplit('.', 1)[0]
+    try:
+        count = frame_count(video_path)
+    except OSError:
+        count = 0  # 스캔 중에 삭제된 영상
+    return [(frame_path(video_path, i), mtime_ns, size, labels.get(f"{stem}_{i:06d}")) for i in range(count)]
+
+
+def archive_records(folder, name, images, labels):
+    # tar/zip은 이미지 항목마다 레코드 하나 (라벨은 "압축 파일 이름_labels/" 폴더에서 한 번에 확인)
+    archive_path = os.path.join(folder, name)
+    mtime_ns, size = images[name]
+    try:
+        paths = member_paths(archive_path)
+    except OSError:
+        return []  # 삭제되었거나 손상된 압축 파일
+    label_mtimes = sidecar_label_mtimes(archive_path)
+    return [(path, mtime_ns, size, label_mtimes.get(path[len(archive_path) + 1:].rsplit('.', 1)[0])) for path in paths]
+
+
+class DatasetScanner:
+    # 백그라운드 스레드에서 폴더를 재귀적으로 스캔해 배치 단위로 전달하고,
+    # 이후에는 디렉터리 mtime만 폴링해서 바뀐 디렉터리만 다시 읽음 (전체 재스캔 없음)
+    # changes 큐: ('found', [record]) 첫 스캔 배치 / ('done', [record]) 첫 스캔 완료
+    #             ('added', [record]) / ('removed', [path]) 이후 변경분
+    def __init__(self, folder, batch_size=256, interval=2.0, settle=1.0):
+        self.folder = folder
+        self.batch_size = batch_size
+        self.interval = interval
+        self.settle = settle  # 방금 생긴 파일은 기록이 끝날 때까지 다음 폴링으로 미룸
+        self.changes = queue.Queue()
+        self.dirs = {}  # 디렉터리 경로 -> [mtime_ns, 이미지 이름 set, 하위 폴더 이름 set]
+        self.expanded = {}  # 영상/압축 파일 경로 -> 목록에 넣은 가상 경로들 (삭제 시 함께 제거하기 위해)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def walk(self, path):
+        # 경로 문자열 정렬 순서대로 이미지를 내보냄 (하위 폴더 이름 뒤에 구분자를 붙여 정렬하면 전체 경로 순서와 같음)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            images, labels, subdirs = scan_dir(path)
+        except OSError:
+            return
+        self.dirs[path] = [mtime_ns, set(images), set(subdirs)]
+        entries = sorted([(name, False) for name in images] + [(name + os.sep, True) for name in subdirs])
+        for key, is_dir in entries:
+            if self.stop_event.is_set():
+                return
+            if is_dir:
+                yield from self.walk(os.path.join(path, key[:-len(os.sep)]))
+            else:
+                yield from self.records(path, key, images, labels)
+
+    def records(self, folder, name, images, labels):
+        lower = name.lower()
+        if lower.endswith(VIDEO_EXTS):
+            records = video_records(folder, name, images, labels)
+        elif lower.endswith(ARCHIVE_EXTS):
+            records = archive_records(folder, name, images, labels)
+        else:
+            return [image_record(folder, name, images, labels)]
+        self.expanded[os.path.join(folder, name)] = [record[0] for record in records]
+        return records
+
+    def removed_paths(self, folder, name):
+        path = os.path.join(folder, name)
+        return self.expanded.pop(path, [path])
+
+    def run(self):
+        records, batch = [], []
+        for record in self.walk(self.folder):
+            records.append(record)
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self.changes.put(('found', batch))
+                batch = []
+        if self.stop_event.is_set():
+            return
+        if batch:
+            self.changes.put(('found', batch))
+        self.changes.put(('done', records))
+        while not self.stop_event.wait(self.interval):
+            added, removed = self.poll()
+            if removed:
+                self.changes.put(('removed', removed))
+            if added:
+                self.changes.put(('added', added))
+
+    def drop_dir(self, path, removed):
+        state = self.dirs.pop(path, None)
+        if state is None:
+            return
+        for name in state[1]:
+            removed.extend(self.removed_paths(path, name))
+        for sub in state[2]:
+            self.drop_dir(os.path.join(path, sub), removed)
+
+    def poll(self):
+        # 디렉터리마다 stat 한 번: 항목이 추가/삭제되면 디렉터리 mtime이 바뀌므로 그 디렉터리만 다시 scandir
+        added, removed = [], []
+        now_ns = time.time_ns()
+        for path in list(self.dirs):
+            state = self.dirs.get(path)
+            if state is None:
+                continue  # 상위 폴더와 함께 이미 제거됨
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                self.drop_dir(path, removed)
+                continue
+            if mtime_ns == state[0]:
+                continue
+            try:
+                images, labels, subdirs = scan_dir(path)
+            except OSError:
+                continue
+            settled = True
+            for name in sorted(set(images) - state[1]):
+                if now_ns - images[name][0] < self.settle * 1e9:
+                    settled = False  # 아직 쓰는 중일 수 있음
+                    continue
+                state[1].add(name)
+                added.extend(self.records(path, name, images, labels))
+            for name in state[1] - set(images):
+                state[1].discard(name)
+                removed.extend(self.removed_paths(path, name))
+            for name in state[2] - set(subdirs):
+                state[2].discard(name)
+                self.drop_dir(os.path.join(path, name), removed)
+            for name in sorted(set(subdirs) - state[2]):
+                state[2].add(name)
+                added.extend(self.walk(os.path.join(path, name)))
+            if settled:
+                state[0] = mtime_ns
+        added.sort()
+        removed.sort()
+        return added, removed
@@ -0,0 +1,187 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+from thumbnail_utils import make_thumbnail
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(values):
+        return np.bitwise_count(values)
+else:
+    _BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(values):
+        return _BYTE_BITS[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def dhash(img, hash_size=8):
+    # 가로로 이웃한 픽셀 밝기 비교 (9x8 -> 64비트), 작은 썸네일로도 충분
+    small = np.asarray(img.convert('L').resize((hash_size + 1, hash_size), Image.BOX), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).reshape(-1)
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def image_dhash(img_path, thumb_size):
+    # 사이드바 썸네일 디스크 캐시를 같이 쓰므로 이미 본 폴더는 원본을 다시 디코딩하지 않음
+    return dhash(make_thumbnail(img_path, thumb_size))
+
+
+class MultiIndexHash:
+    # 64비트 해시를 (max_distance + 1)개 조각으로 나눠 조각별 해시 테이블에 저장
+    # 해밍 거리가 max_distance 이하인 두 해시는 비둘기집 원리로 최소 한 조각이 같으므로 그 버킷만 검사
+    def __init__(self, bits=64, max_distance=6):
+        self.max_distance = max_distance
+        chunks = max_distance + 1
+        bounds = [round(i * bits / chunks) for i in range(chunks + 1)]
+        self.chunks = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+        self.tables = [{} for _ in self.chunks]
+        self.hashes = np.zeros(1024, dtype=np.uint64)
+        self.items = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item, h):
+        item_id = len(self.items)
+        if item_id >= len(self.hashes):
+            self.hashes = np.concatenate([self.hashes, np.zeros(len(self.hashes), dtype=np.uint64)])
+        self.hashes[item_id] = h
+        self.items.append(item)
+        for table, (shift, mask) in zip(self.tables, self.chunks):
+            table.setdefault((h >> shift) & mask, []).append(item_id)
+
+    def query(self, h, max_distance=None):
+        # [(거리, item)] 가까운 순
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        candidates = set()
+        for table, (shift, mask) in zip(self.tables, self.chunks):
+            candidates.update(table.get((h >> shift) & mask, ()))
+        if not candidates:
+            return []
+        ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        dists = popcount(self.hashes[ids] ^ np.uint64(h))
+        keep = dists <= max_distance
+        return sorted(zip(dists[keep].tolist(), [self.items[i] for i in ids[keep].tolist()]))
+
+
+class DuplicateGroups:
+    # 목록 순서대로 리더 클러스터링: 가까운 리더가 있으면 그 그룹에 넣고 없으면 새 리더가 됨
+    # (리더만 인덱싱하므로 영상처럼 조금씩 변하는 프레임이 끝없이 한 그룹으로 이어지지 않음)
+    def __init__(self, max_distance=6):
+        self.leaders = MultiIndexHash(max_distance=max_distance)
+        self.leader_of = {}  # 경로 -> 리더 경로
+        self.members = {}  # 리더 경로 -> [경로]
+        self.hashes = {}  # 경로 -> 해시
+
+    def add(self, path, h):
+        if path in self.leader_of:
+            return
+        self.hashes[path] = h
+        hits = self.leaders.query(h)
+        leader = hits[0][1] if hits else path
+        if not hits:
+            self.leaders.add(path, h)
+            self.members[path] = []
+        self.leader_of[path] = leader
+        self.members[leader].append(path)
+
+    def group(self, path):
+        leader = self.leader_of.get(path)
+        return self.members[leader] if leader is not None else [path]
+
+
+class DuplicateFinder:
+    # 백그라운드에서 image_list 의 해시를 계산해 그룹을 만들고, 결과는 메인 스레드에서 poll 로 반영
+    def __init__(self, labeler, max_distance=6, max_workers=2):
+        self.labeler = labeler
+        self.max_distance = max_distance
+        self.max_workers = max_workers
+        self.groups = DuplicateGroups(max_distance)
+        self.results = queue.Queue()
+        self.requested = set()
+        self.processed = 0
+        self.known = {}
+        self.generation = 0
+        self.poll_job = None
+        self.executor = None
+
+    def reset(self, known_hashes=None):
+        # 폴더가 바뀌면 처음부터 (매니페스트에 저장된 해시는 바로 사용)
+        self.generation += 1
+        self.groups = DuplicateGroups(self.max_distance)
+        self.requested.clear()
+        self.processed = 0
+        self.known = known_hashes or {}
+
+    def update(self, image_list):
+        # 아직 요청하지 않은 이미지만 목록 순서대로 해시 계산 요청
+        todo = [path for path in image_list if path not in self.requested]
+        if not todo:
+            return
+        self.requested.update(todo)
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        self.executor.submit(self.hash_paths, self.generation, todo)
+        if self.poll_job is None:
+            self.poll_job = self.labeler.root.after(200, self.poll_results)
+
+    def hash_paths(self, generation, paths):
+        # 워커 스레드: 순서를 유지해야 리더 클러스터링 결과가 매번 같으므로 map 으로 순서대로 전달
+        thumb_size = self.labeler.thumbnail_size
+        known = self.known
+
+        def work(path):
+            if path in known:
+                return path, known[path], False
+            try:
+                return path, image_dhash(path, thumb_size), True
+            except (OSError, ValueError):
+                return path, None, False
+
+        batch = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for result in pool.map(work, paths):
+                if generation != self.generation:
+                    return
+                batch.append(result)
+                if len(batch) >= 256:
+                    self.results.put((generation, batch))
+                    batch = []
+        self.results.put((generation, batch))
+
+    def poll_results(self):
+        self.poll_job = None
+        new_hashes, changed = [], False
+        while True:
+            try:
+                generation, batch = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation:
+                continue
+            self.processed += len(batch)
+            for path, h, is_new in batch:
+                if h is None:
+                    continue
+                self.groups.add(path, h)
+                changed = True
+                if is_new:
+                    new_hashes.append((path, h))
+        if new_hashes:
+            self.labeler.on_hashes_computed(new_hashes)
+        if changed:
+            self.labeler.update_duplicate_info()
+        if self.processed < len(self.requested):
+            self.poll_job = self.labeler.root.after(200, self.poll_results)
+
+    def group(self, path):
+        return self.groups.group(path)
+
+    def shutdown(self):
+        self.generation += 1
+        if self.poll_job is not None:
+            self.labeler.root.after_cancel(self.poll_job)
+            self.poll_job = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
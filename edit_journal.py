@@ -0,0 +1,285 @@
+import os
+import zlib
+from label_writer import format_labels, parse_labels
+from perf_trace import span
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# 세션 편집 기록 (비정상 종료 시 다음 실행에서 복구, 정상 종료하면 삭제)
+# 동시에 여러 개를 실행해도 서로의 기록을 지우지 않도록 실행마다 edit_journal.<pid>.log 를 따로 쓰고,
+# 같은 이름의 .lock 파일을 잠가서 사용 중임을 표시 (프로세스가 죽으면 OS가 잠금을 풀어줌)
+JOURNAL_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yolo_labeler", "journals")
+
+# 한 줄에 레코드 하나 (경로는 공백이 있을 수 있으므로 항상 마지막 필드)
+#   F <fid> <seq> <crc> <label_path>   파일 편집 시작 (crc: 시작 시점 라벨 내용)
+#   A <fid> <seq> <index> <box>        박스 추가 (index 위치에 삽입)
+#   D <fid> <seq> <index> <box>        박스 삭제 (되돌리기용으로 지운 박스도 기록)
+#   M <fid> <seq> <index> <old> <new>  박스 수정
+#   C <fid> <seq> <crc>                이 시점까지 반영한 내용을 라벨 파일에 기록 요청 (rename 전에 기록)
+# undo/redo는 반대 연산을 같은 형식으로 덧붙임
+
+
+def content_crc(content):
+    return zlib.crc32((content or '').encode('utf-8'))
+
+
+def format_box(box):
+    cid, xc, yc, w, h = box
+    return f"{int(cid)} {xc:.6f} {yc:.6f} {w:.6f} {h:.6f}"
+
+
+def parse_box(fields):
+    return (float(fields[0]), float(fields[1]), float(fields[2]), float(fields[3]), float(fields[4]))
+
+
+def apply_op(bboxes, op):
+    kind, index, box, new_box = op
+    if kind == 'A':
+        bboxes.insert(index, box)
+    elif kind == 'D':
+        del bboxes[index]
+    else:
+        bboxes[index] = new_box
+
+
+def inverse_op(op):
+    kind, index, box, new_box = op
+    if kind == 'A':
+        return ('D', index, box, None)
+    if kind == 'D':
+        return ('A', index, box, None)
+    return ('M', index, new_box, box)
+
+
+def read_records(path):
+    # 중간에 잘린 마지막 줄 등 해석할 수 없는 줄은 건너뜀
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return records
+    for line in lines:
+        parts = line.split(' ')
+        try:
+            kind, fid, seq = parts[0], int(parts[1]), int(parts[2])
+            if kind == 'F':
+                records.append((kind, fid, seq, int(parts[3]), ' '.join(parts[4:])))
+            elif kind == 'C':
+                records.append((kind, fid, seq, int(parts[3]), None))
+            elif kind in ('A', 'D'):
+                records.append((kind, fid, seq, int(parts[3]), (parse_box(parts[4:9]), None)))
+            elif kind == 'M':
+                records.append((kind, fid, seq, int(parts[3]), (parse_box(parts[4:9]), parse_box(parts[9:14]))))
+        except (IndexError, ValueError):
+            continue
+    return records
+
+
+def read_label_file(label_path):
+    try:
+        with open(label_path, 'r') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def lock_file(path):
+    # 잠금 파일을 열고 바로 잠금, 다른 실행이 잡고 있으면 None
+    f = open(path, 'a')
+    try:
+        if os.name == 'nt':
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def orphaned_journals(directory, own_path=None):
+    # 잠금을 잡을 수 있는 기록 = 비정상 종료한 실행이 남긴 것: [(기록 경로, 잠금)] 오래된 순
+    # 잠금은 복구를 마치고 discard_journal을 호출할 때까지 유지 (동시에 시작한 다른 실행이 같이 재생하지 않도록)
+    found = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return found
+    for name in names:
+        path = os.path.join(directory, name)
+        if not name.endswith('.log') or path == own_path:
+            continue
+        try:
+            lock = lock_file(path + '.lock')
+        except OSError:
+            continue
+        if lock is None:
+            continue  # 실행 중인 다른 창의 기록
+        try:
+            found.append((os.path.getmtime(path), path, lock))
+        except OSError:
+            lock.close()  # 그 사이 삭제된 기록: 잠금을 잡은 채로 두지 않음
+    found.sort(key=lambda item: item[0])
+    return [(path, lock) for _, path, lock in found]
+
+
+def discard_journal(path, lock):
+    # 복구한 기록 삭제: 기록을 먼저 지우고 잠금을 풂 (Windows는 열린 파일을 지울 수 없으므로 잠금 파일은 닫은 뒤 삭제)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    lock.close()
+    try:
+        os.remove(path + '.lock')
+    except OSError:
+        pass
+
+
+def recover(path):
+    # 라벨 파일별로 편집 구간(fid)을 순서대로 재생: 현재 내용과 crc가 맞는 마지막 체크포인트 이후 연산만 적용
+    # 반환: {라벨 경로: 복구할 내용 (None이면 파일 삭제)}
+    sessions = {}  # fid -> {'path', 'checkpoints': [(seq, crc)], 'ops': [(seq, op)]}
+    order = []
+    for kind, fid, seq, value, extra in read_records(path):
+        if kind == 'F':
+            sessions[fid] = {'path': extra, 'checkpoints': [(seq, value)], 'ops': []}
+            order.append(fid)
+        elif fid in sessions:
+            if kind == 'C':
+                sessions[fid]['checkpoints'].append((seq, value))
+            else:
+                box, new_box = extra
+                sessions[fid]['ops'].append((seq, (kind, value, box, new_box)))
+    contents = {}
+    for fid in order:
+        session = sessions[fid]
+        label_path = session['path']
+        if label_path not in contents:
+            contents[label_path] = read_label_file(label_path)
+        current = contents[label_path]
+        crc = content_crc(current)
+        start = next((seq for seq, cp_crc in reversed(session['checkpoints']) if cp_crc == crc), None)
+        if start is None:
+            continue  # 다른 곳에서 파일이 바뀐 경우: 덮어쓰지 않음
+        bboxes = parse_labels(current)
+        try:
+            for seq, op in session['ops']:
+                if seq > start:
+                    apply_op(bboxes, op)
+        except IndexError:
+            continue
+        contents[label_path] = format_labels(bboxes)
+    recovered = {}
+    for label_path, content in contents.items():
+        if content != read_label_file(label_path):
+            recovered[label_path] = content or None
+    return recovered
+
+
+class EditJournal:
+    # 현재 이미지의 편집을 한 줄씩 덧붙여 기록하고, undo/redo 스택은 메모리에서 관리
+    def __init__(self, directory=JOURNAL_DIR, max_undo=1000):
+        self.directory = directory
+        self.path = os.path.join(directory, f"edit_journal.{os.getpid()}.log")
+        self.max_undo = max_undo
+        os.makedirs(directory, exist_ok=True)
+        self.file = None
+        self.lock = None
+        self.seq = 0
+        self.fid = 0
+        self.label_path = None
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def open(self):
+        # 자기 기록을 먼저 잠근 뒤 다른 실행이 남긴 기록을 찾음 (orphaned_journals)
+        self.lock = lock_file(self.path + '.lock')
+        self.file = open(self.path, 'w', encoding='utf-8')
+
+    def append(self, line):
+        # 편집 한 번에 짧은 줄 하나: OS 버퍼까지만 내려보내므로 프로세스가 죽어도 남음
+        if self.file is None:
+            return
+        with span("journal.append"):
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def begin(self, label_path, content):
+        # 이미지를 열 때 호출: 시작 시점 내용의 crc를 기준점으로 기록
+        self.fid += 1
+        self.seq += 1
+        self.label_path = label_path
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.append(f"F {self.fid} {self.seq} {content_crc(content)} {label_path}")
+
+    def write_op(self, op):
+        kind, index, box, new_box = op
+        self.seq += 1
+        line = f"{kind} {self.fid} {self.seq} {index} {format_box(box)}"
+        if kind == 'M':
+            line += f" {format_box(new_box)}"
+        self.append(line)
+
+    def record(self, kind, index, box, new_box=None):
+        op = (kind, index, box, new_box)
+        self.write_op(op)
+        self.undo_stack.append(op)
+        if len(self.undo_stack) > self.max_undo:
+            del self.undo_stack[0]
+        self.redo_stack.clear()
+
+    def undo(self):
+        # 되돌릴 연산(반대 연산)을 반환하고 기록, 없으면 None
+        if not self.undo_stack:
+            return None
+        op = self.undo_stack.pop()
+        self.redo_stack.append(op)
+        inverse = inverse_op(op)
+        self.write_op(inverse)
+        return inverse
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        op = self.redo_stack.pop()
+        self.undo_stack.append(op)
+        self.write_op(op)
+        return op
+
+    def checkpoint(self, label_path, content):
+        # 라벨 파일 기록을 요청할 때 호출 (실제 rename 보다 먼저 기록되므로, rename 전에 죽으면 이전 체크포인트에서 재생)
+        if label_path == self.label_path:
+            self.append(f"C {self.fid} {self.seq} {content_crc(content)}")
+
+    def reset(self):
+        # 모든 라벨 파일이 기록된 뒤 호출: 기록을 비우고 현재 파일은 새 기준점에서 다시 시작
+        if self.file is None:
+            return
+        self.file.seek(0)
+        self.file.truncate()
+        self.label_path = None
+
+    def close(self):
+        # 모든 편집이 라벨 파일에 기록되어 비어 있으면 삭제, 남아 있으면 다음 실행에서 복구
+        if self.file is not None:
+            empty = self.file.tell() == 0
+            self.file.close()
+            self.file = None
+            if empty:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+        if self.lock is not None:
+            self.lock.close()
+            self.lock = None
+            try:
+                os.remove(self.path + '.lock')
+            except OSError:
+                pass
@@ -0,0 +1,252 @@
+import argparse
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from archive_source import is_archive_member, read_member
+from dataset_scanner import DatasetScanner
+from label_writer import label_path_for, parse_labels
+import cv2
+from tiled_source import image_size
+from video_source import frame_size, is_video_frame, read_frame
+
+# 사용 예: python export_dataset.py ./images --out ./export --val-ratio 0.1 --format coco shards
+#
+# 출력 구조
+#   annotations/instances_{train,val}.json  COCO 형식 (category_id = 클래스 번호 + 1)
+#   shards/{train,val}-00000.tar           이미지 원본 + images.json + boxes.npy
+#     boxes.npy: float32 (M, 6) = [샤드 안 이미지 번호, 클래스, xc, yc, w, h] (YOLO 정규화 좌표)
+
+
+def read_item(img_path):
+    # 워커 프로세스에서 실행: 이미지는 헤더만 읽어 크기를 얻고, 라벨 파일을 (N, 5) 배열로 변환
+    if is_video_frame(img_path):
+        width, height = frame_size(img_path)
+    elif is_archive_member(img_path):
+        width, height = image_size(io.BytesIO(read_member(img_path)))
+    else:
+        width, height = image_size(img_path)
+    try:
+        with open(label_path_for(img_path), 'r') as f:
+            bboxes = parse_labels(f.read())
+    except FileNotFoundError:
+        bboxes = []
+    return width, height, np.array(bboxes, dtype=np.float32).reshape(-1, 5)
+
+
+def read_chunk(paths):
+    # 작은 파일이 많으므로 여러 개를 한 작업으로 묶어서 프로세스 간 통신 비용을 줄임
+    results = []
+    for path in paths:
+        try:
+            results.append((path, *read_item(path), None))
+        except Exception as e:
+            results.append((path, 0, 0, None, str(e)))
+    return results
+
+
+def load_classes(path, max_class_id):
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            names = [line.strip() for line in f if line.strip()]
+    else:
+        names = []
+    for cid in range(len(names), max_class_id + 1):
+        names.append(f"class{cid}")
+    return names
+
+
+def stratified_split(items, val_ratio, seed):
+    # 이미지마다 (전체에서) 가장 드문 클래스를 계층으로 삼고, 계층마다 같은 비율로 val 에 배정
+    if val_ratio <= 0:
+        return np.zeros(len(items), dtype=bool)
+    all_classes = np.concatenate([boxes[:, 0] for _, _, _, boxes in items]).astype(np.int64) if items else np.zeros(0, np.int64)
+    freq = np.bincount(all_classes) if all_classes.size else np.zeros(0, np.int64)
+    strata = np.full(len(items), -1, dtype=np.int64)  # -1: 박스 없는 이미지
+    for i, (_, _, _, boxes) in enumerate(items):
+        if len(boxes):
+            classes = np.unique(boxes[:, 0].astype(np.int64))
+            strata[i] = classes[np.argmin(freq[classes])]
+    rng = np.random.default_rng(seed)
+    is_val = np.zeros(len(items), dtype=bool)
+    for stratum in np.unique(strata):
+        members = np.flatnonzero(strata == stratum)
+        rng.shuffle(members)
+        is_val[members[:int(round(len(members) * val_ratio))]] = True
+    return is_val
+
+
+def write_coco(path, root, items, classes):
+    # 전체 dict를 만들지 않고 이미지/어노테이션을 한 줄씩 기록
+    tmp_path = path + '.tmp'
+    ann_id = 0
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('{"info": {"description": "YOLO Image Labeling Tool export"},\n"categories": ')
+        json.dump([{"id": cid + 1, "name": name} for cid, name in enumerate(classes)], f, ensure_ascii=False)
+        f.write(',\n"images": [\n')
+        for image_id, (img_path, width, height, _) in enumerate(items, 1):
+            if image_id > 1:
+                f.write(',\n')
+            json.dump({"id": image_id, "file_name": os.path.relpath(img_path, root).replace(os.sep, '/'),
+                       "width": width, "height": height}, f, ensure_ascii=False)
+        f.write('\n],\n"annotations": [\n')
+        for image_id, (_, width, height, boxes) in enumerate(items, 1):
+            if not len(boxes):
+                continue
+            # 정규화 중심 좌표 -> 픽셀 [x_min, y_min, w, h] (이미지 단위로 한 번에 변환)
+            scale = np.array([width, height, width, height], dtype=np.float64)
+            xywh = boxes[:, 1:5].astype(np.float64) * scale
+            xywh[:, :2] -= xywh[:, 2:] / 2
+            for cid, (x, y, w, h) in zip(boxes[:, 0].astype(int).tolist(), np.round(xywh, 2).tolist()):
+                ann_id += 1
+                if ann_id > 1:
+                    f.write(',\n')
+                json.dump({"id": ann_id, "image_id": image_id, "category_id": cid + 1,
+                           "bbox": [x, y, w, h], "area": round(w * h, 2), "iscrowd": 0}, f)
+        f.write('\n]}\n')
+    os.replace(tmp_path, path)
+    return ann_id
+
+
+def write_shard(path, root, items):
+    # 워커 프로세스에서 실행: 이미지 원본은 재인코딩 없이 그대로 tar 에 넣고 박스는 배열 하나로 저장
+    tmp_path = path + '.tmp'
+    images, rows = [], []
+    nbytes = 0
+    try:
+        with tarfile.open(tmp_path, 'w') as tar:
+            for i, (img_path, width, height, boxes) in enumerate(items):
+                if is_video_frame(img_path):
+                    # 영상 프레임은 JPEG로 인코딩해서 넣음 (같은 영상의 프레임은 순서대로 이어서 디코딩됨)
+                    frame = read_frame(img_path)
+                    if frame is None:
+                        raise OSError(f"프레임을 읽을 수 없습니다: {img_path}")
+                    arcname = f"{i:06d}.jpg"
+                    data = cv2.imencode('.jpg', cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+                    add_bytes(tar, arcname, data)
+                    nbytes += len(data)
+                elif is_archive_member(img_path):
+                    # 압축 파일 항목도 원본 바이트를 그대로 넣음 (압축 해제 파일을 만들지 않음)
+                    arcname = f"{i:06d}{os.path.splitext(img_path)[1].lower()}"
+                    data = bytes(read_member(img_path))
+                    add_bytes(tar, arcname, data)
+                    nbytes += len(data)
+                else:
+                    arcname = f"{i:06d}{os.path.splitext(img_path)[1].lower()}"
+                    tar.add(img_path, arcname=arcname)
+                    nbytes += os.path.getsize(img_path)
+                images.append({"name": arcname, "file_name": os.path.relpath(img_path, root).replace(os.sep, '/'),
+                               "width": width, "height": height})
+                if len(boxes):
+                    rows.append(np.hstack([np.full((len(boxes), 1), i, dtype=np.float32), boxes]))
+            box_array = np.vstack(rows) if rows else np.zeros((0, 6), dtype=np.float32)
+            add_bytes(tar, 'boxes.npy', npy_bytes(box_array))
+            add_bytes(tar, 'images.json', json.dumps(images, ensure_ascii=False).encode('utf-8'))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(items), nbytes
+
+
+def npy_bytes(array):
+    buf = io.BytesIO()
+    np.save(buf, array)
+    return buf.getvalue()
+
+
+def add_bytes(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(data))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="YOLO 라벨을 COCO JSON과 학습용 tar 샤드로 내보냅니다.")
+    parser.add_argument('root', help="데이터셋 폴더 (하위 폴더 포함)")
+    parser.add_argument('--out', required=True, help="출력 폴더")
+    parser.add_argument('--format', nargs='+', choices=('coco', 'shards'), default=['coco', 'shards'], help="출력 형식")
+    parser.add_argument('--classes', default='classes.txt', help="클래스 이름 파일 (없으면 class0, class1, ...)")
+    parser.add_argument('--val-ratio', type=float, default=0.1, help="검증 세트 비율 (클래스 계층별)")
+    parser.add_argument('--seed', type=int, default=0, help="분할 난수 시드")
+    parser.add_argument('--shard-size', type=int, default=1000, help="샤드 하나당 이미지 수")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="워커 프로세스 수")
+    parser.add_argument('--chunk', type=int, default=256, help="워커 작업 하나당 파일 수")
+    args = parser.parse_args(argv)
+
+    root = os.path.abspath(args.root)
+    start = time.perf_counter()
+    items, failed = [], 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # 폴더를 스캔하면서 바로 워커에 넘김 (전체 목록을 기다리지 않음)
+        futures, chunk = [], []
+        for record in DatasetScanner(root).walk(root):
+            chunk.append(record[0])
+            if len(chunk) >= args.chunk:
+                futures.append(executor.submit(read_chunk, chunk))
+                chunk = []
+        if chunk:
+            futures.append(executor.submit(read_chunk, chunk))
+        for future in as_completed(futures):
+            for path, width, height, boxes, error in future.result():
+                if error is not None:
+                    failed += 1
+                    print(f"\n실패: {path}: {error}", file=sys.stderr)
+                    continue
+                items.append((path, width, height, boxes))
+            print(f"\r[{len(items) + failed}]", end='', flush=True)
+    print()
+    if not items:
+        print("내보낼 이미지가 없습니다.", file=sys.stderr)
+        return 1
+    items.sort(key=lambda item: item[0])
+    scan_elapsed = time.perf_counter() - start
+    box_total = sum(len(boxes) for _, _, _, boxes in items)
+    print(f"라벨 {len(items)}개 파일 읽음 (박스 {box_total}개, 실패 {failed}개): "
+          f"{scan_elapsed:.2f}초, {len(items) / scan_elapsed:.0f} 파일/초")
+
+    max_class_id = max((int(boxes[:, 0].max()) for _, _, _, boxes in items if len(boxes)), default=-1)
+    classes = load_classes(args.classes, max_class_id)
+    is_val = stratified_split(items, args.val_ratio, args.seed)
+    splits = {'train': [item for item, v in zip(items, is_val) if not v],
+              'val': [item for item, v in zip(items, is_val) if v]}
+
+    if 'coco' in args.format:
+        os.makedirs(os.path.join(args.out, 'annotations'), exist_ok=True)
+        for split, split_items in splits.items():
+            if split_items:
+                count = write_coco(os.path.join(args.out, 'annotations', f"instances_{split}.json"), root, split_items, classes)
+                print(f"COCO {split}: 이미지 {len(split_items)}개, 어노테이션 {count}개")
+
+    if 'shards' in args.format:
+        shard_start = time.perf_counter()
+        shard_dir = os.path.join(args.out, 'shards')
+        os.makedirs(shard_dir, exist_ok=True)
+        written = total_bytes = 0
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = []
+            for split, split_items in splits.items():
+                for k, i in enumerate(range(0, len(split_items), args.shard_size)):
+                    path = os.path.join(shard_dir, f"{split}-{k:05d}.tar")
+                    futures.append(executor.submit(write_shard, path, root, split_items[i:i + args.shard_size]))
+            for future in as_completed(futures):
+                count, nbytes = future.result()
+                written += count
+                total_bytes += nbytes
+                print(f"\r[샤드 {written}/{len(items)}]", end='', flush=True)
+        elapsed = time.perf_counter() - shard_start
+        print()
+        print(f"샤드 {len(futures)}개: {elapsed:.2f}초, {written / elapsed:.0f} 파일/초, {total_bytes / elapsed / 1024 / 1024:.1f} MB/초")
+
+    elapsed = time.perf_counter() - start
+    print(f"train {len(splits['train'])}개 / val {len(splits['val'])}개, 전체 {elapsed:.2f}초, {len(items) / elapsed:.0f} 파일/초")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import numpy as np
+from PIL import Image, ImageTk
+
+
+class FrameBuffer:
+    # 캔버스 크기마다 RGB 배열, PIL 이미지, PhotoImage를 하나씩만 만들어 두고 매 프레임 내용만 덮어씀
+    # (회전 드래그/리사이즈 중에 프레임마다 새 버퍼와 PhotoImage를 만들지 않음)
+    def __init__(self, background=(255, 255, 255)):
+        self.background = np.array(background, dtype=np.uint8)
+        self.size = None
+        self.array = None
+        self.image = None
+        self.photo = None
+        self.region = None  # 지난 프레임에서 이미지가 그려진 (x0, y0, x1, y1)
+        self.allocations = 0
+
+    def ensure(self, width, height):
+        # 크기가 바뀌었으면 True (PhotoImage가 새로 만들어졌으므로 캔버스 아이템도 바꿔야 함)
+        if self.size == (width, height):
+            return False
+        self.size = (width, height)
+        self.array = np.empty((height, width, 3), dtype=np.uint8)
+        self.array[:] = self.background
+        self.image = Image.new('RGB', (width, height))
+        self.photo = ImageTk.PhotoImage('RGB', (width, height))
+        self.region = (0, 0, 0, 0)
+        self.allocations += 1
+        return True
+
+    @property
+    def nbytes(self):
+        # 배열 + PIL 이미지 + PhotoImage (Tk는 픽셀당 4바이트)
+        if self.size is None:
+            return 0
+        width, height = self.size
+        return width * height * (3 + 3 + 4)
+
+    def target(self, x0, y0, x1, y1):
+        # 이번 프레임에서 이미지를 그릴 영역의 배열 뷰 (warp_region의 dst로 전달)
+        # 지난 프레임에 그렸지만 이번에는 비는 부분만 배경색으로 지움
+        px0, py0, px1, py1 = self.region
+        if (px0, py0, px1, py1) != (x0, y0, x1, y1):
+            array = self.array
+            array[py0:min(py1, y0), px0:px1] = self.background
+            array[max(py0, y1):py1, px0:px1] = self.background
+            array[py0:py1, px0:min(px1, x0)] = self.background
+            array[py0:py1, max(px0, x1):px1] = self.background
+            self.region = (x0, y0, x1, y1)
+        return self.array[y0:y1, x0:x1]
+
+    def present(self):
+        # 배열 -> 기존 PIL 이미지 -> 기존 PhotoImage 순서로 복사만 함
+        self.image.frombytes(self.array.data)
+        self.photo.paste(self.image)
+        return self.photo
@@ -0,0 +1,253 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from image_pyramid import ImagePyramid
+from memory_budget import PRIORITY_PREFETCH
+from PIL import Image
+from tiled_source import TiledImageSource, is_large_tiff
+from archive_source import is_archive_member, read_image, read_member, source_file
+from perf_trace import span
+from video_source import is_video_frame, read_frame
+
+# DCT 단계에서 1/2~1/8로 줄여서 디코딩할 수 있는 포맷 (PNG 등은 전체를 디코딩한 뒤 줄이므로 이득 없음)
+REDUCIBLE_EXTS = ('.jpg', '.jpeg')
+REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def oriented_size(source):
+    # 헤더만 읽어서 EXIF 방향까지 반영한 (너비, 높이) (imread도 방향을 반영해서 디코딩함)
+    with Image.open(source) as im:
+        width, height = im.size
+        if im.getexif().get(0x0112) in (5, 6, 7, 8):
+            width, height = height, width
+    return width, height
+
+
+def reduced_flags(img_path, display_size, size=None, data=None):
+    # 창에 맞춰 보일 크기 이상을 유지하는 가장 큰 축소 비율의 imread 플래그와 원본 크기
+    # size: 이미 알고 있는 원본 크기 (있으면 헤더를 읽지 않음), data: 압축 파일 항목에서 이미 읽은 바이트
+    if display_size is None or not img_path.lower().endswith(REDUCIBLE_EXTS):
+        return cv2.IMREAD_COLOR, None
+    if size is None:
+        try:
+            size = oriented_size(io.BytesIO(data if data is not None else read_member(img_path))
+                                 if is_archive_member(img_path) else img_path)
+        except OSError:
+            return cv2.IMREAD_COLOR, None
+    width, height = size
+    fit = min(display_size[0] / width, display_size[1] / height)
+    for factor, flags in REDUCED_FLAGS:
+        if factor * fit <= 1:
+            return flags, (width, height)
+    return cv2.IMREAD_COLOR, None
+
+
+def decode_image(img_path, flags=cv2.IMREAD_COLOR, data=None):
+    # 디스크에서 읽어 RGB 배열로 변환 (실패 시 None), flags로 축소 디코딩
+    if is_video_frame(img_path):
+        with span("video.frame"):
+            return read_frame(img_path)  # 영상 프레임 (읽기 전용, VideoReader의 프레임 LRU와 공유)
+    if is_archive_member(img_path):
+        with span("archive.read"):
+            img = read_image(img_path, flags, data)  # mmap에서 바로 디코딩 (압축 해제 파일을 만들지 않음)
+        if img is not None:
+            img.flags.writeable = False
+        return img
+    with span("imread"):
+        img = cv2.imread(img_path, flags)
+    if img is None:
+        return None
+    with span("cvtColor"):
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    img.flags.writeable = False  # 캐시에 공유되므로 읽기 전용
+    return img
+
+
+def file_signature(img_path):
+    try:
+        st = os.stat(source_file(img_path))
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ImageCache:
+    def __init__(self, byte_budget=1024 * 1024 * 1024, ahead=3, behind=1, max_workers=2, memory=None):
+        self.byte_budget = byte_budget
+        self.memory = memory  # 전역 메모리 예산 (MemoryAccountant), 현재 이미지는 현재 이미지 풀에서 집계
+        self.ahead = ahead
+        self.behind = behind
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # path -> (signature, ImagePyramid 또는 TiledImageSource) / LRU 순서
+        self.nbytes = 0
+        self.futures = {}  # path -> 백그라운드 디코딩 future
+        self.pinned = None  # 현재 표시 중인 이미지는 축출하지 않음
+        self.display_size = None  # 캔버스 (너비, 높이): 있으면 JPEG는 화면에 필요한 만큼만 축소 디코딩
+        self.sizes = {}  # path -> (signature, (너비, 높이)): 원본 크기를 알면 축소 여부를 정할 때 헤더를 다시 읽지 않음
+        self.hits = 0
+        self.misses = 0
+        if memory is not None:
+            memory.register("prefetch", PRIORITY_PREFETCH, self.prefetch_bytes, self.trim)
+
+    def get(self, img_path, full=False):
+        # 캐시 적중이면 즉시 반환, 선행 디코딩 중이면 완료를 기다리고, 아니면 직접 디코딩
+        # 반환값은 원본과 축소 단계를 함께 담은 ImagePyramid (full이면 축소 디코딩한 항목은 원본으로 다시 디코딩)
+        self.pinned = img_path
+        sig = file_signature(img_path)
+        with self.lock:
+            entry = self.entries.get(img_path)
+            if entry is not None and entry[0] == sig and not (full and entry[1].reduced):
+                self.entries.move_to_end(img_path)
+                self.hits += 1
+                return entry[1]
+            future = self.futures.get(img_path)
+        self.misses += 1
+        if future is not None:
+            if future.cancel():
+                with self.lock:
+                    self.futures.pop(img_path, None)
+            else:
+                try:
+                    pyramid = future.result()
+                except Exception:
+                    pyramid = None  # 선행 디코딩 실패: 아래에서 직접 다시 시도
+                if pyramid is not None and not (full and pyramid.reduced):
+                    return pyramid
+        try:
+            return self.decode_into_cache(img_path, sig, full)
+        except Exception:
+            # 손상된 파일 하나(압축 항목, TIFF 등)의 예외가 Tk 스레드로 올라가 탐색이 멈추지 않도록 읽을 수 없는 이미지로 처리
+            return None
+
+    def set_known_sizes(self, sizes):
+        # 폴더를 열 때 매니페스트에 저장된 크기 {path: (signature, (너비, 높이))}
+        with self.lock:
+            self.sizes = dict(sizes)
+
+    def known_size(self, img_path, sig):
+        with self.lock:
+            known = self.sizes.get(img_path)
+        return known[1] if known is not None and known[0] == sig else None
+
+    def request_full(self, img_path):
+        # 확대할 때: 원본 해상도 디코딩을 백그라운드에서 시작 (완료되면 캐시 항목을 교체)
+        return self.executor.submit(self.decode_into_cache, img_path, file_signature(img_path), True)
+
+    def put(self, img_path, sig, pyramid):
+        with self.lock:
+            old = self.entries.pop(img_path, None)
+            if old is not None:
+                self.nbytes -= old[1].nbytes
+                if old[1] is not pyramid and img_path != self.pinned:
+                    old[1].close()
+            self.entries[img_path] = (sig, pyramid)
+            self.nbytes += pyramid.nbytes
+            self.evict_locked(self.nbytes - self.byte_budget)
+        if self.memory is not None:
+            self.memory.request()  # 선행 디코딩 워커에서도 불리므로 예산 적용은 Tk 스레드에서
+
+    def evict_locked(self, excess):
+        # 오래된 순서로 excess 바이트 이상 해제 (현재 이미지 제외), 해제한 바이트 수 반환
+        freed = 0
+        for path in list(self.entries):
+            if freed >= excess:
+                break
+            if path == self.pinned:
+                continue
+            source = self.entries.pop(path)[1]
+            source.close()  # 타일 소스는 TIFF 파일 핸들을 닫음
+            self.nbytes -= source.nbytes
+            freed += source.nbytes
+        return freed
+
+    def trim(self, excess):
+        with self.lock:
+            return self.evict_locked(excess)
+
+    def prefetch_bytes(self):
+        # 현재 이미지를 뺀 나머지 (현재 이미지는 화면 쪽에서 따로 집계)
+        with self.lock:
+            entry = self.entries.get(self.pinned)
+            return self.nbytes - (entry[1].nbytes if entry is not None else 0)
+
+    def invalidate(self, img_path):
+        with self.lock:
+            entry = self.entries.pop(img_path, None)
+            if entry is not None:
+                self.nbytes -= entry[1].nbytes
+                if img_path != self.pinned:
+                    entry[1].close()  # 축출과 같이 타일 소스의 TIFF 파일 핸들을 닫음 (화면에 표시 중이면 그대로 둠)
+
+    def prefetch(self, image_list, index):
+        # 다음 N장, 이전 M장을 백그라운드에서 미리 디코딩 (가까운 순서로 요청)
+        order = []
+        for step in range(1, max(self.ahead, self.behind) + 1):
+            if step <= self.ahead and index + step < len(image_list):
+                order.append(image_list[index + step])
+            if step <= self.behind and index - step >= 0:
+                order.append(image_list[index - step])
+        wanted = set(order)
+        with self.lock:
+            for path, future in list(self.futures.items()):
+                if path not in wanted and future.cancel():
+                    del self.futures[path]
+            for path in order:
+                if path in self.entries or path in self.futures:
+                    continue
+                self.futures[path] = self.executor.submit(self.prefetch_one, path)
+
+    def decode_into_cache(self, img_path, sig, full=False):
+        # 디코딩과 밉맵 생성을 함께 해서 캐시에 넣음 (선행 디코딩 스레드에서도 사용)
+        if is_large_tiff(img_path):
+            # 대형 TIFF는 overview만 만들고 나머지는 화면에 보이는 타일만 필요할 때 디코딩
+            try:
+                source = TiledImageSource(img_path)
+            except (ValueError, OSError):
+                source = None
+            if source is not None:
+                self.put(img_path, sig, source)
+                return source
+        size = self.known_size(img_path, sig)
+        probe = not full and size is None and self.display_size is not None and img_path.lower().endswith(REDUCIBLE_EXTS)
+        # 압축 파일 항목은 크기 확인과 디코딩에 같은 바이트를 사용 (항목을 두 번 읽지 않음)
+        data = None
+        if probe and is_archive_member(img_path):
+            try:
+                data = read_member(img_path)
+            except OSError:
+                return None
+        flags, full_size = (cv2.IMREAD_COLOR, None) if full else reduced_flags(img_path, self.display_size, size, data)
+        img = decode_image(img_path, flags, data)
+        if img is None:
+            return None
+        with self.lock:
+            self.sizes[img_path] = (sig, full_size or (img.shape[1], img.shape[0]))
+        with span("pyramid"):
+            pyramid = ImagePyramid(img, full_size=full_size)
+        self.put(img_path, sig, pyramid)
+        return pyramid
+
+    def prefetch_one(self, img_path):
+        try:
+            return self.decode_into_cache(img_path, file_signature(img_path))
+        finally:
+            with self.lock:
+                self.futures.pop(img_path, None)
+
+    def clear(self):
+        with self.lock:
+            for future in self.futures.values():
+                future.cancel()
+            self.futures.clear()
+            for _, source in self.entries.values():
+                source.close()
+            self.entries.clear()
+            self.nbytes = 0
+
+    def shutdown(self):
+        self.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,55 @@
+import cv2
+import numpy as np
+
+
+def warp_region(src, x0, y0, rx, ry, out_w, out_h, dst=None):
+    # src 좌표 (x0, y0)부터 출력 1픽셀당 (rx, ry)만큼 진행하며 샘플링 (픽셀 중심 기준 역변환)
+    M = np.array([[rx, 0, x0 + 0.5 * rx - 0.5],
+                  [0, ry, y0 + 0.5 * ry - 0.5]], dtype=np.float64)
+    return cv2.warpAffine(src, M, (out_w, out_h), dst=dst,
+                          flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                          borderMode=cv2.BORDER_REPLICATE)
+
+
+class ImagePyramid:
+    # 이미지를 1/2씩 줄인 밉맵 단계들: 화면 배율에 가장 가까운(더 큰) 단계에서만 샘플링
+    # full_size: 축소 디코딩한 이미지면 원본 (너비, 높이) (좌표는 항상 원본 기준)
+    def __init__(self, image, min_size=256, full_size=None):
+        self.levels = [image]
+        while max(self.levels[-1].shape[:2]) > min_size * 2:
+            self.levels.append(cv2.pyrDown(self.levels[-1]))
+        for level in self.levels[1:]:
+            level.flags.writeable = False
+        self.width, self.height = full_size or (image.shape[1], image.shape[0])
+
+    @property
+    def base(self):
+        return self.levels[0]
+
+    @property
+    def reduced(self):
+        return self.levels[0].shape[1] < self.width
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+    def close(self):
+        pass  # 배열만 가지고 있으므로 닫을 파일이 없음 (TiledImageSource와 같은 인터페이스)
+
+    def level_for(self, scale):
+        # 배율(화면 픽셀 / 원본 픽셀) 이상의 해상도를 가진 가장 작은 단계
+        for level in reversed(self.levels):
+            if level.shape[1] / self.width >= scale * 0.999:
+                return level
+        return self.levels[0]
+
+    def render(self, x0, y0, x1, y1, out_w, out_h, dst=None):
+        # 원본 좌표의 (x0, y0)-(x1, y1) 영역을 out_w x out_h 로 그림 (필요한 단계에서 바로 샘플링)
+        scale = out_w / max(x1 - x0, 1e-6)
+        level = self.level_for(scale)
+        ls_x = level.shape[1] / self.width
+        ls_y = level.shape[0] / self.height
+        rx = (x1 - x0) * ls_x / out_w
+        ry = (y1 - y0) * ls_y / out_h
+        return warp_region(level, x0 * ls_x, y0 * ls_y, rx, ry, out_w, out_h, dst)
@@ -0,0 +1,201 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from dataset_scanner import DatasetScanner
+from label_writer import label_path_for
+
+# 사용 예: python label_validator.py ./images --classes classes.txt --json report.json
+
+ISSUE_NAMES = {
+    'read': "파일 읽기 오류",
+    'format': "필드 수/숫자 형식 오류",
+    'nonfinite': "NaN/무한대 값",
+    'class': "클래스 번호 오류",
+    'range': "좌표 범위 초과",
+    'zero_area': "넓이 0 박스",
+    'duplicate': "중복 박스",
+}
+
+
+def parse_label_file(label_path):
+    # 줄 번호(1부터)와 함께 (N, 5) 배열로 변환, 형식이 틀린 줄은 (줄 번호, 검사 이름, 설명)으로 따로 모음
+    try:
+        with open(label_path, 'r') as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return np.zeros((0, 5)), np.zeros(0, np.int32), []
+    except (UnicodeDecodeError, PermissionError) as e:
+        # 한 파일 때문에 전체 검사가 중단되지 않도록 파일 단위 문제로 보고 (줄 번호 0)
+        return np.zeros((0, 5)), np.zeros(0, np.int32), [(0, 'read', f"{type(e).__name__}: {e}")]
+    rows, line_nos, malformed = [], [], []
+    for line_no, line in enumerate(lines, 1):
+        parts = line.split()
+        if not parts:
+            continue
+        if len(parts) == 5:
+            rows.append(parts)
+            line_nos.append(line_no)
+        else:
+            malformed.append((line_no, 'format', f"필드 {len(parts)}개"))
+    try:
+        boxes = np.array(rows, dtype=np.float64).reshape(-1, 5)
+    except ValueError:
+        # 숫자가 아닌 값이 섞인 파일만 줄 단위로 다시 확인
+        good, good_nos = [], []
+        for parts, line_no in zip(rows, line_nos):
+            try:
+                good.append([float(v) for v in parts])
+                good_nos.append(line_no)
+            except ValueError:
+                malformed.append((line_no, 'format', "숫자가 아닌 값"))
+        boxes, line_nos = np.array(good, dtype=np.float64).reshape(-1, 5), good_nos
+    return boxes, np.array(line_nos, dtype=np.int32), malformed
+
+
+def parse_chunk(start, image_paths):
+    # 워커 프로세스에서 실행: 여러 파일을 한 번에 읽어 배열 하나로 합쳐서 반환 (프로세스 간 전송 횟수 감소)
+    all_boxes, all_files, all_lines, malformed = [], [], [], []
+    for offset, img_path in enumerate(image_paths):
+        boxes, line_nos, bad = parse_label_file(label_path_for(img_path))
+        if len(boxes):
+            all_boxes.append(boxes)
+            all_files.append(np.full(len(boxes), start + offset, dtype=np.int32))
+            all_lines.append(line_nos)
+        malformed.extend((start + offset, line_no, name, reason) for line_no, name, reason in bad)
+    if not all_boxes:
+        return np.zeros((0, 5)), np.zeros(0, np.int32), np.zeros(0, np.int32), malformed
+    return np.vstack(all_boxes), np.concatenate(all_files), np.concatenate(all_lines), malformed
+
+
+def load_labels(image_paths, workers=None, chunk=512):
+    # 모든 라벨을 하나의 배열로: boxes (M, 5), file_idx (M,), line_no (M,)
+    parts, malformed = [], []
+    ranges = [(i, image_paths[i:i + chunk]) for i in range(0, len(image_paths), chunk)]
+    if len(ranges) <= 1 or workers == 1:
+        results = [parse_chunk(start, paths) for start, paths in ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results = list(executor.map(parse_chunk, *zip(*ranges)))
+    for boxes, files, lines, bad in results:
+        parts.append((boxes, files, lines))
+        malformed.extend(bad)
+    if not parts:
+        return np.zeros((0, 5)), np.zeros(0, np.int32), np.zeros(0, np.int32), malformed
+    return (np.vstack([p[0] for p in parts]), np.concatenate([p[1] for p in parts]),
+            np.concatenate([p[2] for p in parts]), malformed)
+
+
+def check_boxes(boxes, file_idx, num_classes, eps=1e-6, min_size=0.0):
+    # 모든 검사를 배열 연산으로 수행: {검사 이름: 해당 박스 행 번호 배열}
+    cid, xc, yc, w, h = boxes.T
+    checks = {}
+    # NaN은 모든 비교가 False라 아래 검사를 통과하므로 따로 검사하고, 나머지 검사는 유한한 박스만 대상으로 함
+    finite = np.isfinite(boxes).all(axis=1)
+    checks['nonfinite'] = np.flatnonzero(~finite)
+    bad_class = (cid != np.floor(cid)) | (cid < 0)
+    if num_classes is not None:
+        bad_class |= cid >= num_classes
+    checks['class'] = np.flatnonzero(bad_class & finite)
+    out_of_range = ((xc - w / 2 < -eps) | (xc + w / 2 > 1 + eps) |
+                    (yc - h / 2 < -eps) | (yc + h / 2 > 1 + eps) | (w > 1 + eps) | (h > 1 + eps))
+    checks['range'] = np.flatnonzero(out_of_range & finite)
+    checks['zero_area'] = np.flatnonzero(((w <= min_size) | (h <= min_size)) & finite)
+    # 같은 파일 안에서 (저장 정밀도인 소수 6자리 기준으로) 완전히 같은 줄: 정렬 후 이웃 비교
+    if len(boxes):
+        rounded = np.round(boxes, 6)
+        order = np.lexsort((rounded[:, 4], rounded[:, 3], rounded[:, 2], rounded[:, 1], rounded[:, 0], file_idx))
+        same = (file_idx[order][1:] == file_idx[order][:-1]) & np.all(rounded[order][1:] == rounded[order][:-1], axis=1)
+        checks['duplicate'] = np.sort(order[1:][same])
+    else:
+        checks['duplicate'] = np.zeros(0, np.int64)
+    return checks
+
+
+class ValidationReport:
+    def __init__(self, image_paths, boxes, file_idx, line_no, malformed, checks, elapsed):
+        self.image_paths = image_paths
+        self.box_count = len(boxes)
+        self.elapsed = elapsed
+        self.counts = {name: len(rows) for name, rows in checks.items()}
+        self.counts['read'] = self.counts['format'] = 0
+        # 이미지별 문제 목록: 경로 -> [(줄 번호, 검사 이름, 설명)]
+        self.issues = {}
+        for file, line, name, reason in malformed:
+            self.counts[name] += 1
+            self.issues.setdefault(image_paths[file], []).append((line, name, reason))
+        for name, rows in checks.items():
+            for row in rows.tolist():
+                cid, xc, yc, w, h = boxes[row].tolist()
+                detail = f"{int(cid) if cid.is_integer() else cid} {xc:.4f} {yc:.4f} {w:.4f} {h:.4f}"
+                self.issues.setdefault(image_paths[file_idx[row]], []).append((int(line_no[row]), name, detail))
+        for issues in self.issues.values():
+            issues.sort()
+
+    @property
+    def issue_count(self):
+        return sum(self.counts.values())
+
+    def summary(self):
+        lines = [f"라벨 파일 {len(self.image_paths)}개, 박스 {self.box_count}개 검사 ({self.elapsed:.2f}초)"]
+        for name, label in ISSUE_NAMES.items():
+            lines.append(f"  {label}: {self.counts.get(name, 0)}개")
+        lines.append(f"문제 있는 이미지: {len(self.issues)}개")
+        return '\n'.join(lines)
+
+    def to_json(self):
+        return {
+            'files': len(self.image_paths), 'boxes': self.box_count, 'elapsed': self.elapsed, 'counts': self.counts,
+            'issues': {path: [{'line': line, 'check': name, 'detail': detail} for line, name, detail in issues]
+                       for path, issues in sorted(self.issues.items())},
+        }
+
+
+def validate(image_paths, num_classes=None, workers=None):
+    start = time.perf_counter()
+    boxes, file_idx, line_no, malformed = load_labels(image_paths, workers)
+    checks = check_boxes(boxes, file_idx, num_classes)
+    return ValidationReport(image_paths, boxes, file_idx, line_no, malformed, checks, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="폴더의 YOLO 라벨 파일을 검사합니다.")
+    parser.add_argument('root', help="데이터셋 폴더 (하위 폴더 포함)")
+    parser.add_argument('--classes', default='classes.txt', help="클래스 이름 파일 (없으면 클래스 번호 상한은 검사하지 않음)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="워커 프로세스 수")
+    parser.add_argument('--json', help="전체 결과를 저장할 JSON 파일")
+    parser.add_argument('--limit', type=int, default=50, help="화면에 출력할 문제 수")
+    args = parser.parse_args(argv)
+
+    num_classes = None
+    if os.path.exists(args.classes):
+        with open(args.classes, 'r', encoding='utf-8') as f:
+            num_classes = sum(1 for line in f if line.strip())
+    root = os.path.abspath(args.root)
+    # 라벨 파일이 있는 이미지만 검사
+    image_paths = [record[0] for record in DatasetScanner(root).walk(root) if record[3] is not None]
+    report = validate(image_paths, num_classes, args.workers)
+
+    print(report.summary())
+    shown = 0
+    for path, issues in sorted(report.issues.items()):
+        for line, name, detail in issues:
+            if shown >= args.limit:
+                break
+            print(f"{os.path.relpath(label_path_for(path), root)}:{line}: {ISSUE_NAMES[name]}: {detail}")
+            shown += 1
+    if report.issue_count > shown:
+        print(f"... 외 {report.issue_count - shown}개")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report.to_json(), f, ensure_ascii=False, indent=1)
+    print(f"{report.box_count / max(report.elapsed, 1e-9):.0f} 박스/초")
+    return 1 if report.issue_count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
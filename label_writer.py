@@ -0,0 +1,131 @@
+import os
+import threading
+from perf_trace import span
+from video_source import split_frame_path
+from archive_source import member_label_path, split_member_path
+
+
+def label_path_for(image_path):
+    # 이미지와 같은 이름의 .txt 파일 (영상 프레임 "영상.mp4#000012"는 영상_000012.txt,
+    # 압축 파일 항목 "shard.tar#a/b.jpg"는 shard_labels/a/b.txt)
+    archive_path, name = split_member_path(image_path)
+    if archive_path is not None:
+        return member_label_path(archive_path, name)
+    video_path, index = split_frame_path(image_path)
+    if video_path is not None:
+        return f"{video_path.rsplit('.', 1)[0]}_{index:06d}.txt"
+    return image_path.rsplit('.', 1)[0] + '.txt'
+
+
+def format_labels(bboxes):
+    return ''.join(f"{int(cid)} {xc:.6f} {yc:.6f} {w:.6f} {h:.6f}\n" for cid, xc, yc, w, h in bboxes)
+
+
+def parse_labels(text):
+    bboxes = []
+    for line in text.splitlines():
+        parts = line.strip().split()
+        if len(parts) == 5:
+            bboxes.append(tuple(map(float, parts)))
+    return bboxes
+
+
+def write_atomic(path, content):
+    # 임시 파일에 쓴 뒤 rename 하므로 중간에 죽어도 잘린 라벨 파일이 남지 않음
+    folder = os.path.dirname(path)
+    tmp_path = os.path.join(folder, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    try:
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder, exist_ok=True)  # 압축 파일 항목의 라벨 폴더는 처음 저장할 때 만듦
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class LabelWriter:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending = {}  # label_path -> 내용 (None이면 파일 삭제), 같은 파일은 마지막 내용만 남김
+        self.writing = None
+        self.queued = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failed = 0
+        self.last_error = None
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name="label-writer", daemon=True)
+        self.thread.start()
+
+    def save(self, image_path, bboxes):
+        self.enqueue(label_path_for(image_path), format_labels(bboxes) if bboxes else None)
+
+    def enqueue(self, label_path, content):
+        with self.cond:
+            if label_path in self.pending:
+                self.coalesced += 1
+            self.pending[label_path] = content
+            self.queued += 1
+            self.cond.notify_all()
+
+    def read(self, label_path):
+        # 아직 기록되지 않은 내용이 있으면 그것을 우선 반환
+        with self.cond:
+            if label_path in self.pending:
+                return self.pending[label_path]
+            if self.writing is not None and self.writing[0] == label_path:
+                return self.writing[1]
+        if not os.path.exists(label_path):
+            return None
+        with open(label_path, 'r') as f:
+            return f.read()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.stopped:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                label_path = next(iter(self.pending))
+                self.writing = (label_path, self.pending.pop(label_path))
+            content = self.writing[1]
+            try:
+                with span("labels.write"):
+                    if content is None:
+                        if os.path.exists(label_path):
+                            os.remove(label_path)
+                    else:
+                        write_atomic(label_path, content)
+                error = None
+            except OSError as e:
+                error = e
+            with self.cond:
+                self.writing = None
+                if error is None:
+                    self.written += 1
+                else:
+                    self.failed += 1
+                    self.last_error = f"{label_path}: {error}"
+                self.cond.notify_all()
+
+    def pending_count(self):
+        with self.cond:
+            return len(self.pending) + (1 if self.writing is not None else 0)
+
+    def flush(self, timeout=None):
+        # 대기 중인 모든 쓰기가 끝날 때까지 기다림 (종료/폴더 전환 시 사용)
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.pending and self.writing is None, timeout)
+
+    def stop(self, timeout=None):
+        self.flush(timeout)
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        self.thread.join(timeout)
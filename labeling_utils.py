@@ -1,33 +1,227 @@
 import tkinter as tk
+from spatial_index import BoxGridIndex
+from perf_trace import traced
+
+BOX_COLORS = ['red', 'blue', 'green', 'yellow', 'purple', 'orange']
+
 
 class LabelingUtils:
     def __init__(self, labeler):
         self.labeler = labeler
-        self.labeler.bbox_rects = []
-        self.labeler.bbox_texts = []  # Track class text items
+        # 박스마다 고정 ID를 부여하고 캔버스 아이템에 "bbox", f"box{ID}" 태그를 붙여 관리
+        self.box_ids = []  # self.labeler.bboxes 와 같은 순서
+        self.next_box_id = 0
+        self.drawn_geometry = None  # 현재 캔버스 아이템이 그려진 기준 이미지 위치/크기
+        self.index = BoxGridIndex()  # 클릭/올가미 선택용 공간 인덱스 (box_id 기준)
+        self.selected_ids = set()
+        self.lasso_start = None
+        self.lasso_rect = None
+        self.hit_tolerance = 6  # 테두리 클릭 허용 거리 (캔버스 픽셀)
+
+    def box_bounds(self, box):
+        cid, xc, yc, w, h = box
+        return (xc - w / 2, yc - h / 2, xc + w / 2, yc + h / 2)
+
+    def canvas_to_norm(self, x, y):
+        off_x, off_y, img_w, img_h = self.labeler.image_geometry
+        return (x - off_x) / img_w, (y - off_y) / img_h
+
+    def box_canvas_coords(self, box, geometry):
+        off_x, off_y, img_w, img_h = geometry
+        cid, xc, yc, w, h = box
+        return (off_x + (xc - w / 2) * img_w, off_y + (yc - h / 2) * img_h,
+                off_x + (xc + w / 2) * img_w, off_y + (yc + h / 2) * img_h)
+
+    def create_box_items(self, box_id, box, geometry):
+        canvas = self.labeler.canvas
+        cid = int(box[0])
+        x1, y1, x2, y2 = self.box_canvas_coords(box, geometry)
+        color = BOX_COLORS[cid % len(BOX_COLORS)]
+        tags = ("bbox", f"box{box_id}")
+        canvas.create_rectangle(x1, y1, x2, y2, outline=color, width=4 if box_id in self.selected_ids else 2, tags=tags + ("bbox_rect",))
+        if cid < len(self.labeler.classes):
+            canvas.create_text(x1, y1, text=self.labeler.classes[cid], fill=color, anchor=tk.SW, tags=tags + ("bbox_text",))
 
+    def clear_boxes(self):
+        # 이미지가 바뀔 때 호출: 기존 박스 아이템과 ID를 모두 버림
+        self.labeler.canvas.delete("bbox")
+        self.box_ids = []
+        self.drawn_geometry = None
+        self.index.clear()
+        self.selected_ids.clear()
+
+    @traced("draw_all_bboxes")
     def draw_all_bboxes(self):
-        for rect in self.labeler.bbox_rects:
-            self.labeler.canvas.delete(rect)
-        for text in self.labeler.bbox_texts:
-            self.labeler.canvas.delete(text)
-        self.labeler.bbox_rects.clear()
-        self.labeler.bbox_texts.clear()
-        if not self.labeler.current_image:
-            return
-        img_w, img_h = self.labeler.current_image.size
-        off_x = (self.labeler.canvas_width - img_w) // 2
-        off_y = (self.labeler.canvas_height - img_h) // 2
-        colors = ['red', 'blue', 'green', 'yellow', 'purple', 'orange']
-        for cid, xc, yc, w, h in self.labeler.bboxes:
-            x1, y1 = off_x + (xc - w / 2) * img_w, off_y + (yc - h / 2) * img_h
-            x2, y2 = off_x + (xc + w / 2) * img_w, off_y + (yc + h / 2) * img_h
-            color = colors[int(cid) % len(colors)]
-            rect = self.labeler.canvas.create_rectangle(x1, y1, x2, y2, outline=color, width=2)
-            self.labeler.bbox_rects.append(rect)
-            if int(cid) < len(self.labeler.classes):
-                text = self.labeler.canvas.create_text(x1, y1 - 10, text=self.labeler.classes[int(cid)], fill=color, anchor=tk.W)
-                self.labeler.bbox_texts.append(text)
+        # 전체 재구성 (이미지 로드, 클래스 변경 등 드문 경우에만 사용)
+        self.labeler.canvas.delete("bbox")
+        self.box_ids = []
+        self.index.clear()
+        self.selected_ids.clear()
+        geometry = self.labeler.image_geometry
+        self.drawn_geometry = geometry
+        for box in self.labeler.bboxes:
+            box_id = self.next_box_id
+            self.next_box_id += 1
+            self.box_ids.append(box_id)
+            self.index.insert(box_id, self.box_bounds(box))
+            if geometry is not None:
+                self.create_box_items(box_id, box, geometry)
+
+    def on_geometry_changed(self):
+        # 리사이즈/회전 시 아이템을 다시 만들지 않고 canvas.scale/move 로 좌표만 변환
+        geometry = self.labeler.image_geometry
+        old = self.drawn_geometry
+        if len(self.box_ids) != len(self.labeler.bboxes) or old is None or geometry is None:
+            self.draw_all_bboxes()
+            return
+        if old == geometry:
+            return
+        canvas = self.labeler.canvas
+        sx = geometry[2] / old[2] if old[2] else 1.0
+        sy = geometry[3] / old[3] if old[3] else 1.0
+        canvas.scale("bbox", old[0], old[1], sx, sy)
+        canvas.move("bbox", geometry[0] - old[0], geometry[1] - old[1])
+        self.drawn_geometry = geometry
+
+    def add_box(self, box, index=None, record=True):
+        # index를 주면 그 위치에 삽입 (삭제 되돌리기), record=False면 편집 기록에 남기지 않음 (undo/redo 재생)
+        bboxes = self.labeler.bboxes
+        if index is None:
+            index = len(bboxes)
+        box_id = self.next_box_id
+        self.next_box_id += 1
+        bboxes.insert(index, box)
+        self.box_ids.insert(index, box_id)
+        self.index.insert(box_id, self.box_bounds(box))
+        if self.drawn_geometry is not None:
+            self.create_box_items(box_id, box, self.drawn_geometry)
+        self.labeler.label_listbox.insert(index, self.labeler.label_list_text(index, box))
+        self.renumber_list(index + 1)
+        if record:
+            self.labeler.journal.record('A', index, box)
+        return box_id
+
+    def remove_box(self, index, record=True):
+        box_id = self.box_ids.pop(index)
+        box = self.labeler.bboxes.pop(index)
+        self.index.remove(box_id)
+        self.selected_ids.discard(box_id)
+        self.labeler.canvas.delete(f"box{box_id}")
+        self.labeler.label_listbox.delete(index)
+        self.renumber_list(index)
+        if record:
+            self.labeler.journal.record('D', index, box)
+        return box_id
+
+    def renumber_list(self, start):
+        # 뒤쪽 항목은 번호만 바뀌므로 해당 줄만 갱신
+        listbox = self.labeler.label_listbox
+        for i in range(start, len(self.labeler.bboxes)):
+            listbox.delete(i)
+            listbox.insert(i, self.labeler.label_list_text(i, self.labeler.bboxes[i]))
+
+    def modify_box(self, index, box, record=True):
+        box_id = self.box_ids[index]
+        old_box = self.labeler.bboxes[index]
+        self.labeler.bboxes[index] = box
+        self.index.insert(box_id, self.box_bounds(box))
+        self.labeler.canvas.delete(f"box{box_id}")
+        if self.drawn_geometry is not None:
+            self.create_box_items(box_id, box, self.drawn_geometry)
+        listbox = self.labeler.label_listbox
+        listbox.delete(index)
+        listbox.insert(index, self.labeler.label_list_text(index, box))
+        if record:
+            self.labeler.journal.record('M', index, old_box, box)
+
+    def apply_journal_op(self, op):
+        kind, index, box, new_box = op
+        if kind == 'A':
+            self.add_box(box, index, record=False)
+        elif kind == 'D':
+            self.remove_box(index, record=False)
+        else:
+            self.modify_box(index, new_box, record=False)
+
+    def undo(self):
+        if self.labeler.mode != 'labeling':
+            return
+        op = self.labeler.journal.undo()
+        if op is not None:
+            self.apply_journal_op(op)
+            self.save_labels_to_txt()
+
+    def redo(self):
+        if self.labeler.mode != 'labeling':
+            return
+        op = self.labeler.journal.redo()
+        if op is not None:
+            self.apply_journal_op(op)
+            self.save_labels_to_txt()
+
+    def box_at(self, x, y):
+        # 점을 포함하는 가장 작은 박스, 없으면 테두리가 허용 거리 안에 있는 박스
+        if self.labeler.image_geometry is None or not self.box_ids:
+            return None
+        nx, ny = self.canvas_to_norm(x, y)
+        hits = self.index.query_point(nx, ny)
+        if hits:
+            return hits[0]
+        img_w, img_h = self.labeler.image_geometry[2:]
+        return self.index.nearest_edge(nx, ny, self.hit_tolerance / img_w, self.hit_tolerance / img_h)
+
+    def select_boxes(self, box_ids, sync_listbox=True):
+        canvas = self.labeler.canvas
+        for box_id in self.selected_ids - set(box_ids):
+            canvas.itemconfig(f"box{box_id}&&bbox_rect", width=2)
+        for box_id in set(box_ids) - self.selected_ids:
+            canvas.itemconfig(f"box{box_id}&&bbox_rect", width=4)
+        self.selected_ids = set(box_ids)
+        if sync_listbox:
+            listbox = self.labeler.label_listbox
+            listbox.selection_clear(0, tk.END)
+            indices = sorted(self.box_ids.index(box_id) for box_id in self.selected_ids)
+            for i in indices:
+                listbox.selection_set(i)
+            if indices:
+                listbox.see(indices[0])
+
+    def on_listbox_select(self, event=None):
+        sel = self.labeler.label_listbox.curselection()
+        self.select_boxes([self.box_ids[i] for i in sel if i < len(self.box_ids)], sync_listbox=False)
+
+    def start_lasso(self, event):
+        if self.labeler.mode != 'labeling' or self.labeler.image_geometry is None:
+            return
+        self.lasso_start = (event.x, event.y)
+
+    def draw_lasso(self, event):
+        if self.lasso_start is None:
+            return
+        x0, y0 = self.lasso_start
+        if self.lasso_rect:
+            self.labeler.canvas.coords(self.lasso_rect, x0, y0, event.x, event.y)
+        else:
+            self.lasso_rect = self.labeler.canvas.create_rectangle(x0, y0, event.x, event.y, outline='gray', dash=(2, 2))
+
+    def end_lasso(self, event):
+        if self.lasso_start is None:
+            return
+        x0, y0 = self.lasso_start
+        self.lasso_start = None
+        if self.lasso_rect:
+            self.labeler.canvas.delete(self.lasso_rect)
+            self.lasso_rect = None
+        nx0, ny0 = self.canvas_to_norm(x0, y0)
+        nx1, ny1 = self.canvas_to_norm(event.x, event.y)
+        self.select_boxes(self.index.query_rect(nx0, ny0, nx1, ny1))
+
+    def delete_selected_boxes(self, event=None):
+        if self.labeler.mode != 'labeling' or not self.selected_ids:
+            return
+        for index in sorted((self.box_ids.index(box_id) for box_id in self.selected_ids), reverse=True):
+            self.remove_box(index)
+        self.save_labels_to_txt()
 
     def start_bbox(self, event):
         if self.labeler.mode != 'labeling' or not self.labeler.current_image:
@@ -41,9 +235,10 @@ class LabelingUtils:
         if self.labeler.mode != 'labeling' or self.labeler.start_x is None:
             return
         if self.labeler.current_bbox:
-            self.labeler.canvas.delete(self.labeler.current_bbox)
-        self.labeler.current_bbox = self.labeler.canvas.create_rectangle(
-            self.labeler.start_x, self.labeler.start_y, event.x, event.y, outline='red', width=2, dash=(5, 5))
+            self.labeler.canvas.coords(self.labeler.current_bbox, self.labeler.start_x, self.labeler.start_y, event.x, event.y)
+        else:
+            self.labeler.current_bbox = self.labeler.canvas.create_rectangle(
+                self.labeler.start_x, self.labeler.start_y, event.x, event.y, outline='red', width=2, dash=(5, 5))
 
     def end_bbox(self, event):
         if self.labeler.mode != 'labeling' or self.labeler.start_x is None:
@@ -52,57 +247,42 @@ class LabelingUtils:
             if self.labeler.current_bbox:
                 self.labeler.canvas.delete(self.labeler.current_bbox)
             self.labeler.start_x = self.labeler.current_bbox = None
+            # 드래그 없이 클릭하면 자동 라벨 후보는 수락, 아니면 해당 위치의 박스를 선택
+            if self.labeler.prelabeler.accept_at(event.x, event.y):
+                return
+            box_id = self.box_at(event.x, event.y)
+            self.select_boxes([box_id] if box_id is not None else [])
             return
-        img_w, img_h = self.labeler.current_image.size
-        off_x, off_y = (self.labeler.canvas_width - img_w) // 2, (self.labeler.canvas_height - img_h) // 2
+        off_x, off_y, img_w, img_h = self.labeler.image_geometry
         x1, y1 = max(0, min(self.labeler.start_x, event.x) - off_x), max(0, min(self.labeler.start_y, event.y) - off_y)
         x2, y2 = min(img_w, max(self.labeler.start_x, event.x) - off_x), min(img_h, max(self.labeler.start_y, event.y) - off_y)
         if x1 >= x2 or y1 >= y2:
             return
         xc, yc = (x1 + x2) / 2 / img_w, (y1 + y2) / 2 / img_h
         w, h = (x2 - x1) / img_w, (y2 - y1) / img_h
-        self.labeler.bboxes.append((self.labeler.current_class, xc, yc, w, h))
         if self.labeler.current_bbox:
             self.labeler.canvas.delete(self.labeler.current_bbox)
         self.labeler.start_x = self.labeler.current_bbox = None
-        self.draw_all_bboxes()
-        self.labeler.update_label_list()
+        self.add_box((self.labeler.current_class, xc, yc, w, h))
+        self.save_labels_to_txt()
 
     def save_labels_to_txt(self):
-        # Save current bboxes to the corresponding txt file
+        # 편집은 이미 기록(journal)에 남았으므로 라벨 파일은 잠시 모아서 백그라운드로 기록 (라벨이 없으면 파일 삭제)
         if not hasattr(self.labeler, 'image_path') or not self.labeler.image_path:
             return
-        label_path = self.labeler.image_path.rsplit('.', 1)[0] + '.txt'
-        if not self.labeler.bboxes:
-            import os
-            if os.path.exists(label_path):
-                os.remove(label_path)
-            return
-        with open(label_path, 'w') as f:
-            for bbox in self.labeler.bboxes:
-                f.write(' '.join(map(str, bbox)) + '\n')
+        self.labeler.schedule_label_write()
+        self.labeler.prelabeler.draw()  # 라벨과 겹치는 자동 라벨 후보는 숨기므로 라벨이 바뀔 때 다시 그림
 
     def delete_bbox(self, event):
-        if self.labeler.mode != 'labeling' or not self.labeler.bboxes:
-            return
-        if not self.labeler.current_image:
-            return
-        img_w, img_h = self.labeler.current_image.size
-        off_x, off_y = (self.labeler.canvas_width - img_w) // 2, (self.labeler.canvas_height - img_h) // 2
-        click_x, click_y = event.x - off_x, event.y - off_y
-        min_dist = float('inf')
-        del_index = None
-        for i, (cid, xc, yc, w, h) in enumerate(self.labeler.bboxes):
-            center_x = xc * img_w
-            center_y = yc * img_h
-            dist = (center_x - click_x) ** 2 + (center_y - click_y) ** 2
-            if dist < min_dist:
-                min_dist = dist
-                del_index = i
-        if del_index is not None:
-            del self.labeler.bboxes[del_index]
-            self.draw_all_bboxes()
-            self.labeler.update_label_list()
+        if self.labeler.mode != 'labeling' or not self.labeler.current_image:
+            return
+        if self.labeler.prelabeler.reject_at(event.x, event.y):
+            return  # 오른쪽 클릭한 곳에 자동 라벨 후보가 있으면 후보만 거절
+        if not self.labeler.bboxes:
+            return
+        box_id = self.box_at(event.x, event.y)
+        if box_id is not None:
+            self.remove_box(self.box_ids.index(box_id))
             self.save_labels_to_txt()
 
     def delete_selected_label(self, event):
@@ -112,7 +292,5 @@ class LabelingUtils:
         if sel:
             idx = sel[0]
             if 0 <= idx < len(self.labeler.bboxes):
-                del self.labeler.bboxes[idx]
-                self.draw_all_bboxes()
-                self.labeler.update_label_list()
+                self.remove_box(idx)
                 self.save_labels_to_txt()
@@ -2,10 +2,29 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 import cv2
 import os
-from PIL import Image, ImageTk
+import bisect
+import queue
+import threading
 import numpy as np
-from rotation_utils import RotationUtils
+from rotation_utils import RotationUtils, rotate_yolo_boxes
 from labeling_utils import LabelingUtils
+from thumbnail_utils import ThumbnailUtils
+from image_cache import ImageCache
+from image_pyramid import ImagePyramid
+from view_utils import ViewUtils
+from label_writer import LabelWriter, label_path_for, parse_labels, format_labels
+from edit_journal import EditJournal, discard_journal, orphaned_journals, recover
+from manifest import open_manifest
+from dataset_scanner import DatasetScanner
+from prelabel import PreLabeler
+from label_validator import validate, ISSUE_NAMES
+from dedup_index import DuplicateFinder
+from class_picker import ClassPicker
+from perf_trace import TRACER, PerfOverlay, span, traced
+from archive_source import close_readers as close_archives, is_archive_member, member_paths
+from manifest import ARCHIVE_EXTS, VIDEO_EXTS
+from memory_budget import PRIORITY_CURRENT, PRIORITY_PREFETCH, MemoryAccountant
+from video_source import cached_bytes, close_readers, frame_paths, is_video_frame, trim_cached_frames
 
 class YOLOLabeler:
     def __init__(self, root):
@@ -17,6 +36,7 @@ class YOLOLabeler:
         # 변수 초기화
         self.original_image_cv2 = None
         self.display_image_cv2 = None # 회전을 포함하여 화면에 표시될 이미지
+        self.image_pyramid = None # 원본 이미지의 밉맵 (이미지 캐시에 함께 저장됨)
         self.current_image = None
         self.image_path = None
         self.image_list = []
@@ -30,7 +50,8 @@ class YOLOLabeler:
         self.start_y = None
         self.current_bbox = None
         self.bboxes = []
-        self.bbox_rects = []
+        self.image_geometry = None  # 캔버스 위 이미지의 (off_x, off_y, width, height)
+        self.image_item = None
 
         # 클래스 정보
         self.classes = []
@@ -57,11 +78,33 @@ class YOLOLabeler:
         self.load_classes()
         self.toggle_mode() # 초기 UI 상태 설정
         self.thumbnail_size = 100
-        self.thumbnails = []
-        self.thumb_labels = []
 
+        self.memory = MemoryAccountant()  # 이미지/썸네일 캐시 전체의 메모리 예산 (YOLO_LABELER_MEMORY_MB)
+        self.memory.register("current", PRIORITY_CURRENT, self.current_image_bytes)
+        self.memory.register("video frames", PRIORITY_PREFETCH, cached_bytes, trim_cached_frames)
         self.rotation_utils = RotationUtils(self)
         self.labeling_utils = LabelingUtils(self)
+        self.view_utils = ViewUtils(self)
+        self.thumbnail_utils = ThumbnailUtils(self)
+        self.prelabeler = PreLabeler(self)  # 선택: ONNX 모델로 미리 만든 후보 박스
+        self.duplicate_finder = DuplicateFinder(self)  # 연속 촬영/영상 프레임의 유사 이미지 그룹
+        self.image_cache = ImageCache(memory=self.memory)  # 다음/이전 이미지 선행 디코딩 캐시
+        self.label_writer = LabelWriter()  # 라벨 파일은 백그라운드에서 원자적으로 기록
+        self.journal = EditJournal()  # 박스 편집 기록 (undo/redo, 비정상 종료 후 복구)
+        self.label_write_job = None
+        self.full_res_job = None
+        self.perf_overlay = PerfOverlay(self)  # F12: 구간별 소요 시간 표시
+        self.manifest = None  # 폴더를 열면 SQLite 매니페스트 사용
+        self.manifest_job = None
+        self.scanner = None  # 하위 폴더까지 스트리밍 스캔 + 변경 감시
+        self.scan_job = None
+        self.list_from_manifest = False
+        self.validation_job = None
+        self.memory_job = self.root.after(100, self.poll_memory)
+
+        self.recover_edits()
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def setup_ui(self):
         main_frame = tk.Frame(self.root)
@@ -75,18 +118,7 @@ class YOLOLabeler:
         # 썸네일용 캔버스 + 스크롤바 조합
         self.thumb_canvas = tk.Canvas(thumb_frame, width=120)
         self.thumb_scrollbar = tk.Scrollbar(thumb_frame, orient=tk.VERTICAL, command=self.thumb_canvas.yview)
-        self.thumb_scrollable_frame = tk.Frame(self.thumb_canvas)
-
-        self.thumb_scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.thumb_canvas.configure(
-                scrollregion=self.thumb_canvas.bbox("all")
-            )
-        )
-
-        self.thumb_canvas.create_window((0, 0), window=self.thumb_scrollable_frame, anchor="nw")
-        self.thumb_canvas.configure(yscrollcommand=self.thumb_scrollbar.set)
-
+        # 썸네일 행은 ThumbnailUtils가 보이는 영역만 재사용 위젯으로 그림
         self.thumb_canvas.pack(side=tk.LEFT, fill=tk.Y, expand=True)
         self.thumb_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
@@ -115,6 +147,17 @@ class YOLOLabeler:
         self.canvas.bind("<ButtonPress-1>", self.on_canvas_button_press)
         self.canvas.bind("<B1-Motion>", self.on_canvas_mouse_drag)
         self.canvas.bind("<ButtonRelease-1>", self.on_canvas_button_release)
+        # Shift+드래그로 올가미 선택
+        self.canvas.bind("<Shift-ButtonPress-1>", lambda event: self.labeling_utils.start_lasso(event))
+        self.canvas.bind("<Shift-B1-Motion>", lambda event: self.labeling_utils.draw_lasso(event))
+        self.canvas.bind("<Shift-ButtonRelease-1>", lambda event: self.labeling_utils.end_lasso(event))
+        # 휠로 확대/축소, Ctrl+드래그로 이동, 0 키로 창에 맞춤
+        self.canvas.bind("<MouseWheel>", lambda event: self.view_utils.on_mousewheel(event))
+        self.canvas.bind("<Button-4>", lambda event: self.view_utils.on_mousewheel(event))
+        self.canvas.bind("<Button-5>", lambda event: self.view_utils.on_mousewheel(event))
+        self.canvas.bind("<Control-ButtonPress-1>", lambda event: self.view_utils.start_pan(event))
+        self.canvas.bind("<Control-B1-Motion>", lambda event: self.view_utils.pan(event))
+        self.canvas.bind("<Control-ButtonRelease-1>", lambda event: self.view_utils.end_pan(event))
         self.canvas.bind("<Button-3>", lambda event: self.labeling_utils.delete_bbox(event))
         self.canvas.bind("<Button-2>", lambda event: self.labeling_utils.delete_bbox(event))
 
@@ -123,9 +166,14 @@ class YOLOLabeler:
 
         tk.Button(nav_frame, text="이전", command=self.prev_image).pack(side=tk.LEFT, padx=5)
         tk.Button(nav_frame, text="다음", command=self.next_image).pack(side=tk.LEFT, padx=5)
+        tk.Button(nav_frame, text="다음 미라벨", command=self.next_unlabeled_image).pack(side=tk.LEFT, padx=5)
 
         self.image_info_label = tk.Label(nav_frame, text="이미지 없음")
         self.image_info_label.pack(side=tk.LEFT, padx=20)
+        tk.Button(nav_frame, text="그룹에 라벨 적용", command=self.apply_labels_to_group).pack(side=tk.RIGHT, padx=5)
+        tk.Button(nav_frame, text="유사 이미지 건너뛰기", command=self.skip_duplicates).pack(side=tk.RIGHT, padx=5)
+        self.duplicate_info_label = tk.Label(nav_frame, text="")
+        self.duplicate_info_label.pack(side=tk.RIGHT, padx=5)
 
         right_frame = tk.Frame(main_frame, width=300)
         right_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=10)
@@ -136,6 +184,15 @@ class YOLOLabeler:
         tk.Button(file_frame, text="이미지 폴더 선택", command=self.load_images).pack(fill=tk.X, padx=5, pady=2)
         tk.Button(file_frame, text="이미지 파일 선택", command=self.load_single_image).pack(fill=tk.X, padx=5, pady=2)
         tk.Button(file_frame, text="클래스 설정", command=self.setup_classes).pack(fill=tk.X, padx=5, pady=2)
+        tk.Button(file_frame, text="라벨 검사", command=self.validate_labels).pack(fill=tk.X, padx=5, pady=2)
+
+        prelabel_frame = tk.LabelFrame(right_frame, text="자동 라벨 (ONNX)")
+        prelabel_frame.pack(fill=tk.X, pady=5)
+        tk.Button(prelabel_frame, text="모델 불러오기", command=self.load_prelabel_model).pack(fill=tk.X, padx=5, pady=2)
+        prelabel_buttons = tk.Frame(prelabel_frame)
+        prelabel_buttons.pack(fill=tk.X)
+        tk.Button(prelabel_buttons, text="후보 모두 수락", command=lambda: self.prelabeler.accept_all()).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=2)
+        tk.Button(prelabel_buttons, text="후보 모두 거절", command=lambda: self.prelabeler.reject_all()).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=2)
 
         mode_frame = tk.LabelFrame(right_frame, text="모드 설정")
         mode_frame.pack(fill=tk.X, pady=5)
@@ -152,30 +209,20 @@ class YOLOLabeler:
 
         class_frame = tk.LabelFrame(right_frame, text="클래스 선택")
         class_frame.pack(fill=tk.X, pady=5)
-        self.calculate_class_frame_height()
-        canvas_frame = tk.Canvas(class_frame, height=self.class_frame_height)
-        scrollbar_class = tk.Scrollbar(class_frame, orient="vertical", command=canvas_frame.yview)
-        self.scrollable_frame = tk.Frame(canvas_frame)
-        self.scrollable_frame.bind("<Configure>", lambda e: canvas_frame.configure(scrollregion=canvas_frame.bbox("all")))
-        canvas_frame.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        canvas_frame.configure(yscrollcommand=scrollbar_class.set)
-        canvas_frame.pack(side="left", fill="both", expand=True, padx=(5, 0), pady=5)
-        scrollbar_class.pack(side="right", fill="y", pady=5)
-        self.canvas_frame = canvas_frame
-        self.class_var = tk.IntVar(value=0)
-        self.class_radiobuttons = []
-        self.update_class_radiobuttons()
+        # 클래스 수와 관계없이 검색창 + 목록 + 최근 사용 버튼만 사용 (이름/번호로 걸러서 선택)
+        self.class_picker = ClassPicker(self, class_frame)
 
         label_frame = tk.LabelFrame(right_frame, text="현재 라벨")
         label_frame.pack(fill=tk.BOTH, expand=True, pady=5)
         list_frame = tk.Frame(label_frame)
         list_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        self.label_listbox = tk.Listbox(list_frame)
+        self.label_listbox = tk.Listbox(list_frame, selectmode=tk.EXTENDED, exportselection=False)
         scrollbar = tk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.label_listbox.yview)
         self.label_listbox.config(yscrollcommand=scrollbar.set)
         self.label_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.label_listbox.bind("<Double-Button-1>", self.delete_selected_label)
+        self.label_listbox.bind("<<ListboxSelect>>", lambda event: self.labeling_utils.on_listbox_select(event))
 
         save_frame = tk.LabelFrame(right_frame, text="저장")
         save_frame.pack(fill=tk.X, pady=5)
@@ -184,11 +231,23 @@ class YOLOLabeler:
         auto_save_checkbox.pack(fill=tk.X, padx=5, pady=2)
         tk.Button(save_frame, text="저장", command=self.save_changes).pack(fill=tk.X, padx=5, pady=2)
 
-        self.thumbnails = []  # PIL 이미지들
-        self.thumb_labels = []  # Label 위젯들
-
         self.root.bind('<Left>', lambda event: self.prev_image())
         self.root.bind('<Right>', lambda event: self.next_image())
+        # 선택한 박스 삭제
+        for key in ['<Delete>', '<BackSpace>']:
+            self.root.bind(key, self.delete_selected_boxes)
+        self.root.bind('<Key-0>', lambda event: self.view_utils.reset_view())
+        for key in ['<Control-f>', '<Control-F>']:
+            self.root.bind(key, self.class_picker.focus)
+        self.root.bind('<F12>', lambda event: self.perf_overlay.toggle())
+        self.root.bind('<Shift-F12>', lambda event: self.export_trace())
+        # 편집 되돌리기/다시 실행
+        for key in ['<Control-z>', '<Control-Z>']:
+            self.root.bind(key, self.undo_edit)
+        for key in ['<Control-y>', '<Control-Y>', '<Control-Shift-z>', '<Control-Shift-Z>']:
+            self.root.bind(key, self.redo_edit)
+        for key in ['n', 'N']:
+            self.root.bind(f'<{key}>', lambda event: self.next_unlabeled_image())
         # 라벨링 모드 단축키
         for key in ['w', 'W']:
             self.root.bind(f'<{key}>', lambda event: self.set_mode_labeling())
@@ -201,21 +260,8 @@ class YOLOLabeler:
         self.resize_job = self.root.after(200, self.perform_resize)
 
     def perform_resize(self):
-        if self.display_image_cv2 is None: return
-        h, w = self.display_image_cv2.shape[:2]
-        self.canvas_width, self.canvas_height = self.canvas.winfo_width(), self.canvas.winfo_height()
-        if self.canvas_width < 2 or self.canvas_height < 2: return
-        self.scale_factor = min(self.canvas_width / w, self.canvas_height / h)
-        new_w, new_h = int(w * self.scale_factor), int(h * self.scale_factor)
-        if new_w < 1 or new_h < 1: return
-        img_resized = cv2.resize(self.display_image_cv2, (new_w, new_h))
-        self.current_image = Image.fromarray(img_resized)
-        self.photo = ImageTk.PhotoImage(self.current_image)
-        self.canvas.delete("all")
-        self.canvas.create_image(self.canvas_width // 2, self.canvas_height // 2, image=self.photo)
-        self.draw_all_bboxes()
-        if self.mode == 'rotation':
-            self.draw_crosshair_lines()
+        # 밉맵에서 현재 확대/이동 상태로 보이는 영역만 그림
+        self.view_utils.render()
 
     def load_classes(self):
         if os.path.exists("classes.txt"):
@@ -223,7 +269,7 @@ class YOLOLabeler:
                 self.classes = [line.strip() for line in f.readlines() if line.strip()]
         else:
             self.classes = ["person", "car", "bike", "dog", "cat"]
-        self.update_class_radiobuttons()
+        self.update_class_picker()
 
     def setup_classes(self):
         class_window = tk.Toplevel(self.root)
@@ -234,98 +280,248 @@ class YOLOLabeler:
         def save_classes():
             self.classes = [cls.strip() for cls in text_widget.get(1.0, tk.END).strip().split('\n') if cls.strip()]
             with open("classes.txt", 'w', encoding='utf-8') as f: f.write('\n'.join(self.classes))
-            self.update_class_radiobuttons()
+            self.update_class_picker()
+            self.draw_all_bboxes()
+            self.update_label_list()
             class_window.destroy()
         tk.Button(class_window, text="저장", command=save_classes).pack(pady=5)
 
-    def update_class_radiobuttons(self):
-        for rb in self.class_radiobuttons: rb.destroy()
-        self.class_radiobuttons.clear()
-        self.calculate_class_frame_height()
-        if hasattr(self, 'canvas_frame'): self.canvas_frame.config(height=self.class_frame_height)
-        self.class_var.set(0)
-        for i, class_name in enumerate(self.classes):
-            rb = tk.Radiobutton(self.scrollable_frame, text=class_name, variable=self.class_var, value=i, indicatoron=0, anchor="w", command=self.on_class_selected)
-            rb.pack(fill=tk.X, padx=5, pady=2)
-            self.class_radiobuttons.append(rb)
-        if self.classes: self.current_class = 0
-        self.toggle_mode()
-
-    def on_class_selected(self, event=None): self.current_class = self.class_var.get()
+    def validate_labels(self):
+        # 전체 라벨 검사는 백그라운드 스레드(내부적으로 프로세스 풀)에서 실행하고 결과 창만 메인 스레드에서 띄움
+        if not self.image_list or self.validation_job is not None:
+            return
+        self.flush_label_write()
+        self.label_writer.flush()
+        image_paths, num_classes = list(self.image_list), len(self.classes)
+        result = queue.Queue()
+        def run():
+            try:
+                result.put(validate(image_paths, num_classes))
+            except Exception as e:
+                result.put(e)
+        threading.Thread(target=run, daemon=True).start()
+        self.root.config(cursor="watch")
+        self.validation_job = self.root.after(100, self.poll_validation, result)
+
+    def poll_validation(self, result):
+        try:
+            report = result.get_nowait()
+        except queue.Empty:
+            self.validation_job = self.root.after(100, self.poll_validation, result)
+            return
+        self.validation_job = None
+        self.root.config(cursor="")
+        if isinstance(report, Exception):
+            messagebox.showerror("오류", f"라벨 검사에 실패했습니다: {report}")
+        else:
+            self.show_validation_report(report)
+
+    def show_validation_report(self, report):
+        report_window = tk.Toplevel(self.root)
+        report_window.title("라벨 검사 결과")
+        tk.Label(report_window, text=report.summary(), justify=tk.LEFT, anchor="w").pack(fill=tk.X, padx=10, pady=5)
+        list_frame = tk.Frame(report_window)
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        listbox = tk.Listbox(list_frame, width=90, height=20)
+        scrollbar = tk.Scrollbar(list_frame, orient=tk.VERTICAL, command=listbox.yview)
+        listbox.config(yscrollcommand=scrollbar.set)
+        listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        rows, targets = [], []
+        for path, issues in sorted(report.issues.items()):
+            for line, name, detail in issues:
+                rows.append(f"{os.path.basename(label_path_for(path))}:{line}  {ISSUE_NAMES[name]}  {detail}")
+                targets.append(path)
+        listbox.insert(tk.END, *rows)
+        def jump(event=None):
+            # 더블 클릭한 문제의 이미지로 이동
+            sel = listbox.curselection()
+            if not sel: return
+            idx = bisect.bisect_left(self.image_list, targets[sel[0]])
+            if idx < len(self.image_list) and self.image_list[idx] == targets[sel[0]]:
+                self.select_image(idx)
+        listbox.bind("<Double-Button-1>", jump)
+        listbox.bind("<Return>", jump)
+
+    def update_class_picker(self):
+        self.class_picker.set_classes(self.classes)
+        self.current_class = self.class_picker.selected
+
+    def on_class_selected(self, cid):
+        self.current_class = cid
 
     def load_single_image(self):
         if not self.check_unsaved_rotation(): return
-        file_path = filedialog.askopenfilename(filetypes=(('Image Files', '*.jpg *.jpeg *.png *.bmp'), ('All Files', '*.*')))
+        file_path = filedialog.askopenfilename(filetypes=(('Image Files', '*.jpg *.jpeg *.png *.bmp *.tif *.tiff'),
+                                                          ('Video Files', ' '.join('*' + ext for ext in VIDEO_EXTS)),
+                                                          ('Archives', ' '.join('*' + ext for ext in ARCHIVE_EXTS)),
+                                                          ('All Files', '*.*')))
         if file_path:
-            self.image_list = [file_path]
+            self.stop_scanner()
+            self.flush_labels()
+            self.close_manifest()
+            # 영상은 모든 프레임, tar/zip은 모든 이미지 항목을 목록으로 (필요할 때만 디코딩)
+            lower = file_path.lower()
+            try:
+                if lower.endswith(VIDEO_EXTS):
+                    self.image_list = frame_paths(file_path)
+                elif lower.endswith(ARCHIVE_EXTS):
+                    self.image_list = member_paths(file_path)
+                else:
+                    self.image_list = [file_path]
+            except OSError:
+                self.image_list = []
             self.current_index = 0
+            # 목록이 통째로 바뀌었으므로 이전 폴더의 썸네일 행과 중복 그룹을 새 목록 기준으로 다시 만듦
+            self.load_thumbnails()
+            self.image_cache.set_known_sizes({})
+            self.duplicate_finder.reset()
+            self.duplicate_finder.update(self.image_list)
+            if not self.image_list:
+                messagebox.showerror("오류", f"이미지를 찾을 수 없습니다: {file_path}")
+                return
             self.load_current_image()
 
     def load_images(self):
         if not self.check_unsaved_rotation(): return
         folder_path = filedialog.askdirectory()
         if folder_path:
-            ext = ('.jpg', '.jpeg', '.png', '.bmp')
-            self.image_list = sorted([os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.lower().endswith(ext)])
+            self.stop_scanner()
+            self.flush_labels()
+            self.close_manifest()
+            self.manifest = open_manifest(folder_path)
+            self.image_list = []
+            self.current_index = 0
+            self.list_from_manifest = self.manifest is not None and not self.manifest.is_empty()
+            if self.list_from_manifest:
+                # 매니페스트에서 목록과 마지막 위치를 바로 복원 (스캔 결과는 끝난 뒤 한 번에 반영)
+                self.image_list = self.manifest.image_paths()
+                self.current_index = min(self.manifest.last_index(), max(0, len(self.image_list) - 1))
+            self.load_thumbnails()  # 추가: 썸네일 생성
+            self.image_cache.set_known_sizes(self.manifest.sizes() if self.manifest is not None else {})
+            self.duplicate_finder.reset(self.manifest.hashes() if self.manifest is not None else None)
+            self.duplicate_finder.update(self.image_list)
             if self.image_list:
-                self.current_index = 0
                 self.load_current_image()
-                self.load_thumbnails()  # 추가: 썸네일 생성
-            else:
-                messagebox.showwarning("경고", "이미지 파일을 찾을 수 없습니다.")
-
+            # 처음 여는 폴더는 스캔되는 대로 목록에 추가되어 첫 이미지가 바로 표시됨
+            self.scanner = DatasetScanner(folder_path)
+            self.scanner.start()
+            self.scan_job = self.root.after(50, self.poll_scanner)
+
+    def poll_memory(self):
+        # 워커 스레드가 캐시에 넣은 뒤 요청한 메모리 예산 적용을 Tk 스레드에서 처리
+        self.memory.poll()
+        self.memory_job = self.root.after(100, self.poll_memory)
+
+    def current_image_bytes(self):
+        # 현재 이미지가 쓰는 메모리 (예산 초과여도 해제하지 않음): 밉맵, 회전 결과, 회전 미리보기 축소본, 화면 버퍼
+        pyramid = self.image_pyramid
+        nbytes = pyramid.nbytes if pyramid is not None else 0
+        seen = {id(level) for level in pyramid.levels} if isinstance(pyramid, ImagePyramid) else set()
+        for array in (self.original_image_cv2, self.display_image_cv2, self.rotation_utils.proxy):
+            if array is not None and id(array) not in seen:
+                seen.add(id(array))
+                nbytes += array.nbytes
+        return nbytes + self.view_utils.frame.nbytes
+
+    @traced("load_current_image")
     def load_current_image(self):
         if not self.image_list: return
+        self.flush_label_write()
         self.image_path = self.image_list[self.current_index]
-        img = cv2.imread(self.image_path)
-        if img is None:
+        # 라벨링 모드에서는 창 크기에 맞춰 축소 디코딩 (확대하거나 회전 모드로 바꾸면 원본 해상도로 교체)
+        cw, ch = self.canvas.winfo_width(), self.canvas.winfo_height()
+        self.image_cache.display_size = (cw, ch) if cw > 1 and ch > 1 else None
+        with span("cache.get"):
+            pyramid = self.image_cache.get(self.image_path, full=self.mode == 'rotation')
+        if pyramid is None:
             messagebox.showerror("오류", f"이미지를 읽을 수 없습니다: {self.image_path}")
             return
-        self.original_image_cv2 = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        self.display_image_cv2 = self.original_image_cv2.copy()
+        self.image_pyramid = pyramid
+        # 영상 프레임/압축 파일 항목은 원본 파일에 다시 쓸 수 없으므로 회전하지 않음
+        read_only = is_video_frame(self.image_path) or is_archive_member(self.image_path)
+        self.original_image_cv2 = None if read_only else pyramid.base
+        if self.manifest is not None:
+            self.manifest.record_size(self.image_path, pyramid.width, pyramid.height)
+            self.manifest.set_last_index(self.current_index)
+            self.schedule_manifest_commit()
+        # 캐시 배열은 읽기 전용이므로 복사하지 않음 (타일 소스는 base가 None이라 회전 불가, 화면은 image_pyramid로 그림)
+        self.display_image_cv2 = self.original_image_cv2
+        self.view_utils.reset()
         self.image_angle = 0
         self.image_angle_float = 0.0
         self.rotation_dirty = False
-        self.bboxes, self.bbox_rects = [], []
-        label_path = self.image_path.rsplit('.', 1)[0] + '.txt'
-        if os.path.exists(label_path):
-            with open(label_path, 'r') as f:
-                for line in f:
-                    parts = line.strip().split()
-                    if len(parts) == 5:
-                        self.bboxes.append(tuple(map(float, parts)))
+        self.bboxes = []
+        self.labeling_utils.clear_boxes()
+        self.prelabeler.clear()
+        label_path = label_path_for(self.image_path)
+        with span("labels.read"):
+            label_text = self.label_writer.read(label_path)
+        if label_text:
+            self.bboxes = parse_labels(label_text)
+        self.journal.begin(label_path, label_text)
         self.perform_resize()
         self.update_image_info()
         self.update_label_list()
+        self.thumbnail_utils.highlight_current()
+        self.image_cache.prefetch(self.image_list, self.current_index)
+        self.prelabeler.prefetch(self.image_list, self.current_index)
+
+    def use_full_resolution(self, pyramid):
+        # 축소 디코딩한 현재 이미지를 원본 해상도로 교체 (축소본은 회전하지 않은 상태이므로 표시 이미지도 그대로 교체)
+        self.image_pyramid = pyramid
+        if self.original_image_cv2 is not None:
+            self.original_image_cv2 = pyramid.base
+        self.display_image_cv2 = self.original_image_cv2
+        self.view_utils.schedule_render()
+
+    def ensure_full_resolution(self):
+        # 회전은 원본 픽셀을 저장하므로 바로 원본 해상도로 디코딩
+        if self.image_pyramid is None or not self.image_pyramid.reduced:
+            return
+        pyramid = self.image_cache.get(self.image_path, full=True)
+        if pyramid is not None:
+            self.use_full_resolution(pyramid)
+
+    def request_full_resolution(self):
+        if self.full_res_job is not None:
+            return
+        future = self.image_cache.request_full(self.image_path)
+        self.full_res_job = self.root.after(15, self.poll_full_resolution, self.image_path, future)
+
+    def poll_full_resolution(self, path, future):
+        if not future.done():
+            self.full_res_job = self.root.after(15, self.poll_full_resolution, path, future)
+            return
+        self.full_res_job = None
+        pyramid = future.result() if future.exception() is None else None
+        # 그 사이 다른 이미지로 넘어갔거나 이미 원본으로 바뀌었으면 무시
+        if pyramid is None or path != self.image_path or not self.image_pyramid.reduced:
+            return
+        self.use_full_resolution(pyramid)
+
+    def load_prelabel_model(self):
+        model_path = filedialog.askopenfilename(filetypes=(('ONNX Model', '*.onnx'), ('All Files', '*.*')))
+        if model_path:
+            # 모델 로딩과 추론은 워커 프로세스에서 하므로 UI는 멈추지 않음
+            self.prelabeler.load_model(model_path)
+
+    def on_prelabel_error(self, error):
+        messagebox.showerror("오류", f"자동 라벨 모델을 실행할 수 없습니다: {error}")
 
     def load_thumbnails(self):
-        # 기존 썸네일 삭제
-        for lbl in self.thumb_labels:
-            lbl.destroy()
-        self.thumb_labels.clear()
-        self.thumbnails.clear()
-
-        for i, img_path in enumerate(self.image_list):
-            img = Image.open(img_path)
-            img.thumbnail((self.thumbnail_size, self.thumbnail_size))
-            thumb = ImageTk.PhotoImage(img)
-            self.thumbnails.append(thumb)  # 참조 유지 중요!
-
-            lbl = tk.Label(self.thumb_scrollable_frame, image=thumb, cursor="hand2", borderwidth=2, relief="groove")
-            lbl.pack(padx=5, pady=5)
-
-            def click_handler(event, idx=i):
-                if self.auto_save_enabled:
-                    if self.rotation_dirty:
-                        self.save_rotation()
-                    self.save_current_labels()
-                if not self.check_unsaved_rotation():
-                    return
-                self.current_index = idx
-                self.load_current_image()
+        # 썸네일은 워커 풀에서 생성되어 보이는 행부터 사이드바에 채워짐
+        self.thumbnail_utils.load_thumbnails()
 
-            lbl.bind("<Button-1>", click_handler)
-            self.thumb_labels.append(lbl)
+    def select_image(self, idx):
+        if self.auto_save_enabled:
+            if self.rotation_dirty:
+                self.save_rotation()
+            self.save_current_labels()
+        if not self.check_unsaved_rotation():
+            return
+        self.current_index = idx
+        self.load_current_image()
 
     def apply_rotation_and_redraw(self):
         self.rotation_utils.apply_rotation_and_redraw()
@@ -357,15 +553,63 @@ class YOLOLabeler:
     def delete_selected_label(self, event):
         self.labeling_utils.delete_selected_label(event)
 
+    def label_list_text(self, i, box):
+        cid, xc, yc, w, h = box
+        c_name = self.classes[int(cid)] if int(cid) < len(self.classes) else f"Class{int(cid)}"
+        return f"{i+1}. {c_name} ({w:.3f}x{h:.3f})"
+
+    def delete_selected_boxes(self, event=None):
+        if event is not None and isinstance(event.widget, (tk.Entry, tk.Text)):
+            return
+        self.labeling_utils.delete_selected_boxes()
+
     def update_label_list(self):
+        # 전체 목록 다시 채우기 (이미지 로드 시), 개별 편집은 LabelingUtils가 해당 줄만 갱신
         self.label_listbox.delete(0, tk.END)
-        for i, (cid, xc, yc, w, h) in enumerate(self.bboxes):
-            c_name = self.classes[int(cid)] if int(cid) < len(self.classes) else f"Class{int(cid)}"
-            self.label_listbox.insert(tk.END, f"{i+1}. {c_name} ({w:.3f}x{h:.3f})")
+        if self.bboxes:
+            self.label_listbox.insert(tk.END, *[self.label_list_text(i, box) for i, box in enumerate(self.bboxes)])
 
     def update_image_info(self):
         text = f"{self.current_index + 1}/{len(self.image_list)} - {os.path.basename(self.image_path)}" if self.image_list else "이미지 없음"
         self.image_info_label.config(text=text)
+        self.update_duplicate_info()
+
+    def update_duplicate_info(self):
+        group = self.duplicate_finder.group(self.image_path) if self.image_list else []
+        self.duplicate_info_label.config(text=f"유사 이미지 {len(group) - 1}장" if len(group) > 1 else "")
+
+    def on_hashes_computed(self, pairs):
+        # 새로 계산한 해시는 매니페스트에 저장해서 다음에 열 때 다시 계산하지 않음
+        if self.manifest is not None:
+            self.manifest.record_hashes(pairs)
+            self.schedule_manifest_commit()
+
+    def skip_duplicates(self):
+        # 현재 이미지와 같은 그룹이 아닌 다음 이미지로 이동
+        if not self.image_list:
+            return
+        group = set(self.duplicate_finder.group(self.image_path))
+        for idx in range(self.current_index + 1, len(self.image_list)):
+            if self.image_list[idx] not in group:
+                self.select_image(idx)
+                return
+
+    def apply_labels_to_group(self):
+        # 현재 라벨을 같은 그룹 중 아직 라벨이 없는 이미지에 복사
+        if not self.image_list or not self.bboxes:
+            return
+        targets = [path for path in self.duplicate_finder.group(self.image_path)
+                   if path != self.image_path and not self.label_writer.read(label_path_for(path))]
+        if not targets:
+            messagebox.showinfo("정보", "라벨을 적용할 유사 이미지가 없습니다.")
+            return
+        if not messagebox.askyesno("확인", f"라벨이 없는 유사 이미지 {len(targets)}장에 현재 박스 {len(self.bboxes)}개를 적용하시겠습니까?"):
+            return
+        for path in targets:
+            self.label_writer.save(path, self.bboxes)
+            if self.manifest is not None:
+                self.manifest.record_labels(path, len(self.bboxes))
+        self.schedule_manifest_commit()
 
     def prev_image(self):
         if not self.check_unsaved_rotation(): return
@@ -383,22 +627,216 @@ class YOLOLabeler:
                 if self.rotation_dirty:
                     self.save_rotation()
                 # Save labels and remove txt file if no labels
-                if not self.bboxes:
-                    label_path = self.image_path.rsplit('.', 1)[0] + '.txt'
-                    if os.path.exists(label_path):
-                        os.remove(label_path)
-                else:
-                    self.save_current_labels()
+                self.write_labels()
             self.current_index += 1
             self.load_current_image()
 
     def save_current_labels(self):
-        if not self.image_path or not self.bboxes:
+        # 박스를 모두 지웠으면 write_labels가 이전 라벨 파일을 삭제함
+        if not self.image_path:
+            return
+        self.write_labels()
+
+    def write_labels(self):
+        # 라벨 파일 기록(비동기)과 매니페스트의 라벨 상태 갱신을 함께 처리
+        if self.label_write_job is not None:
+            self.root.after_cancel(self.label_write_job)
+            self.label_write_job = None
+        self.journal.checkpoint(label_path_for(self.image_path), format_labels(self.bboxes))
+        self.label_writer.save(self.image_path, self.bboxes)
+        if self.manifest is not None:
+            self.manifest.record_labels(self.image_path, len(self.bboxes))
+            self.schedule_manifest_commit()
+
+    def schedule_label_write(self):
+        # 편집할 때마다 파일 전체를 다시 쓰지 않고 잠시 모아서 기록 (그 사이 편집은 기록 파일에 한 줄씩 추가)
+        # 박스 편집은 자동 저장 모드와 관계없이 항상 저장 (자동 저장 모드는 이미지 이동 시 저장만 결정)
+        if self.label_write_job is None:
+            self.label_write_job = self.root.after(1000, self.write_labels)
+
+    def flush_label_write(self):
+        # 이미지를 바꾸기 전에 예약된 기록을 바로 처리
+        if self.label_write_job is not None:
+            self.write_labels()
+
+    def flush_labels(self):
+        # 모든 라벨 파일이 기록되면 편집 기록은 더 이상 필요 없음
+        self.flush_label_write()
+        if self.label_writer.flush() and not self.label_writer.failed:
+            self.journal.reset()
+
+    def recover_edits(self):
+        # 이전 실행이 비정상 종료되었으면 편집 기록을 재생해서 라벨 파일 복구 (실행 중인 다른 창의 기록은 건드리지 않음)
+        self.journal.open()
+        orphans = orphaned_journals(self.journal.directory, self.journal.path)
+        recovered = {}
+        for path, _ in orphans:
+            recovered.update(recover(path))
+        for label_path, content in recovered.items():
+            self.label_writer.enqueue(label_path, content)
+        self.label_writer.flush()
+        for path, lock in orphans:
+            if self.label_writer.failed:
+                lock.close()  # 기록하지 못했으면 다음 실행에서 다시 시도
+            else:
+                discard_journal(path, lock)
+        if recovered:
+            messagebox.showinfo("정보", f"저장되지 않은 편집을 복구했습니다: 라벨 파일 {len(recovered)}개")
+
+    def export_trace(self):
+        # 측정을 켠 뒤 세션 전체의 구간 기록을 Chrome trace JSON으로 저장
+        if not TRACER.events:
+            messagebox.showinfo("정보", "측정된 구간이 없습니다. F12로 측정을 켜세요.")
             return
-        label_path = self.image_path.rsplit('.', 1)[0] + '.txt'
-        with open(label_path, 'w') as f:
-            for cid, xc, yc, w, h in self.bboxes:
-                f.write(f"{int(cid)} {xc:.6f} {yc:.6f} {w:.6f} {h:.6f}\n")
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=(('Trace JSON', '*.json'), ('All Files', '*.*')))
+        if path:
+            count = TRACER.export_chrome_trace(path)
+            messagebox.showinfo("정보", f"구간 {count}개를 저장했습니다.\n{path}")
+
+    def undo_edit(self, event=None):
+        if event is not None and isinstance(event.widget, (tk.Entry, tk.Text)):
+            return
+        self.labeling_utils.undo()
+
+    def redo_edit(self, event=None):
+        if event is not None and isinstance(event.widget, (tk.Entry, tk.Text)):
+            return
+        self.labeling_utils.redo()
+
+    def schedule_manifest_commit(self):
+        # 탐색할 때마다 커밋하지 않고 잠시 모아서 커밋
+        if self.manifest_job is None:
+            self.manifest_job = self.root.after(2000, self.commit_manifest)
+
+    def commit_manifest(self):
+        self.manifest_job = None
+        if self.manifest is not None:
+            self.manifest.commit()
+
+    def close_manifest(self):
+        if self.manifest_job is not None:
+            self.root.after_cancel(self.manifest_job)
+            self.manifest_job = None
+        if self.manifest is not None:
+            self.manifest.close()
+            self.manifest = None
+
+    def stop_scanner(self):
+        if self.scan_job is not None:
+            self.root.after_cancel(self.scan_job)
+            self.scan_job = None
+        if self.scanner is not None:
+            self.scanner.stop()
+            self.scanner = None
+
+    def poll_scanner(self):
+        # 스캐너 스레드의 결과를 메인 스레드에서 반영 (한 번에 쌓인 변경을 모두 처리하고 썸네일은 한 번만 갱신)
+        self.scan_job = None
+        if self.scanner is None:
+            return
+        changed = False
+        while True:
+            try:
+                kind, payload = self.scanner.changes.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'found':
+                if not self.list_from_manifest:
+                    self.add_scanned_images(payload)
+                    changed = True
+            elif kind == 'done':
+                changed = self.reconcile_manifest(payload) or changed
+                if not self.image_list:
+                    messagebox.showwarning("경고", "이미지 파일을 찾을 수 없습니다.")
+            elif kind == 'added':
+                self.add_scanned_images(payload)
+                if self.manifest is not None:
+                    self.manifest.add_images(payload)
+                    self.schedule_manifest_commit()
+                changed = True
+            elif kind == 'removed':
+                self.remove_scanned_images(payload)
+                if self.manifest is not None:
+                    self.manifest.remove_images(payload)
+                    self.schedule_manifest_commit()
+                changed = True
+        if changed:
+            self.thumbnail_utils.refresh()
+            self.duplicate_finder.update(self.image_list)
+        self.scan_job = self.root.after(100 if changed else 250, self.poll_scanner)
+
+    def add_scanned_images(self, records):
+        # 스캐너는 경로 정렬 순서로 내보내므로 대부분 뒤에 붙이기만 하면 됨 (폴더 감시로 추가된 파일만 중간 삽입)
+        was_empty = not self.image_list
+        paths = [record[0] for record in records]
+        if was_empty or paths[0] > self.image_list[-1]:
+            self.image_list.extend(paths)
+        else:
+            for path in paths:
+                idx = bisect.bisect_left(self.image_list, path)
+                if idx < len(self.image_list) and self.image_list[idx] == path:
+                    continue
+                self.image_list.insert(idx, path)
+                if idx <= self.current_index:
+                    self.current_index += 1
+        if was_empty:
+            self.current_index = 0
+            self.load_current_image()
+        else:
+            self.update_image_info()
+
+    def remove_scanned_images(self, paths):
+        current = self.image_path
+        gone = set(paths)
+        self.image_list = [path for path in self.image_list if path not in gone]
+        if not self.image_list:
+            self.current_index = 0
+            self.update_image_info()
+            return
+        idx = bisect.bisect_left(self.image_list, current or '')
+        if current not in gone and idx < len(self.image_list) and self.image_list[idx] == current:
+            self.current_index = idx
+            self.update_image_info()
+        else:
+            # 보고 있던 이미지가 삭제되면 그 다음 이미지를 표시
+            self.current_index = min(idx, len(self.image_list) - 1)
+            self.load_current_image()
+
+    def reconcile_manifest(self, records):
+        # 첫 스캔이 끝나면 폴더 변경사항(추가/삭제/수정)을 매니페스트에 반영
+        if self.manifest is None:
+            return False
+        added, removed, _ = self.manifest.reconcile(records)
+        if not self.list_from_manifest or (not added and not removed):
+            return False  # 스트리밍으로 만든 목록은 이미 스캔 결과와 같음
+        self.image_list = self.manifest.image_paths()
+        if not self.image_list:
+            return True
+        idx = bisect.bisect_left(self.image_list, self.image_path or '')
+        if idx < len(self.image_list) and self.image_list[idx] == self.image_path:
+            self.current_index = idx
+            self.update_image_info()
+        else:
+            self.current_index = min(idx, len(self.image_list) - 1)
+            self.load_current_image()
+        return True
+
+    def next_unlabeled_image(self):
+        if self.manifest is None or not self.image_list:
+            return
+        if self.auto_save_enabled and self.image_path:
+            if self.rotation_dirty:
+                self.save_rotation()
+            self.write_labels()
+        target = self.manifest.next_unlabeled(self.image_path)
+        if target is None:
+            messagebox.showinfo("정보", "라벨이 없는 이미지가 없습니다.")
+            return
+        idx = bisect.bisect_left(self.image_list, target)
+        if idx < len(self.image_list) and self.image_list[idx] == target and idx != self.current_index:
+            if not self.check_unsaved_rotation(): return
+            self.current_index = idx
+            self.load_current_image()
 
     def save_changes(self):
         if self.mode == 'rotation':
@@ -412,9 +850,6 @@ class YOLOLabeler:
                 return
             self.save_current_labels()
 
-    def calculate_class_frame_height(self):
-        self.class_frame_height = max(80, min(300, len(self.classes) * 30 + 20))
-
     def toggle_auto_save(self): self.auto_save_enabled = self.auto_save_var.get()
 
     def toggle_mode(self):
@@ -424,12 +859,15 @@ class YOLOLabeler:
         self.rotate_left_btn.config(state=tk.NORMAL if is_rotation_mode else tk.DISABLED)
         self.rotate_right_btn.config(state=tk.NORMAL if is_rotation_mode else tk.DISABLED)
 
-        for rb in self.class_radiobuttons:
-            rb.config(state=tk.DISABLED if is_rotation_mode else tk.NORMAL)
+        self.class_picker.set_enabled(not is_rotation_mode)
 
         self.canvas.config(cursor="arrow" if is_rotation_mode else "crosshair")
 
+        # 회전 중에는 후보 박스 위치가 맞지 않으므로 숨김
+        self.canvas.itemconfig("proposal", state=tk.HIDDEN if is_rotation_mode else tk.NORMAL)
+
         if is_rotation_mode:
+            self.ensure_full_resolution()
             self.draw_crosshair_lines()
         else:
             for line_id in self.crosshair_lines:
@@ -439,6 +877,8 @@ class YOLOLabeler:
 
     def on_canvas_button_press(self, event):
         if self.mode == 'rotation':
+            if self.original_image_cv2 is None:
+                return  # 회전할 수 없는 소스 (대형 TIFF, 영상 프레임)
             self.drag_start_x = event.x
             self.drag_start_y = event.y
             self.start_angle = self.image_angle_float
@@ -452,7 +892,7 @@ class YOLOLabeler:
             delta_angle = delta_x * sensitivity
             new_angle = (self.start_angle + delta_angle) % 360
             self.image_angle_float = new_angle
-            self.apply_smooth_rotation()
+            self.rotation_utils.schedule_preview()
         elif self.mode == 'labeling':
             self.draw_bbox(event)
 
@@ -461,6 +901,7 @@ class YOLOLabeler:
             self.image_angle_float = self.image_angle_float % 360
             self.image_angle = int(round(self.image_angle_float))
             self.rotation_dirty = True
+            self.apply_smooth_rotation()  # 미리보기 대신 원본 해상도로 한 번 회전
             self.drag_start_x = None
             self.drag_start_y = None
             self.start_angle = 0.0
@@ -471,11 +912,31 @@ class YOLOLabeler:
     def save_rotation(self):
         img_to_save = cv2.cvtColor(self.display_image_cv2, cv2.COLOR_RGB2BGR)
         try:
-            cv2.imwrite(self.image_path, img_to_save)
-            self.original_image_cv2 = self.display_image_cv2.copy()
+            # 기록에 실패하면 라벨을 회전하지 않고 회전 상태도 그대로 둠
+            if not cv2.imwrite(self.image_path, img_to_save):
+                raise OSError(f"이미지 파일을 쓸 수 없습니다: {self.image_path}")
+            self.image_cache.invalidate(self.image_path)
+            self.thumbnail_utils.invalidate(self.image_path)
+            if self.manifest is not None:
+                height, width = img_to_save.shape[:2]
+                self.manifest.record_size(self.image_path, width, height)
+                self.schedule_manifest_commit()
+            angle = self.image_angle_float % 360
+            if self.bboxes and angle % 90 == 0:
+                # 90도 단위 회전이면 기존 박스도 같은 방향으로 변환해서 저장
+                self.bboxes = [tuple(box) for box in rotate_yolo_boxes(self.bboxes, angle).tolist()]
+                self.write_labels()
+                # 좌표가 모두 바뀌었으므로 회전 이전 편집은 되돌릴 수 없음 (새 기준점에서 기록)
+                self.journal.begin(label_path_for(self.image_path), format_labels(self.bboxes))
+                self.draw_all_bboxes()
+                self.update_label_list()
+            # 회전 결과는 새로 만든 배열이므로 복사하지 않고 그대로 원본으로 사용
+            self.original_image_cv2 = self.display_image_cv2
+            self.original_image_cv2.flags.writeable = False
             self.rotation_dirty = False
             self.image_angle = 0
             self.image_angle_float = 0.0
+            self.prelabeler.draw()  # 회전 전 이미지로 만든 후보는 시그니처가 달라져 사라짐
         except Exception as e:
             messagebox.showerror("오류", f"이미지 저장에 실패했습니다: {e}")
 
@@ -516,6 +977,28 @@ class YOLOLabeler:
         self.mode_var.set('rotation')
         self.toggle_mode()
 
+    def on_close(self):
+        self.root.after_cancel(self.memory_job)
+        self.stop_scanner()
+        self.prelabeler.shutdown()
+        self.duplicate_finder.shutdown()
+        self.thumbnail_utils.shutdown()
+        self.image_cache.shutdown()
+        close_readers()
+        close_archives()
+        self.flush_label_write()
+        self.label_writer.stop()
+        self.close_manifest()
+        if not self.label_writer.failed:
+            self.journal.reset()
+        self.journal.close()
+        trace_path = os.environ.get('YOLO_LABELER_TRACE', '')
+        if trace_path.endswith('.json') and TRACER.events:
+            TRACER.export_chrome_trace(trace_path)
+        if self.label_writer.failed:
+            messagebox.showerror("오류", f"라벨 파일 {self.label_writer.failed}개 저장에 실패했습니다.\n{self.label_writer.last_error}")
+        self.root.destroy()
+
 def main():
     root = tk.Tk()
     app = YOLOLabeler(root)
@@ -0,0 +1,190 @@
+import os
+import sqlite3
+
+MANIFEST_NAME = ".yolo_manifest.sqlite"
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+VIDEO_EXTS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v')  # 프레임 단위로 목록에 추가
+ARCHIVE_EXTS = ('.tar', '.zip')  # 안의 이미지를 풀지 않고 목록에 추가
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    labeled INTEGER NOT NULL DEFAULT 0,
+    box_count INTEGER NOT NULL DEFAULT 0,
+    label_mtime_ns INTEGER,
+    dhash INTEGER
+);
+CREATE INDEX IF NOT EXISTS images_labeled ON images (labeled, path);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def count_boxes(label_path):
+    try:
+        with open(label_path, 'r') as f:
+            return sum(1 for line in f if len(line.split()) == 5)
+    except OSError:
+        return 0
+
+
+def label_path(image_path):
+    # 영상 프레임/압축 파일 항목의 라벨 경로도 label_writer 규칙을 따름
+    # (label_writer -> video_source/archive_source -> manifest 순환 import를 피하려고 호출할 때 import)
+    from label_writer import label_path_for
+    return label_path_for(image_path)
+
+
+def file_stat(image_path):
+    # 영상 프레임/압축 파일 항목은 원본 파일 기준 (스캐너와 같은 값), 같은 이유로 호출할 때 import
+    from archive_source import source_file
+    return os.stat(source_file(image_path))
+
+
+def open_manifest(folder):
+    # 읽기 전용 폴더 등에서 DB를 만들 수 없으면 None (매니페스트 없이 동작)
+    # 폴더 스캔은 DatasetScanner가 백그라운드에서 하고, 끝나면 reconcile 로 반영
+    try:
+        return ProjectManifest(folder)
+    except (sqlite3.Error, OSError):
+        return None
+
+
+class ProjectManifest:
+    # 데이터셋 폴더별 SQLite 매니페스트: 이미지 목록, 라벨 여부/박스 수, 크기, 마지막 위치
+    def __init__(self, folder):
+        self.folder = folder
+        self.db_path = os.path.join(folder, MANIFEST_NAME)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(images)")}
+        if 'dhash' not in columns:
+            # 이전 버전에서 만든 매니페스트
+            self.conn.execute("ALTER TABLE images ADD COLUMN dhash INTEGER")
+        self.dirty = False
+
+    def rel(self, image_path):
+        return os.path.relpath(image_path, self.folder)
+
+    def abs(self, rel_path):
+        return os.path.join(self.folder, rel_path)
+
+    def reconcile(self, records):
+        # 스캐너가 모은 (경로, mtime_ns, size, 라벨 mtime_ns) 목록과 비교해 바뀐 항목만 갱신
+        images, labels = {}, {}
+        for path, mtime_ns, size, label_mtime in records:
+            rel = self.rel(path)
+            images[rel] = (mtime_ns, size)
+            labels[rel] = label_mtime
+        known = {row[0]: row[1:] for row in self.conn.execute("SELECT path, mtime_ns, size, label_mtime_ns FROM images")}
+
+        removed = [(path,) for path in known if path not in images]
+        inserts, updates, relabels = [], [], []
+        for path, (mtime_ns, size) in images.items():
+            label_mtime = labels[path]
+            old = known.get(path)
+            if old is None:
+                inserts.append((path, mtime_ns, size))
+            elif old[0] != mtime_ns or old[1] != size:
+                updates.append((mtime_ns, size, path))
+            if old is None or old[2] != label_mtime:
+                boxes = count_boxes(label_path(self.abs(path))) if label_mtime is not None else 0
+                relabels.append((1 if boxes else 0, boxes, label_mtime, path))
+
+        with self.conn:
+            self.conn.executemany("DELETE FROM images WHERE path = ?", removed)
+            self.conn.executemany("INSERT INTO images (path, mtime_ns, size) VALUES (?, ?, ?)", inserts)
+            self.conn.executemany("UPDATE images SET mtime_ns = ?, size = ?, width = NULL, height = NULL, dhash = NULL WHERE path = ?", updates)
+            self.conn.executemany("UPDATE images SET labeled = ?, box_count = ?, label_mtime_ns = ? WHERE path = ?", relabels)
+        return len(inserts), len(removed), len(updates) + len(relabels)
+
+    def add_images(self, records):
+        # 폴더 감시로 새로 발견된 이미지
+        rows = []
+        for path, mtime_ns, size, label_mtime in records:
+            boxes = count_boxes(label_path(path)) if label_mtime is not None else 0
+            rows.append((self.rel(path), mtime_ns, size, 1 if boxes else 0, boxes, label_mtime))
+        self.conn.executemany("INSERT OR REPLACE INTO images (path, mtime_ns, size, labeled, box_count, label_mtime_ns) "
+                              "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.dirty = True
+
+    def remove_images(self, paths):
+        self.conn.executemany("DELETE FROM images WHERE path = ?", [(self.rel(path),) for path in paths])
+        self.dirty = True
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM images LIMIT 1").fetchone() is None
+
+    def image_paths(self):
+        return [self.abs(row[0]) for row in self.conn.execute("SELECT path FROM images ORDER BY path")]
+
+    def record_labels(self, image_path, box_count):
+        # 라벨 파일은 비동기로 기록되므로 mtime은 비워두고, 다음 열기 때 한 번만 다시 확인
+        # 새 폴더의 첫 스캔이 끝나기 전에 저장하면 아직 행이 없으므로 파일 정보로 새 행을 추가
+        rel = self.rel(image_path)
+        labeled = 1 if box_count else 0
+        cursor = self.conn.execute("UPDATE images SET labeled = ?, box_count = ?, label_mtime_ns = NULL WHERE path = ?",
+                                   (labeled, box_count, rel))
+        if cursor.rowcount == 0:
+            try:
+                st = file_stat(image_path)
+            except OSError:
+                return
+            self.conn.execute("INSERT OR IGNORE INTO images (path, mtime_ns, size, labeled, box_count) VALUES (?, ?, ?, ?, ?)",
+                              (rel, st.st_mtime_ns, st.st_size, labeled, box_count))
+        self.dirty = True
+
+    def record_size(self, image_path, width, height):
+        self.conn.execute("UPDATE images SET width = ?, height = ? WHERE path = ? AND (width IS NOT ? OR height IS NOT ?)",
+                          (width, height, self.rel(image_path), width, height))
+        self.dirty = True
+
+    def sizes(self):
+        # {경로: ((mtime_ns, 파일 크기), (너비, 높이))}: 파일 signature가 같을 때만 믿을 수 있는 이미지 크기
+        return {self.abs(path): ((mtime_ns, size), (width, height)) for path, mtime_ns, size, width, height in
+                self.conn.execute("SELECT path, mtime_ns, size, width, height FROM images WHERE width IS NOT NULL")}
+
+    def record_hashes(self, pairs):
+        # 64비트 부호 없는 해시를 SQLite INTEGER(부호 있는 64비트)로 저장
+        self.conn.executemany("UPDATE images SET dhash = ? WHERE path = ?",
+                              [(h - (1 << 64) if h >= 1 << 63 else h, self.rel(path)) for path, h in pairs])
+        self.dirty = True
+
+    def hashes(self):
+        return {self.abs(path): h & ((1 << 64) - 1) for path, h in self.conn.execute("SELECT path, dhash FROM images WHERE dhash IS NOT NULL")}
+
+    def set_last_index(self, index):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_index', ?)", (str(index),))
+        self.dirty = True
+
+    def last_index(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'last_index'").fetchone()
+        return int(row[0]) if row else 0
+
+    def next_unlabeled(self, image_path):
+        # 인덱스를 이용해 현재 이미지 다음의 미라벨 이미지를 찾고, 없으면 처음부터 다시 찾음
+        rel = self.rel(image_path) if image_path else ''
+        row = self.conn.execute("SELECT path FROM images WHERE labeled = 0 AND path > ? ORDER BY path LIMIT 1", (rel,)).fetchone()
+        if row is None:
+            row = self.conn.execute("SELECT path FROM images WHERE labeled = 0 ORDER BY path LIMIT 1").fetchone()
+        return self.abs(row[0]) if row else None
+
+    def stats(self):
+        return self.conn.execute("SELECT COUNT(*), SUM(labeled), SUM(box_count) FROM images").fetchone()
+
+    def commit(self):
+        if self.dirty:
+            self.conn.commit()
+            self.dirty = False
+
+    def close(self):
+        self.commit()
+        self.conn.close()
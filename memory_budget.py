@@ -0,0 +1,76 @@
+import os
+import threading
+
+# 디코딩된 이미지, 영상 프레임, 썸네일, 화면 버퍼를 들고 있는 캐시들이 모두 등록하는 전역 메모리 예산
+# 합계가 예산을 넘으면 우선순위가 낮은 풀부터 줄임 (썸네일 -> 선행 디코딩, 현재 이미지는 줄이지 않음)
+# 환경 변수 YOLO_LABELER_MEMORY_MB 로 예산 변경 (기본 1024MB)
+
+PRIORITY_THUMBNAILS = 0
+PRIORITY_PREFETCH = 1
+PRIORITY_CURRENT = 2
+
+DEFAULT_BUDGET_MB = 1024
+
+
+def budget_from_env():
+    try:
+        mb = int(os.environ.get('YOLO_LABELER_MEMORY_MB', DEFAULT_BUDGET_MB))
+    except ValueError:
+        mb = DEFAULT_BUDGET_MB
+    return max(64, mb) * 1024 * 1024
+
+
+class MemoryAccountant:
+    # 풀마다 usage() -> 현재 바이트 수, trim(바이트) -> 최대 그만큼 해제하고 실제 해제한 바이트 수
+    # trim은 캐시에 넣은 스레드(선행 디코딩 워커 등)에서 호출되므로 각 풀이 자기 잠금으로 보호해야 함
+    def __init__(self, budget=None):
+        self.budget = budget_from_env() if budget is None else budget
+        self.pools = []  # [우선순위, 이름, usage, trim] (우선순위 낮은 순, 같으면 등록 순)
+        self.evicted = {}  # 이름 -> 예산 때문에 해제한 누적 바이트
+        self.lock = threading.Lock()
+        self.requested = threading.Event()  # 워커 스레드가 캐시에 넣은 뒤 표시, Tk 스레드의 poll에서 처리
+
+    def register(self, name, priority, usage, trim=None):
+        # trim이 None이면 집계만 하고 줄이지 않음 (현재 이미지, 화면 버퍼)
+        with self.lock:
+            self.pools.append((priority, name, usage, trim))
+            self.pools.sort(key=lambda pool: pool[0])
+            self.evicted[name] = 0
+
+    def usage(self):
+        return {name: usage() for _, name, usage, _ in self.pools}
+
+    def total(self):
+        return sum(usage() for _, _, usage, _ in self.pools)
+
+    def request(self):
+        # 워커 스레드용: 현재 이미지 집계는 Tk 스레드의 속성을 읽으므로 직접 enforce하지 않고 Tk 스레드에 맡김
+        self.requested.set()
+
+    def poll(self):
+        # Tk 스레드에서 주기적으로 호출
+        if self.requested.is_set():
+            self.requested.clear()
+            self.enforce()
+
+    def enforce(self):
+        # Tk 스레드에서 캐시에 새 항목을 넣은 뒤 호출 (호출하는 쪽은 자기 캐시 잠금을 놓은 상태여야 함)
+        with self.lock:
+            excess = self.total() - self.budget
+            for _, name, _, trim in self.pools:
+                if excess <= 0:
+                    break
+                if trim is None:
+                    continue
+                freed = trim(excess)
+                self.evicted[name] += freed
+                excess -= freed
+            return excess <= 0
+
+    def summary_lines(self):
+        mb = 1024 * 1024
+        lines = [f"{'memory':<20} {'MB':>8} {'evicted':>8}"]
+        for _, name, usage, _ in self.pools:
+            lines.append(f"{name:<20} {usage() / mb:>8.1f} {self.evicted[name] / mb:>8.1f}")
+        lines.append(f"{'total / budget':<20} {self.total() / mb:>8.1f} {self.budget / mb:>8.0f}")
+        return lines
@@ -0,0 +1,165 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+
+# 구간별 소요 시간 측정: with span("render"): ...
+# 꺼져 있으면 span()은 아무 일도 하지 않는 공용 객체를 반환하므로 호출 비용만 남음
+# 환경 변수 YOLO_LABELER_TRACE=1 이면 시작부터 측정, 앱에서는 F12로 켜고 끔
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    __slots__ = ('tracer', 'name', 'start')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.add(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class Tracer:
+    def __init__(self, window=512, max_events=1_000_000):
+        self.enabled = False
+        self.window = window  # 구간별 최근 N개로 백분위 계산
+        self.samples = {}  # 이름 -> deque[소요 시간(ns)]
+        self.counts = {}  # 이름 -> 전체 호출 수
+        self.events = deque(maxlen=max_events)  # Chrome trace 용 (이름, 시작 ns, 소요 ns, 스레드 id)
+        self.thread_names = {}
+        self.lock = threading.Lock()
+
+    def span(self, name):
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    def add(self, name, start, end):
+        tid = threading.get_ident()
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+                self.counts[name] = 0
+            samples.append(end - start)
+            self.counts[name] += 1
+            self.events.append((name, start, end - start, tid))
+            if tid not in self.thread_names:
+                self.thread_names[tid] = threading.current_thread().name
+
+    def stats(self):
+        # {이름: (전체 호출 수, p50, p95, p99, 최대)}, 시간은 ms
+        with self.lock:
+            snapshot = {name: (self.counts[name], np.array(samples, dtype=np.float64)) for name, samples in self.samples.items()}
+        stats = {}
+        for name, (count, values) in snapshot.items():
+            p50, p95, p99 = np.percentile(values, (50, 95, 99)) / 1e6
+            stats[name] = (count, p50, p95, p99, values.max() / 1e6)
+        return stats
+
+    def summary_lines(self):
+        lines = [f"{'span':<20} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"]
+        for name, (count, p50, p95, p99, worst) in sorted(self.stats().items()):
+            lines.append(f"{name:<20} {count:>6} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f} {worst:>8.2f}")
+        return lines
+
+    def export_chrome_trace(self, path):
+        # chrome://tracing 또는 Perfetto 에서 열 수 있는 JSON (세션 전체의 구간 기록)
+        with self.lock:
+            events = list(self.events)
+            thread_names = dict(self.thread_names)
+        pid = os.getpid()
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                 for tid, name in thread_names.items()]
+        trace.extend({'name': name, 'cat': 'labeler', 'ph': 'X', 'pid': pid, 'tid': tid,
+                      'ts': start / 1000, 'dur': dur / 1000} for name, start, dur, tid in events)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.counts.clear()
+            self.events.clear()
+
+
+TRACER = Tracer()
+TRACER.enabled = bool(os.environ.get('YOLO_LABELER_TRACE'))
+
+
+span = TRACER.span  # 모듈 함수 한 단계를 거치지 않도록 메서드를 그대로 사용
+
+
+def traced(name):
+    # 함수 전체를 구간으로 측정하는 데코레이터 (꺼져 있으면 바로 원래 함수 호출)
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return func(*args, **kwargs)
+            with Span(TRACER, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class PerfOverlay:
+    # 캔버스 왼쪽 위에 구간별 백분위와 메모리 풀별 사용량을 표시
+    # 한 번 켜면 표시를 닫아도 측정은 계속함 (Shift+F12로 저장하는 trace가 세션 전체를 담도록)
+    def __init__(self, labeler, tracer=TRACER, interval_ms=500):
+        self.labeler = labeler
+        self.tracer = tracer
+        self.interval_ms = interval_ms
+        self.job = None
+
+    @property
+    def visible(self):
+        return self.job is not None
+
+    def toggle(self):
+        if self.visible:
+            self.hide()
+        else:
+            self.show()
+
+    def show(self):
+        self.tracer.enabled = True
+        self.update()
+
+    def hide(self):
+        if self.job is not None:
+            self.labeler.root.after_cancel(self.job)
+            self.job = None
+        self.labeler.canvas.delete("perf_overlay")
+
+    def update(self):
+        canvas = self.labeler.canvas
+        canvas.delete("perf_overlay")
+        lines = self.tracer.summary_lines() + ["단위 ms, Shift+F12: trace 저장", ""] + self.labeler.memory.summary_lines()
+        text = '\n'.join(lines)
+        item = canvas.create_text(8, 8, text=text, anchor='nw', fill='white', font=('Courier', 9), tags=("perf_overlay",))
+        x1, y1, x2, y2 = canvas.bbox(item)
+        background = canvas.create_rectangle(x1 - 4, y1 - 4, x2 + 4, y2 + 4, fill='black', outline='', stipple='gray50', tags=("perf_overlay",))
+        canvas.tag_lower(background, item)
+        canvas.tag_raise("perf_overlay")
+        self.job = self.labeler.root.after(self.interval_ms, self.update)
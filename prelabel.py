@@ -0,0 +1,336 @@
+import multiprocessing
+import os
+import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from image_cache import file_signature
+from labeling_utils import BOX_COLORS
+from archive_source import decode_member, is_archive_member
+from video_source import is_video_frame, read_frame
+
+# 워커 프로세스 전역 상태 (initializer에서 한 번만 모델을 읽음)
+_net = None
+_settings = None
+
+
+def init_worker(model_path, input_size, conf_threshold, iou_threshold):
+    # CPU 전용: GPU 백엔드를 쓰지 않고, UI/디코딩 스레드용으로 코어 절반은 남겨 둠
+    global _net, _settings
+    cv2.setNumThreads(max(1, (os.cpu_count() or 2) // 2))
+    _net = cv2.dnn.readNetFromONNX(model_path)
+    _net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+    _net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+    _settings = {'input_size': input_size, 'conf': conf_threshold, 'iou': iou_threshold, 'batched': True}
+
+
+def letterbox(img, size):
+    # 비율을 유지해서 size x size 안에 넣고 남는 부분은 회색으로 채움 (YOLO 학습 전처리와 동일)
+    h, w = img.shape[:2]
+    r = min(size / w, size / h)
+    nw, nh = max(1, round(w * r)), max(1, round(h * r))
+    dx, dy = (size - nw) // 2, (size - nh) // 2
+    out = np.full((size, size, 3), 114, dtype=np.uint8)
+    out[dy:dy + nh, dx:dx + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return out, r, dx, dy
+
+
+def decode_output(out, r, dx, dy, width, height, conf_threshold, iou_threshold):
+    # YOLOv8 계열 (4+클래스, N) 과 YOLOv5 계열 (N, 5+클래스, objectness 포함) 출력을 모두 처리
+    if out.shape[0] < out.shape[1]:
+        preds = out.T
+        scores = preds[:, 4:]
+    else:
+        preds = out
+        scores = preds[:, 5:] * preds[:, 4:5]
+    cls = scores.argmax(axis=1)
+    score = scores[np.arange(len(scores)), cls]
+    keep = score >= conf_threshold
+    preds, cls, score = preds[keep], cls[keep], score[keep]
+    if not len(preds):
+        return []
+    # 입력 좌표 -> 원본 픽셀 좌표 (letterbox 역변환)
+    bw, bh = preds[:, 2] / r, preds[:, 3] / r
+    x0 = (preds[:, 0] - dx) / r - bw / 2
+    y0 = (preds[:, 1] - dy) / r - bh / 2
+    rects = np.stack([x0, y0, bw, bh], axis=1)
+    keep = cv2.dnn.NMSBoxesBatched(rects.tolist(), score.tolist(), cls.tolist(), conf_threshold, iou_threshold)
+    proposals = []
+    for i in np.asarray(keep, dtype=np.int64).reshape(-1):
+        x1, y1 = max(0.0, rects[i, 0]), max(0.0, rects[i, 1])
+        x2, y2 = min(width, rects[i, 0] + rects[i, 2]), min(height, rects[i, 1] + rects[i, 3])
+        if x2 <= x1 or y2 <= y1:
+            continue
+        proposals.append((int(cls[i]), float((x1 + x2) / 2 / width), float((y1 + y2) / 2 / height),
+                          float((x2 - x1) / width), float((y2 - y1) / height), float(score[i])))
+    return proposals
+
+
+def detect_batch(items):
+    # 워커 프로세스에서 실행: [(경로, 시그니처)] -> [(경로, 시그니처, 후보 목록 또는 None)]
+    size = _settings['input_size']
+    loaded, results = [], []
+    for path, sig in items:
+        if is_video_frame(path):
+            frame = read_frame(path)
+            img = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR) if frame is not None else None
+        elif is_archive_member(path):
+            img = decode_member(path)
+        else:
+            img = cv2.imread(path)
+        if img is None:
+            results.append((path, sig, None))
+        else:
+            loaded.append((path, sig, img.shape[1], img.shape[0], *letterbox(img, size)))
+    if not loaded:
+        return results
+    blobs = [entry[4] for entry in loaded]
+    outputs = None
+    if _settings['batched'] and len(blobs) > 1:
+        try:
+            _net.setInput(cv2.dnn.blobFromImages(blobs, 1 / 255.0, swapRB=True))
+            outputs = _net.forward()
+        except cv2.error:
+            _settings['batched'] = False  # 배치 크기가 1로 고정된 모델
+    if outputs is None:
+        outputs = []
+        for blob in blobs:
+            _net.setInput(cv2.dnn.blobFromImage(blob, 1 / 255.0, swapRB=True))
+            outputs.append(_net.forward()[0])
+    for (path, sig, width, height, _, r, dx, dy), out in zip(loaded, outputs):
+        results.append((path, sig, decode_output(out, r, dx, dy, width, height, _settings['conf'], _settings['iou'])))
+    return results
+
+
+def box_iou(a, b):
+    ax1, ay1, ax2, ay2 = a[1] - a[3] / 2, a[2] - a[4] / 2, a[1] + a[3] / 2, a[2] + a[4] / 2
+    bx1, by1, bx2, by2 = b[1] - b[3] / 2, b[2] - b[4] / 2, b[1] + b[3] / 2, b[2] + b[4] / 2
+    iw = max(0.0, min(ax2, bx2) - max(ax1, bx1))
+    ih = max(0.0, min(ay2, by2) - max(ay1, by1))
+    inter = iw * ih
+    union = a[3] * a[4] + b[3] * b[4] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class PreLabeler:
+    # 별도 프로세스에서 현재 이미지부터 앞쪽 이미지들을 배치로 추론하고, 결과 후보를 이미지별로 캐시
+    # 후보는 점선 박스로 표시: 클릭하면 수락(라벨로 추가), 오른쪽 클릭하면 거절
+    def __init__(self, labeler, ahead=8, batch_size=4, memory_items=256, input_size=640,
+                 conf_threshold=0.25, iou_threshold=0.45, dup_iou=0.7):
+        self.labeler = labeler
+        self.ahead = ahead
+        self.batch_size = batch_size
+        self.memory_items = memory_items
+        self.input_size = input_size
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.dup_iou = dup_iou  # 기존 라벨과 이 이상 겹치는 후보는 숨김
+        self.model_path = None
+        self.executor = None
+        self.batches = []  # (future, [경로])
+        self.in_flight = set()
+        self.proposals = OrderedDict()  # 이미지 경로 -> (시그니처, 후보 목록) / LRU
+        self.shown = []  # 캔버스에 표시 중인 후보의 목록 내 위치
+        self.drawn_path = None  # 후보 아이템을 그린 이미지와 기준 위치/크기 (줌/이동 시 좌표만 변환)
+        self.drawn_geometry = None
+        self.poll_job = None
+        self.failed = False
+
+    def load_model(self, model_path):
+        self.shutdown()
+        self.model_path = model_path
+        self.failed = False
+        self.proposals.clear()
+        # Tk/스레드가 있는 프로세스를 fork 하지 않도록 spawn 사용
+        self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=init_worker,
+                                            initargs=(model_path, self.input_size, self.conf_threshold, self.iou_threshold))
+        self.prefetch(self.labeler.image_list, self.labeler.current_index)
+
+    def prefetch(self, image_list, index):
+        # 현재 이미지를 먼저, 그다음 앞쪽 이미지들을 batch_size 단위로 요청
+        if self.executor is None or self.failed or not image_list:
+            return
+        window = image_list[index:index + self.ahead + 1]
+        wanted = set(window)
+        # 멀리 건너뛴 경우 아직 시작하지 않은 이전 요청은 취소
+        for future, paths in self.batches:
+            if wanted.isdisjoint(paths) and future.cancel():
+                self.in_flight.difference_update(paths)
+        batch = []
+        for i, path in enumerate(window):
+            if path in self.in_flight:
+                continue
+            sig = file_signature(path)
+            entry = self.proposals.get(path)
+            if entry is not None and entry[0] == sig:
+                continue
+            batch.append((path, sig))
+            # 현재 이미지는 배치를 채우지 않고 바로 요청
+            if i == 0 or len(batch) >= self.batch_size:
+                self.submit(batch)
+                batch = []
+        if batch:
+            self.submit(batch)
+
+    def submit(self, batch):
+        paths = [path for path, _ in batch]
+        self.in_flight.update(paths)
+        self.batches.append((self.executor.submit(detect_batch, batch), paths))
+        if self.poll_job is None:
+            self.poll_job = self.labeler.root.after(50, self.poll_results)
+
+    def poll_results(self):
+        self.poll_job = None
+        pending, redraw = [], False
+        for future, paths in self.batches:
+            if not future.done():
+                pending.append((future, paths))
+                continue
+            self.in_flight.difference_update(paths)
+            if future.cancelled():
+                continue
+            try:
+                results = future.result()
+            except Exception as e:
+                # 모델을 읽지 못하면 워커 풀이 깨지므로 한 번만 알리고 중단
+                if not self.failed:
+                    self.failed = True
+                    self.labeler.on_prelabel_error(e)
+                continue
+            for path, sig, proposals in results:
+                if proposals is None:
+                    continue
+                self.proposals[path] = (sig, proposals)
+                self.proposals.move_to_end(path)
+                redraw = redraw or path == self.labeler.image_path
+            while len(self.proposals) > self.memory_items:
+                self.proposals.popitem(last=False)
+        self.batches = pending
+        if redraw:
+            self.draw()
+        if self.batches:
+            self.poll_job = self.labeler.root.after(50, self.poll_results)
+
+    def current(self):
+        # 파일이 바뀌었으면 (회전 저장 등) 이전 내용으로 만든 후보는 버림 (새 후보는 prefetch가 다시 요청)
+        path = self.labeler.image_path
+        entry = self.proposals.get(path)
+        if entry is None:
+            return []
+        if entry[0] != file_signature(path):
+            del self.proposals[path]
+            return []
+        return entry[1]
+
+    def draw(self):
+        # 후보나 라벨이 바뀔 때만 다시 만듦 (화면 갱신마다 부르지 않음, 줌/이동은 on_geometry_changed)
+        canvas = self.labeler.canvas
+        canvas.delete("proposal")
+        self.shown = []
+        geometry = self.labeler.image_geometry
+        self.drawn_path = self.labeler.image_path
+        self.drawn_geometry = geometry
+        if geometry is None:
+            return
+        off_x, off_y, img_w, img_h = geometry
+        state = tk.HIDDEN if self.labeler.mode == 'rotation' else tk.NORMAL
+        classes = self.labeler.classes
+        for i, (cid, xc, yc, w, h, score) in enumerate(self.current()):
+            if any(int(box[0]) == cid and box_iou(box, (cid, xc, yc, w, h)) >= self.dup_iou for box in self.labeler.bboxes):
+                continue
+            self.shown.append(i)
+            color = BOX_COLORS[cid % len(BOX_COLORS)]
+            x1, y1 = off_x + (xc - w / 2) * img_w, off_y + (yc - h / 2) * img_h
+            x2, y2 = off_x + (xc + w / 2) * img_w, off_y + (yc + h / 2) * img_h
+            tags = ("proposal", f"prop{i}")
+            canvas.create_rectangle(x1, y1, x2, y2, outline=color, width=1, dash=(3, 3), state=state, tags=tags)
+            name = classes[cid] if cid < len(classes) else str(cid)
+            canvas.create_text(x1, y2, text=f"{name}? {score:.2f}", fill=color, anchor=tk.NW, state=state, tags=tags)
+
+    def clear(self):
+        # 이미지가 바뀔 때 호출: 다음 화면 갱신에서 새 이미지 기준으로 다시 그림
+        self.labeler.canvas.delete("proposal")
+        self.shown = []
+        self.drawn_path = self.drawn_geometry = None
+
+    def on_geometry_changed(self):
+        # 줌/이동/리사이즈: 라벨 박스와 같이 아이템을 다시 만들지 않고 canvas.scale/move 로 좌표만 변환
+        geometry = self.labeler.image_geometry
+        old = self.drawn_geometry
+        if old is None or geometry is None or self.drawn_path != self.labeler.image_path:
+            self.draw()
+            return
+        if old == geometry:
+            return
+        canvas = self.labeler.canvas
+        sx = geometry[2] / old[2] if old[2] else 1.0
+        sy = geometry[3] / old[3] if old[3] else 1.0
+        canvas.scale("proposal", old[0], old[1], sx, sy)
+        canvas.move("proposal", geometry[0] - old[0], geometry[1] - old[1])
+        self.drawn_geometry = geometry
+
+    def proposal_at(self, x, y):
+        # 점을 포함하는 표시 중인 후보 중 가장 작은 것
+        if not self.shown or self.labeler.image_geometry is None:
+            return None
+        nx, ny = self.labeler.labeling_utils.canvas_to_norm(x, y)
+        proposals = self.current()
+        best, best_area = None, None
+        for i in self.shown:
+            cid, xc, yc, w, h, _ = proposals[i]
+            if abs(nx - xc) <= w / 2 and abs(ny - yc) <= h / 2 and (best is None or w * h < best_area):
+                best, best_area = i, w * h
+        return best
+
+    def remove(self, indices):
+        path = self.labeler.image_path
+        if path not in self.proposals:
+            return
+        sig, proposals = self.proposals[path]
+        drop = set(indices)
+        self.proposals[path] = (sig, [p for i, p in enumerate(proposals) if i not in drop])
+
+    def accept(self, indices):
+        if not indices:
+            return
+        proposals = self.current()
+        for i in indices:
+            self.labeler.labeling_utils.add_box(tuple(proposals[i][:5]))
+        self.remove(indices)
+        self.labeler.labeling_utils.save_labels_to_txt()  # 후보 표시도 갱신
+
+    def accept_at(self, x, y):
+        i = self.proposal_at(x, y)
+        if i is None:
+            return False
+        self.accept([i])
+        return True
+
+    def reject_at(self, x, y):
+        i = self.proposal_at(x, y)
+        if i is None:
+            return False
+        self.remove([i])
+        self.draw()
+        return True
+
+    def accept_all(self):
+        if self.labeler.mode == 'labeling':
+            self.accept(list(self.shown))
+
+    def reject_all(self):
+        if self.shown:
+            self.remove(self.shown)
+            self.draw()
+
+    def shutdown(self):
+        if self.poll_job is not None:
+            self.labeler.root.after_cancel(self.poll_job)
+            self.poll_job = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.batches = []
+        self.in_flight.clear()
@@ -1,8 +1,54 @@
 import cv2
+import numpy as np
+from perf_trace import traced
+
+
+def rotate_bound(img, angle, interpolation=cv2.INTER_LINEAR):
+    # 잘림 없이 회전하도록 출력 크기를 회전된 경계 상자에 맞춤
+    h, w = img.shape[:2]
+    center = (w / 2, h / 2)
+    M = cv2.getRotationMatrix2D(center, -angle, 1.0)
+
+    abs_cos = abs(M[0, 0])
+    abs_sin = abs(M[0, 1])
+
+    new_w = int(h * abs_sin + w * abs_cos)
+    new_h = int(h * abs_cos + w * abs_sin)
+
+    M[0, 2] += (new_w / 2) - center[0]
+    M[1, 2] += (new_h / 2) - center[1]
+
+    return cv2.warpAffine(
+        img, M, (new_w, new_h),
+        flags=interpolation,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=(255, 255, 255)  # 흰색 배경
+    )
+
+
+def rotate_yolo_boxes(boxes, angle):
+    # 시계방향 90/180/270도 회전에 맞춰 YOLO 정규화 좌표(N x 5)를 한 번에 변환
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 5)
+    cid, xc, yc, w, h = boxes.T
+    angle = angle % 360
+    if angle == 90:
+        return np.stack([cid, 1.0 - yc, xc, h, w], axis=1)
+    if angle == 180:
+        return np.stack([cid, 1.0 - xc, 1.0 - yc, w, h], axis=1)
+    if angle == 270:
+        return np.stack([cid, yc, 1.0 - xc, h, w], axis=1)
+    if angle == 0:
+        return boxes.copy()
+    raise ValueError(f"90도 단위 회전만 지원합니다: {angle}")
+
 
 class RotationUtils:
-    def __init__(self, labeler):
+    def __init__(self, labeler, preview_interval_ms=16):
         self.labeler = labeler
+        self.preview_interval_ms = preview_interval_ms  # 드래그 미리보기 갱신 주기 (약 60Hz)
+        self.preview_job = None
+        self.proxy = None
+        self.proxy_key = None
 
     def apply_rotation_and_redraw(self):
         if self.labeler.original_image_cv2 is None:
@@ -14,7 +60,7 @@ class RotationUtils:
         elif self.labeler.image_angle == 270:
             self.labeler.display_image_cv2 = cv2.rotate(self.labeler.original_image_cv2, cv2.ROTATE_90_COUNTERCLOCKWISE)
         else:
-            self.labeler.display_image_cv2 = self.labeler.original_image_cv2.copy()
+            self.labeler.display_image_cv2 = self.labeler.original_image_cv2  # 읽기 전용 배열이므로 복사하지 않음
         self.labeler.perform_resize()
 
     def rotate_image_left(self):
@@ -33,31 +79,48 @@ class RotationUtils:
         self.labeler.rotation_dirty = True
         self.apply_rotation_and_redraw()
 
+    @traced("rotate.full")
     def apply_smooth_rotation(self):
+        # 원본 해상도로 회전 (드래그 종료/저장 시 한 번만 실행)
+        self.cancel_preview()
         if self.labeler.original_image_cv2 is None:
             return
+        self.labeler.display_image_cv2 = rotate_bound(self.labeler.original_image_cv2, self.labeler.image_angle_float)
+        self.labeler.memory.enforce()  # 원본 해상도 회전 결과만큼 다른 캐시를 줄임
+        self.labeler.perform_resize()
 
-        h, w = self.labeler.original_image_cv2.shape[:2]
-        angle = self.labeler.image_angle_float
-
-        center = (w / 2, h / 2)
-        M = cv2.getRotationMatrix2D(center, -angle, 1.0)
-
-        abs_cos = abs(M[0, 0])
-        abs_sin = abs(M[0, 1])
-
-        new_w = int(h * abs_sin + w * abs_cos)
-        new_h = int(h * abs_cos + w * abs_sin)
-
-        M[0, 2] += (new_w / 2) - center[0]
-        M[1, 2] += (new_h / 2) - center[1]
+    def get_proxy(self):
+        # 화면 크기에 맞춰 축소한 원본을 캐시해 두고 드래그 중에는 이것만 회전 (가능하면 밉맵 단계 재사용)
+        original = self.labeler.original_image_cv2
+        canvas_w, canvas_h = self.labeler.canvas.winfo_width(), self.labeler.canvas.winfo_height()
+        key = (id(original), canvas_w, canvas_h)
+        if self.proxy_key != key:
+            h, w = original.shape[:2]
+            scale = min(1.0, canvas_w / w, canvas_h / h) if canvas_w > 1 and canvas_h > 1 else 1.0
+            pyramid = self.labeler.image_pyramid
+            if pyramid is not None and pyramid.base is original:
+                self.proxy = pyramid.level_for(scale)
+            elif scale < 1.0:
+                self.proxy = cv2.resize(original, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+            else:
+                self.proxy = original
+            self.proxy_key = key
+        return self.proxy
 
-        rotated = cv2.warpAffine(
-            self.labeler.original_image_cv2, M, (new_w, new_h),
-            flags=cv2.INTER_LINEAR,
-            borderMode=cv2.BORDER_CONSTANT,
-            borderValue=(255, 255, 255)  # 흰색 배경
-        )
+    def schedule_preview(self):
+        # 마우스 이동 이벤트를 화면 갱신 주기 단위로 모아서 한 번만 그림
+        if self.preview_job is None:
+            self.preview_job = self.labeler.root.after(self.preview_interval_ms, self.render_preview)
 
-        self.labeler.display_image_cv2 = rotated
+    @traced("rotate.preview")
+    def render_preview(self):
+        self.preview_job = None
+        if self.labeler.original_image_cv2 is None:
+            return
+        self.labeler.display_image_cv2 = rotate_bound(self.get_proxy(), self.labeler.image_angle_float)
         self.labeler.perform_resize()
+
+    def cancel_preview(self):
+        if self.preview_job is not None:
+            self.labeler.root.after_cancel(self.preview_job)
+            self.preview_job = None
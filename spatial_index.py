@@ -0,0 +1,85 @@
+import math
+
+
+class BoxGridIndex:
+    # 정규화 좌표(0~1) 위의 균일 격자 인덱스: 클릭 위치 주변 셀의 박스만 검사
+    def __init__(self, cells=32):
+        self.cells = cells
+        self.grid = {}  # (cx, cy) -> set(box_id)
+        self.bounds = {}  # box_id -> (x1, y1, x2, y2)
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def cell(self, v):
+        return min(self.cells - 1, max(0, int(v * self.cells)))
+
+    def cell_range(self, x1, y1, x2, y2):
+        for cx in range(self.cell(x1), self.cell(x2) + 1):
+            for cy in range(self.cell(y1), self.cell(y2) + 1):
+                yield cx, cy
+
+    def insert(self, box_id, bounds):
+        self.remove(box_id)
+        self.bounds[box_id] = bounds
+        for key in self.cell_range(*bounds):
+            self.grid.setdefault(key, set()).add(box_id)
+
+    def remove(self, box_id):
+        bounds = self.bounds.pop(box_id, None)
+        if bounds is None:
+            return
+        for key in self.cell_range(*bounds):
+            bucket = self.grid.get(key)
+            if bucket is not None:
+                bucket.discard(box_id)
+                if not bucket:
+                    del self.grid[key]
+
+    def clear(self):
+        self.grid.clear()
+        self.bounds.clear()
+
+    def candidates(self, x1, y1, x2, y2):
+        found = set()
+        for key in self.cell_range(x1, y1, x2, y2):
+            found.update(self.grid.get(key, ()))
+        return found
+
+    def query_point(self, x, y):
+        # 점을 포함하는 박스들 (작은 박스부터)
+        hits = []
+        for box_id in self.grid.get((self.cell(x), self.cell(y)), ()):
+            x1, y1, x2, y2 = self.bounds[box_id]
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                hits.append(((x2 - x1) * (y2 - y1), box_id))
+        return [box_id for _, box_id in sorted(hits)]
+
+    def query_rect(self, x1, y1, x2, y2, contained=False):
+        # 올가미 사각형과 겹치는(contained=True면 완전히 포함되는) 박스들
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        hits = []
+        for box_id in self.candidates(x1, y1, x2, y2):
+            bx1, by1, bx2, by2 = self.bounds[box_id]
+            if contained:
+                if x1 <= bx1 and bx2 <= x2 and y1 <= by1 and by2 <= y2:
+                    hits.append(box_id)
+            elif bx1 <= x2 and x1 <= bx2 and by1 <= y2 and y1 <= by2:
+                hits.append(box_id)
+        return hits
+
+    def nearest_edge(self, x, y, max_dx, max_dy):
+        # 테두리까지의 거리가 허용 범위(max_dx, max_dy 로 정규화) 안인 가장 가까운 박스
+        best_id, best_dist = None, 1.0
+        for box_id in self.candidates(x - max_dx, y - max_dy, x + max_dx, y + max_dy):
+            x1, y1, x2, y2 = self.bounds[box_id]
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                dist = min((x - x1) / max_dx, (x2 - x) / max_dx, (y - y1) / max_dy, (y2 - y) / max_dy)
+            else:
+                dx = max(x1 - x, 0.0, x - x2) / max_dx
+                dy = max(y1 - y, 0.0, y - y2) / max_dy
+                dist = math.hypot(dx, dy)
+            if dist <= best_dist:
+                best_id, best_dist = box_id, dist
+        return best_id
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from edit_journal import EditJournal, orphaned_journals, recover
+from label_validator import check_boxes
+from label_writer import format_labels, label_path_for, parse_labels
+from rotation_utils import rotate_yolo_boxes
+
+BOXES = [(0, 0.5, 0.5, 0.2, 0.1), (3, 0.125, 0.75, 0.25, 0.5)]
+
+
+def test_labels_round_trip():
+    text = format_labels(BOXES)
+    assert text == "0 0.500000 0.500000 0.200000 0.100000\n3 0.125000 0.750000 0.250000 0.500000\n"
+    assert parse_labels(text) == BOXES
+    assert format_labels(parse_labels(text)) == text
+
+
+def test_parse_labels_skips_malformed_lines():
+    assert parse_labels("0 0.5 0.5 0.2 0.1\n\n1 0.5\n") == [BOXES[0]]
+
+
+def test_label_path_for():
+    assert label_path_for("/d/img.jpg") == "/d/img.txt"
+    assert label_path_for("/d/clip.mp4#000012") == "/d/clip_000012.txt"
+    assert label_path_for("/d/shard.zip#a/b.jpg") == "/d/shard_labels/a/b.txt"
+
+
+def test_rotate_yolo_boxes_90():
+    rotated = rotate_yolo_boxes([(1, 0.2, 0.3, 0.1, 0.4)], 90)
+    np.testing.assert_allclose(rotated, [[1, 0.7, 0.2, 0.4, 0.1]])
+
+
+@pytest.mark.parametrize("angles", [(90, 270), (180, 180), (90, 90, 90, 90)])
+def test_rotate_yolo_boxes_back_to_start(angles):
+    boxes = np.array(BOXES, dtype=np.float64)
+    for angle in angles:
+        boxes = rotate_yolo_boxes(boxes, angle)
+    np.testing.assert_allclose(boxes, BOXES)
+
+
+def test_rotate_yolo_boxes_rejects_other_angles():
+    with pytest.raises(ValueError):
+        rotate_yolo_boxes(BOXES, 45)
+
+
+def test_check_boxes_flags_nonfinite():
+    boxes = np.array([BOXES[0], (0, np.nan, 0.5, 0.1, 0.1), (0, 0.5, 0.5, np.inf, 0.1)])
+    checks = check_boxes(boxes, np.zeros(3, np.int32), num_classes=5)
+    assert checks['nonfinite'].tolist() == [1, 2]
+    assert checks['range'].tolist() == []
+
+
+def test_journal_recover_replays_unsaved_edits(tmp_path):
+    label_path = str(tmp_path / "img.txt")
+    journal = EditJournal(str(tmp_path / "journals"))
+    journal.open()
+    try:
+        journal.begin(label_path, '')
+        journal.record('A', 0, BOXES[0])
+        journal.record('A', 1, BOXES[1])
+        journal.record('D', 0, BOXES[0])
+        journal.undo()  # 삭제 되돌리기
+        assert recover(journal.path) == {label_path: format_labels(BOXES)}
+    finally:
+        journal.close()
+
+
+def test_journal_recover_keeps_files_changed_elsewhere(tmp_path):
+    label_path = tmp_path / "img.txt"
+    journal = EditJournal(str(tmp_path / "journals"))
+    journal.open()
+    try:
+        journal.begin(str(label_path), '')
+        journal.record('A', 0, BOXES[0])
+        label_path.write_text(format_labels(BOXES[1:]))  # 기록 이후 다른 곳에서 수정
+        assert recover(journal.path) == {}
+    finally:
+        journal.close()
+
+
+def test_running_journal_is_not_orphaned(tmp_path):
+    directory = str(tmp_path / "journals")
+    journal = EditJournal(directory)
+    journal.open()
+    journal.begin(str(tmp_path / "img.txt"), '')
+    assert orphaned_journals(directory) == []
+    journal.reset()
+    journal.close()
+    assert sorted(p.name for p in (tmp_path / "journals").iterdir()) == []
@@ -0,0 +1,291 @@
+import hashlib
+import io
+import os
+import queue
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageTk
+from archive_source import is_archive_member, read_member, source_file
+from memory_budget import PRIORITY_THUMBNAILS
+from tiled_source import TiledImageSource, is_large_tiff
+from video_source import is_video_frame, read_frame
+
+# 썸네일 디스크 캐시 위치 (경로/수정시각/크기 기반 content-addressed 키)
+THUMB_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yolo_labeler", "thumbnails")
+
+
+def thumbnail_cache_key(img_path, size):
+    st = os.stat(source_file(img_path))
+    raw = f"{os.path.abspath(img_path)}|{st.st_mtime_ns}|{st.st_size}|{size}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def make_thumbnail(img_path, size, cache_dir=THUMB_CACHE_DIR):
+    # 워커 스레드에서 실행: 캐시 적중 시 작은 파일만 읽고, 아니면 축소 디코딩 후 캐시에 기록
+    key = thumbnail_cache_key(img_path, size)
+    cache_path = os.path.join(cache_dir, key[:2], key + '.jpg')
+    if os.path.exists(cache_path):
+        try:
+            with Image.open(cache_path) as cached:
+                cached.load()
+                return cached.copy()
+        except OSError:
+            pass  # 손상된 캐시 파일은 다시 생성
+    if is_large_tiff(img_path):
+        # 대형 TIFF는 띠 단위로 스트리밍하며 축소 (전체 해상도를 메모리에 올리지 않음)
+        source = TiledImageSource(img_path, overview_size=size * 2)
+        try:
+            img = Image.fromarray(source.overview.base)
+        finally:
+            source.close()
+        img.thumbnail((size, size))
+    elif is_video_frame(img_path):
+        frame = read_frame(img_path)
+        if frame is None:
+            raise OSError(f"프레임을 읽을 수 없습니다: {img_path}")
+        img = Image.fromarray(frame)
+        img.thumbnail((size, size))
+    else:
+        # 압축 파일 항목은 인코딩된 바이트를 그대로 열어서 같은 방식으로 축소 디코딩
+        source = io.BytesIO(read_member(img_path)) if is_archive_member(img_path) else img_path
+        with Image.open(source) as img:
+            # JPEG는 draft로 1/2~1/8 축소 디코딩 (전체 해상도 디코딩 생략)
+            img.draft('RGB', (size, size))
+            img = img.convert('RGB')
+            img.thumbnail((size, size))
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"  # 같은 썸네일을 여러 워커 스레드가 동시에 만들 수 있음
+    try:
+        img.save(tmp_path, 'JPEG', quality=85)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return img
+
+
+def thumb_nbytes(img):
+    return img.width * img.height * len(img.getbands())
+
+
+class ThumbnailUtils:
+    def __init__(self, labeler, max_workers=None, overscan=4, memory_items=512):
+        self.labeler = labeler
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.results = queue.Queue()
+        self.in_flight = {}  # index -> future
+        self.generation = 0  # 폴더가 바뀌면 증가시켜 이전 작업 결과를 무시
+        self.poll_job = None
+        self.warm_cursor = 0  # 화면 밖 썸네일을 디스크 캐시에 미리 채우는 위치
+        self.overscan = overscan
+        self.memory_items = memory_items
+        self.thumb_cache = OrderedDict()  # 이미지 경로 -> PIL 썸네일 (LRU, 개수 + 전역 메모리 예산 제한)
+        self.thumb_bytes = 0
+        self.lock = threading.Lock()  # 메모리 예산 초과 시 다른 스레드에서 thumb_cache를 줄일 수 있음
+        self.rows = []  # 재사용되는 행 위젯 풀: [label, window_id, photo, index]
+        self.first_visible = 0
+        self.row_height = labeler.thumbnail_size + 14
+        self.blank = Image.new('RGB', (labeler.thumbnail_size, labeler.thumbnail_size), (230, 230, 230))
+
+        canvas = self.labeler.thumb_canvas
+        canvas.configure(yscrollcommand=self.on_scroll, yscrollincrement=self.row_height // 4)
+        canvas.bind("<Configure>", lambda e: self.update_visible_rows())
+        labeler.memory.register("thumbnails", PRIORITY_THUMBNAILS, self.memory_usage, self.trim)
+
+    def load_thumbnails(self):
+        # 진행 중인 작업 취소 후 목록 크기만큼 스크롤 영역만 잡고, 보이는 행만 그림
+        with self.lock:
+            self.thumb_cache.clear()
+            self.thumb_bytes = 0
+        self.labeler.thumb_canvas.yview_moveto(0)
+        self.refresh()
+
+    def refresh(self):
+        # 이미지 목록이 바뀌었을 때 호출: 인덱스 기반 작업은 취소하고 스크롤 영역과 보이는 행 갱신
+        self.cancel()
+        self.warm_cursor = 0
+        count = len(self.labeler.image_list)
+        self.labeler.thumb_canvas.configure(scrollregion=(0, 0, 120, max(1, count * self.row_height)))
+        for row in self.rows:
+            self.release_row(row)
+        self.update_visible_rows()
+
+    def on_scroll(self, first, last):
+        self.labeler.thumb_scrollbar.set(first, last)
+        self.update_visible_rows()
+
+    def ensure_pool(self, needed):
+        canvas = self.labeler.thumb_canvas
+        if len(self.rows) >= needed:
+            return
+        for row in self.rows:
+            self.release_row(row)  # 풀 크기가 바뀌면 행 배정을 처음부터 다시 함
+        while len(self.rows) < needed:
+            photo = ImageTk.PhotoImage(self.blank)
+            lbl = tk.Label(canvas, image=photo, cursor="hand2", borderwidth=2, relief="groove")
+            window_id = canvas.create_window(5, -self.row_height, window=lbl, anchor="nw", state="hidden")
+            row = [lbl, window_id, photo, None]
+            lbl.bind("<Button-1>", lambda event, r=row: r[3] is not None and self.labeler.select_image(r[3]))
+            self.rows.append(row)
+
+    def release_row(self, row):
+        # 배정을 해제한 행은 숨김 (목록이 줄어들면 다시 배정되지 않아 이전 썸네일이 남음)
+        row[3] = None
+        self.labeler.thumb_canvas.itemconfigure(row[1], state="hidden")
+
+    def update_visible_rows(self):
+        canvas = self.labeler.thumb_canvas
+        count = len(self.labeler.image_list)
+        height = max(canvas.winfo_height(), self.row_height)
+        top = int(canvas.canvasy(0))
+        first = max(0, top // self.row_height - self.overscan)
+        last = min(count, (top + height) // self.row_height + 1 + self.overscan)
+        self.first_visible = first
+        self.ensure_pool(height // self.row_height + 2 + 2 * self.overscan)
+
+        # 행 풀을 index % 풀크기 로 배정하면 스크롤 시 바뀐 행만 다시 바인딩됨
+        pool = len(self.rows)
+        wanted = set(range(first, last))
+        for row in self.rows:
+            if row[3] is not None and row[3] not in wanted:
+                self.release_row(row)
+        for idx in range(first, last):
+            row = self.rows[idx % pool]
+            if row[3] != idx:
+                row[3] = idx
+                canvas.coords(row[1], 5, idx * self.row_height + 5)
+                canvas.itemconfigure(row[1], state="normal")
+                self.bind_row(row)
+        self.highlight_current()
+        self.request_thumbnails(first, last)
+
+    def bind_row(self, row):
+        path = self.labeler.image_list[row[3]]
+        with self.lock:
+            thumb = self.thumb_cache.get(path)
+            if thumb is not None:
+                self.thumb_cache.move_to_end(path)
+        row[2].paste(self.square(thumb))
+
+    def square(self, thumb):
+        # PhotoImage를 재사용하기 위해 항상 같은 크기의 정사각형으로 맞춤
+        canvas_img = self.blank.copy()
+        if thumb is not None:
+            size = self.labeler.thumbnail_size
+            canvas_img.paste(thumb, ((size - thumb.width) // 2, (size - thumb.height) // 2))
+        return canvas_img
+
+    def highlight_current(self):
+        for row in self.rows:
+            row[0].config(relief="solid" if row[3] == self.labeler.current_index else "groove")
+
+    def request_thumbnails(self, first, last):
+        # 화면 범위 밖의 대기 작업은 취소하고 보이는 행부터 요청
+        for idx, future in list(self.in_flight.items()):
+            if not first <= idx < last and future.cancel():
+                del self.in_flight[idx]
+                # 미리 채우기 작업이 취소되었으면 그 위치부터 다시 채움
+                self.warm_cursor = min(self.warm_cursor, idx)
+        for idx in range(first, last):
+            if self.labeler.image_list[idx] not in self.thumb_cache and idx not in self.in_flight:
+                self.submit(idx)
+        self.warm_up()
+        if self.in_flight:
+            self.schedule_poll()
+
+    def warm_up(self):
+        # 여유가 있을 때 나머지 썸네일을 순서대로 디스크 캐시에 채워 다음 열기를 빠르게 함
+        count = len(self.labeler.image_list)
+        while len(self.in_flight) < self.max_workers * 2 and self.warm_cursor < count:
+            idx = self.warm_cursor
+            self.warm_cursor += 1
+            if self.labeler.image_list[idx] not in self.thumb_cache and idx not in self.in_flight:
+                self.submit(idx)
+
+    def submit(self, idx):
+        gen = self.generation
+        future = self.executor.submit(make_thumbnail, self.labeler.image_list[idx], self.labeler.thumbnail_size)
+        future.add_done_callback(lambda f: self.results.put((gen, idx, f)))
+        self.in_flight[idx] = future
+
+    def schedule_poll(self):
+        if self.poll_job is None:
+            self.poll_job = self.labeler.root.after(30, self.poll_results)
+
+    def poll_results(self):
+        # Tk 객체는 메인 스레드에서만 다뤄야 하므로 완료된 결과를 모아서 반영
+        self.poll_job = None
+        pool = len(self.rows)
+        while True:
+            try:
+                gen, idx, future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if gen != self.generation or self.in_flight.get(idx) is not future:
+                continue
+            del self.in_flight[idx]
+            if future.cancelled() or future.exception() is not None:
+                continue
+            row = self.rows[idx % pool] if pool else None
+            if row is None or row[3] != idx:
+                continue  # 화면 밖 결과는 디스크 캐시에만 남김
+            self.add_thumbnail(self.labeler.image_list[idx], future.result())
+            self.bind_row(row)
+        self.labeler.memory.enforce()
+        self.warm_up()
+        if self.in_flight:
+            self.schedule_poll()
+
+    def add_thumbnail(self, path, thumb):
+        with self.lock:
+            old = self.thumb_cache.pop(path, None)
+            if old is not None:
+                self.thumb_bytes -= thumb_nbytes(old)
+            self.thumb_cache[path] = thumb
+            self.thumb_bytes += thumb_nbytes(thumb)
+            if len(self.thumb_cache) > self.memory_items:
+                self.thumb_bytes -= thumb_nbytes(self.thumb_cache.popitem(last=False)[1])
+
+    def invalidate(self, path):
+        # 이미지 파일을 다시 쓴 뒤 호출 (회전 저장): 메모리의 썸네일을 버리고, 보이는 행이면 새로 생성
+        # (디스크 캐시 키에 수정 시각이 들어가므로 새 파일 기준으로 다시 만들어짐, 완료될 때까지 이전 썸네일 표시)
+        with self.lock:
+            old = self.thumb_cache.pop(path, None)
+            if old is not None:
+                self.thumb_bytes -= thumb_nbytes(old)
+        for row in self.rows:
+            idx = row[3]
+            if idx is None or self.labeler.image_list[idx] != path:
+                continue
+            future = self.in_flight.pop(idx, None)
+            if future is not None:
+                future.cancel()  # 이전 파일로 만드는 중인 결과는 poll_results에서 무시됨
+            self.submit(idx)
+            self.schedule_poll()
+
+    def trim(self, excess):
+        # 전역 메모리 예산용: 오래 안 본 썸네일부터 해제 (화면의 행 PhotoImage는 그대로 남음)
+        freed = 0
+        with self.lock:
+            while self.thumb_cache and freed < excess:
+                freed += thumb_nbytes(self.thumb_cache.popitem(last=False)[1])
+            self.thumb_bytes -= freed
+        return freed
+
+    def memory_usage(self):
+        # PIL 썸네일 + 재사용 행의 PhotoImage (Tk는 픽셀당 4바이트)
+        size = self.labeler.thumbnail_size
+        return self.thumb_bytes + len(self.rows) * size * size * 4
+
+    def cancel(self):
+        self.generation += 1
+        for future in self.in_flight.values():
+            future.cancel()
+        self.in_flight.clear()
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
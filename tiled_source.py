@@ -0,0 +1,251 @@
+import math
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from PIL import Image, TiffImagePlugin
+from image_pyramid import ImagePyramid, warp_region
+
+try:
+    import tifffile  # 선택: 압축된 타일 TIFF를 타일 단위로 디코딩
+except ImportError:
+    tifffile = None
+
+TILED_EXTS = ('.tif', '.tiff')
+LARGE_IMAGE_PIXELS = 64 * 1024 * 1024  # 이보다 큰 TIFF는 전체를 디코딩하지 않고 타일 단위로 읽음
+
+
+def open_tiff(path):
+    # 정사영상 같은 기가픽셀 TIFF는 PIL의 decompression bomb 제한에 걸리므로 여기서만 제한 없이 엶
+    # (Image.open 대신 TIFF 플러그인을 직접 생성하면 크기 검사를 건너뜀, 전역 제한은 그대로 둠)
+    # 헤더/타일 목록만 읽고 실제 디코딩은 필요한 띠/타일 범위로 제한해서 함
+    try:
+        return TiffImagePlugin.TiffImageFile(path)
+    except SyntaxError as e:  # PIL 플러그인은 형식이 맞지 않으면 SyntaxError를 냄 (Image.open과 같이 OSError로 바꿈)
+        raise OSError(f"TIFF 파일이 아닙니다: {path}") from e
+
+
+def to_rgb8(arr):
+    # 흑백/RGBA/16비트 등을 화면 표시용 RGB uint8 로 변환
+    if arr.dtype != np.uint8:
+        if arr.dtype == np.uint16:
+            arr = (arr >> 8).astype(np.uint8)
+        else:
+            arr = cv2.normalize(arr, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    if arr.ndim == 2:
+        return cv2.cvtColor(arr, cv2.COLOR_GRAY2RGB)
+    if arr.shape[2] == 1:
+        return cv2.cvtColor(arr[:, :, 0], cv2.COLOR_GRAY2RGB)
+    return np.ascontiguousarray(arr[:, :, :3])
+
+
+def image_size(path):
+    # 헤더만 읽어서 크기 확인
+    is_tiff = isinstance(path, str) and path.lower().endswith(TILED_EXTS)
+    with (open_tiff(path) if is_tiff else Image.open(path)) as im:
+        return im.size
+
+
+def is_large_tiff(path):
+    if not path.lower().endswith(TILED_EXTS):
+        return False
+    try:
+        w, h = image_size(path)
+    except OSError:
+        return False
+    return w * h > LARGE_IMAGE_PIXELS
+
+
+class TiffSegmentReader:
+    # tifffile로 필요한 타일/스트립만 파일에서 읽어 디코딩
+    def __init__(self, path):
+        self.tif = tifffile.TiffFile(path)
+        series = self.tif.series[0]
+        page = self.page = series.keyframe
+        if page.planarconfig != 1 or page.imagedepth > 1:
+            self.tif.close()
+            raise ValueError("지원하지 않는 TIFF 구성입니다")
+        self.width, self.height = page.imagewidth, page.imagelength
+        if page.is_tiled:
+            self.seg_w, self.seg_h = page.tilewidth, page.tilelength
+        else:
+            self.seg_w, self.seg_h = page.imagewidth, page.rowsperstrip
+        self.across = -(-self.width // self.seg_w)
+        self.levels = series.levels
+        self.decode_args = {}
+        if page.jpegtables is not None:
+            self.decode_args['jpegtables'] = page.jpegtables
+        if getattr(page, 'jpegheader', None) is not None:
+            self.decode_args['jpegheader'] = page.jpegheader
+
+    def read_segment(self, sx, sy):
+        index = sy * self.across + sx
+        fh = self.tif.filehandle
+        with fh.lock:
+            fh.seek(self.page.dataoffsets[index])
+            data = fh.read(self.page.databytecounts[index])
+        segment, _, _ = self.page.decode(data, index, **self.decode_args)
+        return to_rgb8(segment[0])  # (depth, length, width, samples) 에서 depth 제거
+
+    def read_region(self, x0, y0, x1, y1):
+        out = np.empty((y1 - y0, x1 - x0, 3), np.uint8)
+        for sy in range(y0 // self.seg_h, (y1 - 1) // self.seg_h + 1):
+            for sx in range(x0 // self.seg_w, (x1 - 1) // self.seg_w + 1):
+                seg = self.read_segment(sx, sy)
+                gx0, gy0 = sx * self.seg_w, sy * self.seg_h
+                ix0, iy0 = max(x0, gx0), max(y0, gy0)
+                ix1, iy1 = min(x1, gx0 + seg.shape[1]), min(y1, gy0 + seg.shape[0])
+                out[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0] = seg[iy0 - gy0:iy1 - gy0, ix0 - gx0:ix1 - gx0]
+        return out
+
+    def embedded_overview(self, min_size):
+        # 파일에 축소 단계(피라미드)가 있으면 min_size 이상인 가장 작은 단계를 그대로 사용
+        for level in reversed(self.levels[1:]):
+            if max(level.shape[:2]) >= min_size and level.size * level.dtype.itemsize <= 64 * 1024 * 1024:
+                return to_rgb8(level.asarray())
+        return None
+
+    def close(self):
+        self.tif.close()
+
+
+class PILStripReader:
+    # tifffile이 없을 때: 비압축 TIFF는 PIL 타일 목록 중 필요한 스트립/타일만 디코딩
+    def __init__(self, path):
+        self.path = path
+        with open_tiff(path) as im:
+            if im.format != 'TIFF' or not im.tile or any(t[0] != 'raw' for t in im.tile):
+                raise ValueError("타일 단위로 읽을 수 없는 TIFF입니다 (tifffile 필요)")
+            self.entries = list(im.tile)
+            self.width, self.height = im.size
+
+    def read_region(self, x0, y0, x1, y1):
+        hits = [t for t in self.entries if t[1][0] < x1 and x0 < t[1][2] and t[1][1] < y1 and y0 < t[1][3]]
+        bx0, by0 = min(t[1][0] for t in hits), min(t[1][1] for t in hits)
+        bx1, by1 = max(t[1][2] for t in hits), max(t[1][3] for t in hits)
+        with open_tiff(self.path) as im:
+            # 필요한 타일만 남기고 이미지 크기를 그 범위로 줄여서 디코딩
+            im._size = (bx1 - bx0, by1 - by0)
+            im.tile = [t._replace(extents=(t[1][0] - bx0, t[1][1] - by0, t[1][2] - bx0, t[1][3] - by0)) for t in hits]
+            im.load()
+            band = to_rgb8(np.asarray(im))
+        return band[y0 - by0:y1 - by0, x0 - bx0:x1 - bx0]
+
+    def embedded_overview(self, min_size):
+        return None
+
+    def close(self):
+        pass
+
+
+def open_reader(path):
+    if tifffile is not None:
+        try:
+            return TiffSegmentReader(path)
+        except (ValueError, NotImplementedError, tifffile.TiffFileError):
+            pass
+    return PILStripReader(path)
+
+
+class TiledImageSource:
+    # 뷰포트에 걸친 타일만 디코딩하고 LRU 타일 캐시에 보관하는 이미지 소스 (ImagePyramid와 같은 render 인터페이스)
+    def __init__(self, path, tile_size=512, cache_bytes=256 * 1024 * 1024, overview_size=2048):
+        self.path = path
+        self.reader = open_reader(path)
+        self.width, self.height = self.reader.width, self.reader.height
+        self.tile_size = tile_size
+        self.cache_bytes = cache_bytes
+        self.tiles = OrderedDict()  # (level, tx, ty) -> RGB 타일
+        self.tile_bytes = 0
+        self.lock = threading.RLock()
+        overview = self.reader.embedded_overview(overview_size)
+        if overview is None:
+            overview = self.build_overview(overview_size)
+        overview.flags.writeable = False
+        self.overview = ImagePyramid(overview)
+        self.overview_scale = self.overview.width / self.width
+        # 이 단계보다 더 축소해서 볼 때는 overview 사용
+        self.max_level = max(0, int(math.floor(math.log2(1 / self.overview_scale))))
+
+    base = None  # 전체 해상도 배열은 메모리에 두지 않음
+    reduced = False  # 화면에 필요한 타일은 항상 원본 해상도로 읽음
+
+    @property
+    def nbytes(self):
+        return self.overview.nbytes + self.tile_bytes
+
+    def build_overview(self, overview_size):
+        # 타일 높이만큼의 띠를 하나씩 읽어 축소하므로 최대 메모리는 띠 하나 크기
+        scale = min(1.0, overview_size / max(self.width, self.height))
+        ow, oh = max(1, round(self.width * scale)), max(1, round(self.height * scale))
+        overview = np.empty((oh, ow, 3), np.uint8)
+        for y in range(0, self.height, self.tile_size):
+            y1 = min(self.height, y + self.tile_size)
+            oy0, oy1 = round(y * scale), round(y1 * scale)
+            if oy1 <= oy0:
+                continue
+            band = self.reader.read_region(0, y, self.width, y1)
+            overview[oy0:oy1] = cv2.resize(band, (ow, oy1 - oy0), interpolation=cv2.INTER_AREA)
+        return overview
+
+    def get_tile(self, level, tx, ty):
+        key = (level, tx, ty)
+        with self.lock:
+            tile = self.tiles.get(key)
+            if tile is not None:
+                self.tiles.move_to_end(key)
+                return tile
+        ts = self.tile_size
+        if level == 0:
+            x0, y0 = tx * ts, ty * ts
+            tile = self.reader.read_region(x0, y0, min(self.width, x0 + ts), min(self.height, y0 + ts))
+        else:
+            # 아래 단계의 타일 4개를 합쳐 절반으로 축소
+            parts = []
+            for cy in (2 * ty, 2 * ty + 1):
+                row = [self.get_tile(level - 1, cx, cy) for cx in (2 * tx, 2 * tx + 1) if self.tile_exists(level - 1, cx, cy)]
+                if row:
+                    parts.append(np.hstack(row) if len(row) > 1 else row[0])
+            merged = np.vstack(parts) if len(parts) > 1 else parts[0]
+            tile = cv2.resize(merged, (max(1, (merged.shape[1] + 1) // 2), max(1, (merged.shape[0] + 1) // 2)), interpolation=cv2.INTER_AREA)
+        with self.lock:
+            self.tiles[key] = tile
+            self.tile_bytes += tile.nbytes
+            while self.tile_bytes > self.cache_bytes and len(self.tiles) > 1:
+                self.tile_bytes -= self.tiles.popitem(last=False)[1].nbytes
+        return tile
+
+    def tile_exists(self, level, tx, ty):
+        span = self.tile_size << level
+        return tx * span < self.width and ty * span < self.height
+
+    def render(self, x0, y0, x1, y1, out_w, out_h, dst=None):
+        scale = out_w / max(x1 - x0, 1e-6)
+        if scale <= self.overview_scale * 1.001:
+            s = self.overview_scale
+            return self.overview.render(x0 * s, y0 * s, x1 * s, y1 * s, out_w, out_h, dst)
+        # 필요한 해상도 이상인 가장 작은 타일 단계에서 보이는 타일만 모아서 샘플링
+        level = min(self.max_level, max(0, int(math.floor(math.log2(1 / scale)))))
+        span = self.tile_size << level
+        tx0, ty0 = max(0, int(x0 // span)), max(0, int(y0 // span))
+        tx1 = min(int(math.ceil(x1 / span)), -(-self.width // span))
+        ty1 = min(int(math.ceil(y1 / span)), -(-self.height // span))
+        rows = [np.hstack([self.get_tile(level, tx, ty) for tx in range(tx0, tx1)]) for ty in range(ty0, ty1)]
+        mosaic = np.vstack(rows) if len(rows) > 1 else rows[0]
+        ls = 1.0 / (1 << level)
+        rx = (x1 - x0) * ls / out_w
+        ry = (y1 - y0) * ls / out_h
+        ox, oy = tx0 * self.tile_size, ty0 * self.tile_size
+        return warp_region(mosaic, x0 * ls - ox, y0 * ls - oy, rx, ry, out_w, out_h, dst)
+
+    def evict_bytes(self, nbytes):
+        # 메모리가 부족할 때 오래된 타일부터 해제
+        freed = 0
+        with self.lock:
+            while self.tiles and freed < nbytes:
+                freed += self.tiles.popitem(last=False)[1].nbytes
+            self.tile_bytes -= freed
+        return freed
+
+    def close(self):
+        self.reader.close()
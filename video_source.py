@@ -0,0 +1,260 @@
+import bisect
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+import cv2
+from manifest import VIDEO_EXTS
+
+# 영상의 각 프레임은 "영상 경로#프레임 번호(6자리)" 형식의 가상 경로로 목록에 들어감
+# (번호를 0으로 채워서 경로 문자열 순서와 프레임 순서가 같음, 라벨은 label_writer.label_path_for 참고)
+FRAME_SEP = '#'
+
+# 키프레임 목록 캐시 (영상 경로/수정시각/크기 기반 키, ffprobe 결과는 다시 계산하지 않음)
+INDEX_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yolo_labeler", "video_index")
+
+
+def frame_path(video_path, index):
+    return f"{video_path}{FRAME_SEP}{index:06d}"
+
+
+def split_frame_path(path):
+    # 프레임 경로면 (영상 경로, 프레임 번호), 아니면 (None, None)
+    base, sep, frame = path.rpartition(FRAME_SEP)
+    if sep and frame.isdigit() and base.lower().endswith(VIDEO_EXTS):
+        return base, int(frame)
+    return None, None
+
+
+def is_video_frame(path):
+    return split_frame_path(path)[0] is not None
+
+
+def source_file(path):
+    # stat/수정 시각 확인에 쓸 실제 파일 경로
+    video_path, _ = split_frame_path(path)
+    return video_path or path
+
+
+def probe_keyframes(video_path):
+    # ffprobe로 패킷 헤더만 읽어 (프레임 수, 표시 순서 기준 키프레임 번호 목록)을 구함, ffprobe가 없으면 None
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe is None:
+        return None
+    try:
+        out = subprocess.run([ffprobe, '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'packet=pts,flags',
+                              '-of', 'csv=p=0', video_path], capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    packets = []
+    for order, line in enumerate(out.splitlines()):
+        pts, _, flags = line.partition(',')
+        packets.append((int(pts) if pts.lstrip('-').isdigit() else order, 'K' in flags))
+    if not packets:
+        return None
+    packets.sort()  # B-프레임이 있으면 디코딩 순서와 표시 순서가 다름
+    return len(packets), [i for i, (_, key) in enumerate(packets) if key]
+
+
+def index_cache_path(video_path):
+    st = os.stat(video_path)
+    raw = f"{os.path.abspath(video_path)}|{st.st_mtime_ns}|{st.st_size}"
+    key = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return os.path.join(INDEX_CACHE_DIR, key[:2], key + '.json')
+
+
+def load_index(video_path):
+    # (프레임 수, 키프레임 목록 또는 None): 캐시 -> ffprobe -> VideoCapture 메타데이터 순서로 시도
+    cache_path = index_cache_path(video_path)
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        return cached['frames'], cached['keyframes']
+    except (OSError, ValueError, KeyError):
+        pass
+    probed = probe_keyframes(video_path)
+    if probed is None:
+        cap = cv2.VideoCapture(video_path)
+        try:
+            frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+        finally:
+            cap.release()
+        return max(0, frames), None  # 메타데이터 값은 캐시하지 않음 (ffprobe 설치 후 다시 시도)
+    frames, keyframes = probed
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'frames': frames, 'keyframes': keyframes}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return frames, keyframes
+
+
+class VideoReader:
+    # 영상 하나에 VideoCapture 하나: 앞으로 가까운 프레임은 탐색 없이 이어서 디코딩하고,
+    # 멀리 가면 목표 이전의 키프레임으로 탐색한 뒤 grab()으로 앞으로 감 (디코딩한 프레임은 LRU 에 보관)
+    def __init__(self, video_path, cache_frames=32, max_forward=64):
+        self.path = video_path
+        self.cache_frames = cache_frames
+        self.max_forward = max_forward  # 키프레임 목록이 없을 때 탐색 대신 이어서 디코딩할 최대 거리
+        self.lock = threading.Lock()
+        self.frame_count, self.keyframes = load_index(video_path)
+        self.cap = None
+        self.width = self.height = 0
+        self.pos = 0  # 다음에 디코딩될 프레임 번호
+        self.frames = OrderedDict()  # 프레임 번호 -> RGB 배열 (읽기 전용)
+        self.nbytes = 0  # 프레임 LRU 크기 (디코딩 중에도 잠금 없이 읽을 수 있도록 따로 유지)
+        self.seeks = 0
+        self.decoded = 0
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            raise OSError(f"영상을 열 수 없습니다: {self.path}")
+        self.pos = 0
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def keyframe_before(self, index):
+        i = bisect.bisect_right(self.keyframes, index) - 1
+        return self.keyframes[i] if i >= 0 else 0
+
+    def seek_target(self, index):
+        # 이어서 디코딩하면 되면 None, 아니면 탐색할 프레임 번호
+        if self.keyframes:
+            key = self.keyframe_before(index)
+            if self.pos <= index and self.pos >= key:
+                return None  # 현재 위치와 목표 사이에 키프레임이 없음: 탐색해도 같은 곳에서 시작
+            return key
+        if self.pos <= index <= self.pos + self.max_forward:
+            return None
+        return index
+
+    def read(self, index):
+        with self.lock:
+            frame = self.frames.get(index)
+            if frame is not None:
+                self.frames.move_to_end(index)
+                return frame
+            if self.cap is None:
+                self.open()
+            target = self.seek_target(index)
+            if target is not None:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                self.pos = target
+                self.seeks += 1
+            while self.pos < index:
+                if not self.cap.grab():
+                    return None
+                self.pos += 1
+            ok, bgr = self.cap.read()
+            if not ok:
+                return None
+            self.pos = index + 1
+            self.decoded += 1
+            frame = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+            frame.flags.writeable = False
+            self.frames[index] = frame
+            self.nbytes += frame.nbytes
+            while len(self.frames) > self.cache_frames:
+                self.nbytes -= self.frames.popitem(last=False)[1].nbytes
+            return frame
+
+    def trim(self, excess):
+        # 오래된 프레임부터 excess 바이트 이상 해제 (이미지 캐시와 배열을 공유하면 실제로는 그쪽이 해제될 때 반환됨)
+        # 다른 스레드가 탐색 중이면 기다리지 않고 건너뜀 (Tk 스레드에서 호출되므로 화면이 멈추지 않도록)
+        if not self.lock.acquire(blocking=False):
+            return 0
+        freed = 0
+        try:
+            while self.frames and freed < excess:
+                freed += self.frames.popitem(last=False)[1].nbytes
+            self.nbytes -= freed
+        finally:
+            self.lock.release()
+        return freed
+
+    def close(self):
+        with self.lock:
+            if self.cap is not None:
+                self.cap.release()
+                self.cap = None
+            self.frames.clear()
+            self.nbytes = 0
+
+
+_readers = OrderedDict()  # 영상 경로 -> VideoReader (최근에 쓴 몇 개만 열어 둠)
+_readers_lock = threading.Lock()
+
+
+def get_reader(video_path, max_open=4):
+    with _readers_lock:
+        reader = _readers.get(video_path)
+        if reader is not None:
+            _readers.move_to_end(video_path)
+            return reader
+    reader = VideoReader(video_path)
+    with _readers_lock:
+        reader = _readers.setdefault(video_path, reader)
+        _readers.move_to_end(video_path)
+        while len(_readers) > max_open:
+            _readers.popitem(last=False)[1].close()
+    return reader
+
+
+def frame_count(video_path):
+    return get_reader(video_path).frame_count
+
+
+def frame_size(path):
+    # 디코딩 없이 영상 메타데이터로 프레임 크기 확인
+    reader = get_reader(split_frame_path(path)[0])
+    with reader.lock:
+        if reader.cap is None:
+            reader.open()
+        return reader.width, reader.height
+
+
+def read_frame(path):
+    # 프레임 경로 -> RGB 배열 (읽기 전용, 실패 시 None)
+    video_path, index = split_frame_path(path)
+    try:
+        return get_reader(video_path).read(index)
+    except OSError:
+        return None
+
+
+def cached_bytes():
+    with _readers_lock:
+        readers = list(_readers.values())
+    return sum(reader.nbytes for reader in readers)
+
+
+def trim_cached_frames(excess):
+    # 전역 메모리 예산용: 오래 쓰지 않은 영상부터 프레임 LRU를 비움
+    with _readers_lock:
+        readers = list(_readers.values())
+    freed = 0
+    for reader in readers:
+        if freed >= excess:
+            break
+        freed += reader.trim(excess - freed)
+    return freed
+
+
+def frame_paths(video_path):
+    return [frame_path(video_path, i) for i in range(frame_count(video_path))]
+
+
+def close_readers():
+    with _readers_lock:
+        readers = list(_readers.values())
+        _readers.clear()
+    for reader in readers:
+        reader.close()
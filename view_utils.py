@@ -0,0 +1,139 @@
+import os
+import tkinter as tk
+from image_pyramid import ImagePyramid
+from frame_buffer import FrameBuffer
+from perf_trace import span, traced
+
+
+class ViewUtils:
+    def __init__(self, labeler, max_pixel_zoom=8.0):
+        self.labeler = labeler
+        self.zoom = 1.0  # 1.0 = 창에 맞춤
+        self.view_center = None  # 캔버스 중앙에 오는 이미지 좌표 (None이면 이미지 중앙)
+        self.max_pixel_zoom = max_pixel_zoom  # 원본 1픽셀이 화면에서 최대 몇 픽셀까지 커질지
+        self.pan_start = None
+        self.render_job = None
+        self.display_pyramid = None
+        self.fit_scale = 1.0
+        # 캔버스 크기의 프레임 버퍼 하나를 계속 재사용 (이미지 밖 영역은 캔버스 배경색)
+        self.frame = FrameBuffer(tuple(v >> 8 for v in labeler.canvas.winfo_rgb(labeler.canvas.cget('bg'))))
+
+    def reset(self):
+        self.zoom = 1.0
+        self.view_center = None
+
+    def get_display_pyramid(self):
+        # 표시 이미지가 바뀌었을 때만 밉맵을 다시 만듦 (회전하지 않은 이미지는 캐시의 밉맵을 그대로 사용)
+        display = self.labeler.display_image_cv2
+        if display is None:
+            # 타일 소스(대형 TIFF)는 전체 배열이 없으므로 소스를 그대로 사용
+            return self.labeler.image_pyramid
+        if self.display_pyramid is None or self.display_pyramid.base is not display:
+            if self.labeler.image_pyramid is not None and self.labeler.image_pyramid.base is display:
+                self.display_pyramid = self.labeler.image_pyramid
+            else:
+                self.display_pyramid = ImagePyramid(display)
+        return self.display_pyramid
+
+    @traced("render")
+    def render(self):
+        labeler = self.labeler
+        if labeler.display_image_cv2 is None and labeler.image_pyramid is None: return
+        pyramid = self.get_display_pyramid()
+        w, h = pyramid.width, pyramid.height
+        labeler.canvas_width, labeler.canvas_height = labeler.canvas.winfo_width(), labeler.canvas.winfo_height()
+        cw, ch = labeler.canvas_width, labeler.canvas_height
+        if cw < 2 or ch < 2: return
+        fit_scale = self.fit_scale = min(cw / w, ch / h)
+        self.zoom = max(1.0, min(self.zoom, self.max_pixel_zoom / fit_scale))
+        scale = fit_scale * self.zoom
+        labeler.scale_factor = scale
+        disp_w, disp_h = w * scale, h * scale
+        if disp_w < 1 or disp_h < 1: return
+        if pyramid.reduced and scale > pyramid.base.shape[1] / w * 1.001:
+            # 축소 디코딩한 해상도보다 크게 보면 원본 해상도로 교체 (그동안은 축소본을 늘려서 그림)
+            labeler.request_full_resolution()
+
+        # 캔버스보다 작은 축은 가운데 정렬, 큰 축은 이미지 밖이 보이지 않도록 중심을 제한
+        cx, cy = self.view_center or (w / 2, h / 2)
+        off_x = (cw - disp_w) / 2 if disp_w <= cw else min(0.0, max(cw - disp_w, cw / 2 - cx * scale))
+        off_y = (ch - disp_h) / 2 if disp_h <= ch else min(0.0, max(ch - disp_h, ch / 2 - cy * scale))
+        self.view_center = ((cw / 2 - off_x) / scale, (ch / 2 - off_y) / scale)
+
+        # 화면에 보이는 부분만 가장 가까운 밉맵 단계에서 그림
+        dx0, dy0 = max(0, int(round(off_x))), max(0, int(round(off_y)))
+        dx1, dy1 = min(cw, int(round(off_x + disp_w))), min(ch, int(round(off_y + disp_h)))
+        if dx1 - dx0 < 1 or dy1 - dy0 < 1: return
+        # 보이는 영역을 프레임 버퍼의 해당 위치에 바로 샘플링 (새 배열/PIL 이미지/PhotoImage를 만들지 않음)
+        frame = self.frame
+        resized = frame.ensure(cw, ch)
+        with span("render.region"):
+            pyramid.render((dx0 - off_x) / scale, (dy0 - off_y) / scale,
+                           (dx1 - off_x) / scale, (dy1 - off_y) / scale,
+                           dx1 - dx0, dy1 - dy0, frame.target(dx0, dy0, dx1, dy1))
+        with span("render.photo"):
+            labeler.photo = frame.present()
+            labeler.current_image = frame.image
+        # 캔버스 크기의 이미지 아이템 하나만 유지, 박스는 좌표만 변환
+        if labeler.image_item is None:
+            labeler.image_item = labeler.canvas.create_image(0, 0, image=labeler.photo, anchor=tk.NW)
+            labeler.canvas.tag_lower(labeler.image_item)
+        elif resized:
+            labeler.canvas.itemconfig(labeler.image_item, image=labeler.photo)
+        labeler.image_geometry = (off_x, off_y, disp_w, disp_h)
+        with span("render.boxes"):
+            labeler.labeling_utils.on_geometry_changed()
+            labeler.prelabeler.on_geometry_changed()
+        if labeler.mode == 'rotation':
+            labeler.draw_crosshair_lines()
+
+    def schedule_render(self):
+        # 휠/드래그 이벤트를 화면 갱신 주기 단위로 모아서 그림
+        if self.render_job is None:
+            self.render_job = self.labeler.root.after(16, self.run_render)
+
+    def run_render(self):
+        self.render_job = None
+        self.render()
+
+    def on_mousewheel(self, event):
+        if self.labeler.image_geometry is None or self.view_center is None:
+            return "break"
+        if getattr(event, 'num', None) in (4, 5):
+            steps = 1 if event.num == 4 else -1
+        else:
+            steps = event.delta / 120 if os.name == 'nt' else event.delta
+            steps = 1 if steps > 0 else -1
+        self.zoom_at(event.x, event.y, 1.25 ** steps)
+        return "break"  # 썸네일 스크롤(bind_all)로 전달되지 않도록 막음
+
+    def zoom_at(self, x, y, factor):
+        # 커서 아래의 이미지 지점이 그대로 유지되도록 확대/축소 (그리기 전 연속 이벤트도 누적)
+        cw, ch = self.labeler.canvas_width, self.labeler.canvas_height
+        cx, cy = self.view_center
+        old_scale = self.fit_scale * self.zoom
+        px, py = cx + (x - cw / 2) / old_scale, cy + (y - ch / 2) / old_scale
+        self.zoom = max(1.0, min(self.zoom * factor, self.max_pixel_zoom / self.fit_scale))
+        new_scale = self.fit_scale * self.zoom
+        self.view_center = (px + (cw / 2 - x) / new_scale, py + (ch / 2 - y) / new_scale)
+        self.schedule_render()
+
+    def start_pan(self, event):
+        if self.labeler.image_geometry is None:
+            return
+        self.pan_start = (event.x, event.y, self.view_center)
+
+    def pan(self, event):
+        if self.pan_start is None or self.pan_start[2] is None:
+            return
+        x0, y0, (cx, cy) = self.pan_start
+        scale = self.fit_scale * self.zoom
+        self.view_center = (cx - (event.x - x0) / scale, cy - (event.y - y0) / scale)
+        self.schedule_render()
+
+    def end_pan(self, event):
+        self.pan_start = None
+
+    def reset_view(self, event=None):
+        self.reset()
+        self.labeler.perform_resize()